@@ -12,8 +12,6 @@ Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查
 # from icecream import ic
 from typing import List, Optional, Set
 from overrides import override
-from llama_index.core.prompts.base import PromptTemplate
-from llama_index.core.prompts.prompt_type import PromptType
 
 
 from chat.chat_base import ChatBase
@@ -1,83 +1,16 @@
+import functools
 import time
 from typing import (
     # Optional, Dict,
-    List)
+    List, TYPE_CHECKING)
 # export PYTHONPATH=/home/lipz/fzb_rag_demo/RAGWebUi_demo/:$PYTHONPATH
-from pymilvus import (
-    connections,
-    # utility,
-    # FieldSchema,
-    # CollectionSchema,
-    DataType,
-    Collection,
-    Milvus,
-    # MilvusClient,
-    # Connections,
-)
 from database.vector.vector_database import VectorDatabase
+from llmragenv.Cons_Retri.Embedding_Model import Ollama_EmbeddingEnv
+
+# pymilvus / llama_index 导入较慢，推迟到第一次连接数据库时再导入
+if TYPE_CHECKING:
+    from llama_index.core.schema import NodeWithScore
 
-from llama_index.vector_stores.milvus import MilvusVectorStore
-import time
-from typing import (
-    # Optional, Dict,
-    List)
-from llama_index.core.utils import print_text
-
-from llama_index.core import (
-    VectorStoreIndex,
-    # SimpleDirectoryReader,
-    # Document,
-    StorageContext,
-    load_index_from_storage,
-)
-
-from pymilvus import (
-    connections,
-    # utility,
-    # FieldSchema,
-    # CollectionSchema,
-    DataType,
-    Collection,
-    Milvus,
-    # MilvusClient,
-    # Connections,
-)
-from llama_index.core.schema import NodeWithScore, QueryBundle
-from llama_index.core.retrievers import (
-    VectorIndexRetriever)
-from llama_index.vector_stores.milvus import MilvusVectorStore
-import time
-from typing import (
-    # Optional, Dict,
-    List)
-from llama_index.core.utils import print_text
-from llama_index.core import (
-    VectorStoreIndex,
-    # SimpleDirectoryReader,
-    # Document,
-    StorageContext,
-    load_index_from_storage,
-)
-
-from pymilvus import (
-    connections,
-    # utility,
-    # FieldSchema,
-    # CollectionSchema,
-    DataType,
-    Collection,
-    Milvus,
-    # MilvusClient,
-    # Connections,
-)
-from llama_index.core.schema import NodeWithScore, QueryBundle
-
-from llama_index.core.retrievers import (
-
-    # KnowledgeGraphRAGRetriever,
-    VectorIndexRetriever)
-# from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llmragenv.Cons_Retri.Embedding_Model import Ollama_EmbeddingEnv 
 fmt = "\n=== {:30} ===\n"
 
 
@@ -89,6 +22,8 @@ class MilvusClientTool:
         server_ip='127.0.0.1',
         server_port='19530',
     ):
+        from pymilvus import Milvus
+
         self.client = Milvus(server_ip, server_port)
 
     def show_all_collections(self):
@@ -111,33 +46,46 @@ class MilvusClientTool:
         self.client.drop_collection(collection_name)
 
 
-class myMilvus(Milvus):
+@functools.lru_cache(maxsize=None)
+def _my_milvus_class():
+    from pymilvus import Milvus
 
-    def __init__(self, host="127.0.0.1", port="19530", **kwargs):
-        super().__init__(host=host, port=port, **kwargs)
+    class myMilvus(Milvus):
 
-    def show_all_collections(self):
-        ret = self.list_collections()
-        print(f"=== all collections name: {ret}")
+        def __init__(self, host="127.0.0.1", port="19530", **kwargs):
+            super().__init__(host=host, port=port, **kwargs)
 
-    def show_collections_stats(self, collection_name):
-        ret = self.get_collection_stats(collection_name)
-        print(f"=== stat of {collection_name}: {ret}")
+        def show_all_collections(self):
+            ret = self.list_collections()
+            print(f"=== all collections name: {ret}")
 
-    def show_collections_schema(self, collection_name):
-        ret = self.describe_collection(collection_name)
-        print(f"=== schema of {collection_name}: {ret}")
+        def show_collections_stats(self, collection_name):
+            ret = self.get_collection_stats(collection_name)
+            print(f"=== stat of {collection_name}: {ret}")
 
-    # def drop(self, collection_name):
-    #     ret = self.drop_collection(collection_name)
-    #     print(f'=== clear collection {collection_name}: {ret}')
+        def show_collections_schema(self, collection_name):
+            ret = self.describe_collection(collection_name)
+            print(f"=== schema of {collection_name}: {ret}")
 
-    # def exist(self, collection_name):
-    #     return self.has_collection(collection_name)
+        # def drop(self, collection_name):
+        #     ret = self.drop_collection(collection_name)
+        #     print(f'=== clear collection {collection_name}: {ret}')
 
-    def get_vector_count(self, collection_name):
-        ret = self.get_collection_stats(collection_name)
-        return ret["row_count"]
+        # def exist(self, collection_name):
+        #     return self.has_collection(collection_name)
+
+        def get_vector_count(self, collection_name):
+            ret = self.get_collection_stats(collection_name)
+            return ret["row_count"]
+
+    return myMilvus
+
+
+def __getattr__(name):
+    # 兼容 from database.vector.Milvus.milvus import myMilvus
+    if name == 'myMilvus':
+        return _my_milvus_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 
@@ -162,6 +110,9 @@ class MilvusDB(VectorDatabase):
         self.server_port = server_port
         self.log_file = log_file
 
+        from pymilvus import Milvus, connections
+        from llama_index.core.retrievers import VectorIndexRetriever
+
         self.client = Milvus(server_ip, server_port)
         # self.client = MilvusClient()
 
@@ -193,6 +144,9 @@ class MilvusDB(VectorDatabase):
         return self.storage_context
 
     def init_store(self):
+        from llama_index.core import StorageContext
+        from llama_index.vector_stores.milvus import MilvusVectorStore
+
         self.store = MilvusVectorStore(dim=self.dim,
                                        collection_name=self.collection_name,
                                        overwrite=self.overwrite)
@@ -201,6 +155,8 @@ class MilvusDB(VectorDatabase):
 
     def get_vector_index(self):
         if not self.index:
+            from llama_index.core import VectorStoreIndex
+
             self.index = VectorStoreIndex.from_vector_store(
                 vector_store=self.store,embed_model=self.embed_model)
         return self.index
@@ -210,6 +166,7 @@ class MilvusDB(VectorDatabase):
         return ret
 
     def create(self, consistency_level="Session"):
+        from pymilvus import Collection, DataType
 
         # connections.connect("default", host="localhost", port="19530")
 
@@ -278,6 +235,8 @@ class MilvusDB(VectorDatabase):
         print(ret)
 
     def get_topk_vector(self, query_vector):
+        from pymilvus import Collection
+
     # 加载集合
         collection = Collection(self.collection_name)
 
@@ -313,8 +272,9 @@ class MilvusDB(VectorDatabase):
     def set_retriever(self, retriever):
         self.retriever = retriever
 
-    def retrieve_nodes(self, query, embedding) -> List[NodeWithScore]:
+    def retrieve_nodes(self, query, embedding) -> List['NodeWithScore']:
         assert self.retriever, 'please use set_retriever() to init retriever!'
+        from llama_index.core.schema import QueryBundle
 
         query_bundle = QueryBundle(query_str=query, embedding=embedding)
         nodes = self.retriever._retrieve(query_bundle=query_bundle)
@@ -331,6 +291,8 @@ class MilvusDB(VectorDatabase):
         self.db.load()
     def load(self):
         if not self.db:
+            from pymilvus import Collection
+
             self.db = Collection(self.collection_name)
             self.db.load()
 
@@ -371,6 +333,8 @@ class MilvusDB(VectorDatabase):
 
     
 def test_retrieve_nodes(db_name):
+    from pymilvus import Collection
+    from llama_index.core.utils import print_text
 
     vector_db = MilvusDB(db_name, 1024, overwrite=False, store=True,retriever=True)
     vector_db.show_collections_stats()
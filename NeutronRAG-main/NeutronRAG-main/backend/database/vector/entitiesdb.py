@@ -8,7 +8,7 @@ Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查
 '''
 from tqdm import tqdm
 
-from database.vector.Milvus.milvus import MilvusDB, myMilvus
+from database.vector.Milvus.milvus import MilvusDB
 from database.graph.nebulagraph.nebulagraph import *
 from llmragenv.Cons_Retri.Embedding_Model import Ollama_EmbeddingEnv,EmbeddingEnv
 
@@ -32,6 +32,9 @@ class EntitiesDB:
 
         self.id2entity = {i: entity for i, entity in enumerate(self.entities)}
 
+        # myMilvus 继承自 pymilvus.Milvus，首次使用时才导入 pymilvus
+        from database.vector.Milvus.milvus import myMilvus
+
         self.milvus_client = myMilvus()
 
         create_new_db = True
@@ -8,8 +8,6 @@ Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查
 '''
 import numpy as np
 import requests
-from transformers import AutoTokenizer, AutoModel
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 
 
 
@@ -34,6 +32,8 @@ class EmbeddingEnv:
 
         if 'BAAI' in embed_name:
             print(f"use huggingface embedding {embed_name}")
+            # transformers / torch 导入很慢，只在使用本地 HuggingFace 模型时加载
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
             self.embed_model = HuggingFaceEmbedding(
                 model_name=embed_name,
                 embed_batch_size=embed_batch_size,
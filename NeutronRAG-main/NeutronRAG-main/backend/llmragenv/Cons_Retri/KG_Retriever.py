@@ -20,7 +20,6 @@ from database.graph.graph_database import GraphDatabase
 import numpy as np
 from llmragenv.Cons_Retri.Embedding_Model import EmbeddingEnv,Ollama_EmbeddingEnv
 from llmragenv.Cons_Retri.pruning import *
-import cupy as cp
 from database.vector.entitiesdb import EntitiesDB
 
 
@@ -100,6 +99,8 @@ def cosine_similarity_cp(
     embeddings1,
     embeddings2,
 ) -> float:
+    import cupy as cp
+
     embeddings1_gpu = cp.asarray(embeddings1)
     embeddings2_gpu = cp.asarray(embeddings2)
 
@@ -305,6 +306,8 @@ class Pruning:
         embeddings1,
         embeddings2,
     ) -> float:
+        import cupy as cp
+
         # with cp.cuda.Device(0):
         #     arr1 = cp.array([1, 2, 3])
         #     print(cp.cuda.runtime.getDevice())  # 输出 0
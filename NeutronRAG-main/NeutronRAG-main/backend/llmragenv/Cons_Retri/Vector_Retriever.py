@@ -15,26 +15,8 @@ Description: 这是默认设置,请设置`customMade`, 打开koroFileHeader查
 
 '''
 from ast import List
-from transformers import AutoTokenizer, AutoModel
-import torch
-from huggingface_hub import hf_hub_download
 from llmragenv.LLM.llm_base import LLMBase
 from database.vector.vector_database import VectorDatabase
-from llama_index.core.utils import print_text
-from llama_index.vector_stores.milvus import MilvusVectorStore
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.schema import NodeWithScore, QueryBundle
-from llama_index.core.retrievers import (
-
-    # KnowledgeGraphRAGRetriever,
-    VectorIndexRetriever)
-from llama_index.core import (
-    VectorStoreIndex,
-    # SimpleDirectoryReader,
-    # Document,
-    StorageContext,
-    load_index_from_storage,
-)
 
 
 
@@ -1,14 +1,18 @@
 import random
 import time
 
-import cupy as cp
 import numpy as np
-from llama_index.core.utils import print_text
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from llmragenv.Cons_Retri.Embedding_Model import EmbeddingEnv, Ollama_EmbeddingEnv
 
+
+# cupy / sklearn / llama_index 都推迟到函数内导入，只导入本模块不会初始化CUDA
+def print_text(text, color=None, end=""):
+    from llama_index.core.utils import print_text as _print_text
+
+    _print_text(text, color=color, end=end)
+
+
 # embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5",
 #                                    embed_batch_size=10)
 embed_model = None
@@ -48,6 +52,8 @@ class Pruning:
         embeddings1,
         embeddings2,
     ) -> float:
+        import cupy as cp
+
         # with cp.cuda.Device(0):
         #     arr1 = cp.array([1, 2, 3])
         #     print(cp.cuda.runtime.getDevice())  # 输出 0
@@ -101,6 +107,9 @@ class Pruning:
 
 
 def calculate_tfidf_cosine_similarity(sentence1, sentence2):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     sentences = [sentence1, sentence2]
     vectorizer = TfidfVectorizer()
     tfidf_matrix = vectorizer.fit_transform(sentences)
@@ -109,6 +118,8 @@ def calculate_tfidf_cosine_similarity(sentence1, sentence2):
 
 
 def calculate_embedding_cosine_similarity(sentence1, sentence2):
+    from sklearn.metrics.pairwise import cosine_similarity
+
     global embed_model
     if not embed_model:
         embed_model = Ollama_EmbeddingEnv()
@@ -170,6 +181,8 @@ def cosine_similarity_cp(
     embeddings1,
     embeddings2,
 ) -> float:
+    import cupy as cp
+
     embeddings1_gpu = cp.asarray(embeddings1)
     embeddings2_gpu = cp.asarray(embeddings2)
 
@@ -274,6 +287,8 @@ def semantic_pruning(question, knowledge_sequence, topk=30):
 
 
 if __name__ == "__main__":
+    from sklearn.metrics.pairwise import cosine_similarity
+
     texts = [f"{random.randint(1, 10000)}" for _ in range(50010)]
 
     # q_embedding = np.array(get_text_embedding(question))
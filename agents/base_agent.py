@@ -4,9 +4,17 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from loguru import logger
 import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.metrics import AgentMetrics
+from utils.tracing import span, propagate, SPAN_AGENT
+from utils.deadline import deadline_scope
 
 
 class BaseAgent(ABC):
@@ -24,19 +32,18 @@ class BaseAgent(ABC):
         self.config = config
         self.enabled = config.get('enabled', True)
         self.priority = config.get('priority', 5)
-        self.status = 'idle'  # idle, busy, error
-        self.stats = {
-            'total_requests': 0,
-            'successful_requests': 0,
-            'failed_requests': 0,
-            'total_time': 0.0,
-            'average_time': 0.0
-        }
+        # 单次执行的时限(秒)，None表示只受请求总时限约束
+        self.timeout = config.get('timeout')
+        # process_batch 的默认并发数
+        self.batch_max_workers = config.get('batch_max_workers', 8)
+        
+        # 请求计数和延迟分布（并发 execute 安全）
+        self.metrics = AgentMetrics(agent_id)
         
         # 初始化日志
         self.logger = logger.bind(agent=self.agent_id)
         self.logger.info(f"智能体 {self.agent_id} 初始化完成")
-        
+    
     @abstractmethod
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -50,12 +57,32 @@ class BaseAgent(ABC):
         """
         pass
     
-    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    @property
+    def status(self) -> str:
+        """当前状态: busy（有请求在执行）、error（最近一次失败）、idle"""
+        return self._status_from(self.metrics.get_stats())
+    
+    def _status_from(self, stats: Dict[str, Any]) -> str:
+        """根据统计信息判断状态"""
+        if stats['in_flight'] > 0:
+            return 'busy'
+        return 'error' if self.metrics.last_failed else 'idle'
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """统计信息（计数、平均耗时和 p50/p90/p99/max 延迟）"""
+        return self.metrics.get_stats()
+    
+    def execute(self, input_data: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
         """
-        执行任务（带状态管理和统计）
+        执行任务（带状态管理、统计、链路追踪和时限）
+        
+        时限内的LLM调用按剩余时间收缩超时和重试，时间用完后直接失败，
+        由子类已有的规则系统兜底；时限与请求总时限取更早者。
         
         Args:
             input_data: 输入数据
+            timeout: 本次执行的时限(秒)，默认使用配置中的 timeout
             
         Returns:
             执行结果
@@ -66,37 +93,39 @@ class BaseAgent(ABC):
                 'error': f'智能体 {self.agent_id} 未启用'
             }
         
-        self.status = 'busy'
-        self.stats['total_requests'] += 1
-        start_time = time.time()
+        shard = self.metrics.begin()
+        start_time = time.perf_counter()
         
         try:
             self.logger.info(f"开始处理任务: {input_data.get('task_type', 'unknown')}")
             
-            # 调用子类实现的处理方法
-            result = self.process(input_data)
+            # 调用子类实现的处理方法（记录为当前trace中的一个span）
+            with deadline_scope(timeout if timeout is not None else self.timeout) as deadline:
+                with span(f'agent.{self.agent_id}', kind=SPAN_AGENT, task_type=input_data.get('task_type', 'unknown')):
+                    result = self.process(input_data)
             
             # 更新统计信息
-            elapsed_time = time.time() - start_time
-            self.stats['successful_requests'] += 1
-            self.stats['total_time'] += elapsed_time
-            self.stats['average_time'] = self.stats['total_time'] / self.stats['total_requests']
+            elapsed_time = time.perf_counter() - start_time
+            self.metrics.end(shard, elapsed_time, success=True)
             
-            self.logger.info(f"任务处理完成，耗时: {elapsed_time:.2f}秒")
+            deadline_exceeded = deadline is not None and deadline.expired
+            if deadline_exceeded:
+                self.logger.warning(f"任务超出时限，结果可能来自规则降级，耗时: {elapsed_time:.2f}秒")
+            else:
+                self.logger.info(f"任务处理完成，耗时: {elapsed_time:.2f}秒")
             
-            self.status = 'idle'
             return {
                 'success': True,
                 'agent_id': self.agent_id,
                 'data': result,
-                'execution_time': elapsed_time
+                'execution_time': elapsed_time,
+                'deadline_exceeded': deadline_exceeded
             }
-            
+        
         except Exception as e:
             # 处理错误
-            elapsed_time = time.time() - start_time
-            self.stats['failed_requests'] += 1
-            self.status = 'error'
+            elapsed_time = time.perf_counter() - start_time
+            self.metrics.end(shard, elapsed_time, success=False)
             
             self.logger.error(f"任务处理失败: {str(e)}")
             
@@ -107,25 +136,83 @@ class BaseAgent(ABC):
                 'execution_time': elapsed_time
             }
     
+    def process_batch(
+        self,
+        inputs: List[Dict[str, Any]],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量执行任务
+        
+        默认在线程池中并发调用 execute，每条输入各自记录统计和span，单条失败不影响其他；
+        规则路径是纯数值计算的智能体可以覆盖为整批向量化的实现。
+        
+        Args:
+            inputs: 输入数据列表（格式同 execute）
+            max_workers: 最大并发数，默认使用配置中的 batch_max_workers
+            timeout: 每条输入的时限(秒)，从该条开始执行时计时，默认使用配置中的 timeout
+            
+        Returns:
+            与inputs同序的执行结果列表（格式同 execute）
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(inputs)
+        for index, result in self.iter_batch(inputs, max_workers, timeout):
+            results[index] = result
+        return results
+    
+    def iter_batch(
+        self,
+        inputs: List[Dict[str, Any]],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        批量执行任务，按完成顺序逐条产出结果
+        
+        调用方提前停止迭代时，尚未开始执行的输入会被取消。
+        
+        Args:
+            inputs: 输入数据列表（格式同 execute）
+            max_workers: 最大并发数，默认使用配置中的 batch_max_workers
+            timeout: 每条输入的时限(秒)，从该条开始执行时计时，默认使用配置中的 timeout
+            
+        Yields:
+            (输入下标, 执行结果)
+        """
+        if not inputs:
+            return
+        
+        workers = max(1, min(max_workers or self.batch_max_workers, len(inputs)))
+        if workers == 1:
+            for index, input_data in enumerate(inputs):
+                yield index, self.execute(input_data, timeout)
+            return
+        
+        # 线程池中的执行仍属于调用方的trace和请求时限
+        run = propagate(self.execute)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{self.agent_id}-batch')
+        try:
+            futures = {executor.submit(run, input_data, timeout): index for index, input_data in enumerate(inputs)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def get_status(self) -> Dict[str, Any]:
         """获取智能体状态"""
+        stats = self.metrics.get_stats()
         return {
             'agent_id': self.agent_id,
-            'status': self.status,
+            'status': self._status_from(stats),
             'enabled': self.enabled,
             'priority': self.priority,
-            'stats': self.stats
+            'stats': stats
         }
     
     def reset_stats(self):
         """重置统计信息"""
-        self.stats = {
-            'total_requests': 0,
-            'successful_requests': 0,
-            'failed_requests': 0,
-            'total_time': 0.0,
-            'average_time': 0.0
-        }
+        self.metrics.reset()
         self.logger.info("统计信息已重置")
     
     def enable(self):
@@ -11,6 +11,10 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from .base_agent import BaseAgent
 from utils.glm4_client import get_glm4_client
+from utils.prompt_builder import PromptBuilder
+from utils.keyword_matcher import KeywordMatcher
+from utils.intent_classifier import IntentClassifier, DEFAULT_LEXICAL_KEYWORDS
+from utils.tracing import span, SPAN_RULE
 
 # 尝试导入 RAG 适配器（可选）
 try:
@@ -20,6 +24,26 @@ except Exception as e:
     RAG_AVAILABLE = False
     print(f"⚠️ RAG 模块不可用: {e}")
 
+# 需要 RAG 知识检索的营养健康关键词
+RAG_KEYWORDS = [
+    '营养', '热量', '卡路里', '蛋白质', '碳水', '脂肪', '维生素', '矿物质',
+    '减肥', '减脂', '增肌', '瘦身', '健身',
+    '食物', '食材', '食谱', '饮食', '吃',
+    '糖尿病', '高血压', '高血脂', '痛风', '疾病',
+    'GI', '血糖', '胰岛素', '代谢',
+    '健康', '养生', '调理'
+]
+
+# 规则回复的意图关键词（按优先级排列，同时命中多个意图时取靠前的）
+RULE_INTENT_KEYWORDS = {
+    'calorie': ['热量', '卡路里'],
+    'weight_loss': ['减肥', '瘦身'],
+    'nutrition': ['营养'],
+    'exercise': ['运动', '锻炼'],
+    'meal': ['食谱', '吃什么'],
+    'greeting': ['你好', 'hello', 'hi', '您好']
+}
+
 
 class ConversationAgent(BaseAgent):
     """对话智能体"""
@@ -29,6 +53,8 @@ class ConversationAgent(BaseAgent):
         super().__init__(agent_id, config or {})
         
         self.max_history = self.config.get('max_history', 10)
+        # 每个会话保存的历史消息数上限，更早的消息只保留在滚动摘要中
+        self.max_stored_history = self.config.get('max_stored_history', 200)
         self.temperature = self.config.get('temperature', 0.7)
         self.max_tokens = self.config.get('max_tokens', 2048)
         self.system_prompt = self.config.get(
@@ -49,6 +75,22 @@ class ConversationAgent(BaseAgent):
         # 对话历史存储（实际应该用数据库）
         self.conversation_history = {}
         
+        # 提示词按token预算组装：最近 max_history 条原样发送，更早的合并进按会话缓存的滚动摘要
+        self.prompt_builder = PromptBuilder(
+            max_prompt_tokens=self.config.get('prompt_budget', 3000),
+            summary_max_tokens=self.config.get('summary_max_tokens', 300),
+            max_recent_messages=self.max_history,
+            summarizer=self._summarize_with_llm if self.use_llm and self.config.get('summarize_with_llm', False) else None
+        )
+        
+        # 关键词在初始化时编译成一个自动机，每条消息只扫描一遍就能得到全部命中的意图
+        # 配置 rag_keywords 追加检索关键词，intent_keywords 追加规则意图关键词 {意图: [关键词]}
+        self.keyword_matcher = KeywordMatcher({'rag': RAG_KEYWORDS, **RULE_INTENT_KEYWORDS})
+        self.keyword_matcher.add('rag', self.config.get('rag_keywords', []))
+        for intent, keywords in self.config.get('intent_keywords', {}).items():
+            self.keyword_matcher.add(intent, keywords)
+        self.keyword_matcher.compile()
+        
         # 知识库（作为后备）
         self.knowledge_base = self._init_knowledge_base()
         
@@ -83,6 +125,21 @@ class ConversationAgent(BaseAgent):
             self.logger.warning("⚠️ RAG 模块不可用，将使用传统模式")
             self.use_rag = False
         
+        # 🆕 意图分类器决定是否检索（关键词路由会漏掉不含关键词的问法），配置 intent_classifier=False 时退回关键词路由
+        self.intent_classifier: Optional[IntentClassifier] = None
+        classifier_config = self.config.get('intent_classifier', {})
+        if self.use_rag and classifier_config is not False:
+            try:
+                classifier_config = dict(classifier_config or {})
+                lexical_keywords = classifier_config.pop('lexical_keywords', None) or {
+                    intent: list(keywords) for intent, keywords in DEFAULT_LEXICAL_KEYWORDS.items()
+                }
+                lexical_keywords.setdefault('rag', []).extend(self.config.get('rag_keywords', []))
+                self.intent_classifier = IntentClassifier(lexical_keywords=lexical_keywords, **classifier_config).load()
+            except Exception as e:
+                self.logger.warning(f"⚠️ 意图分类器初始化失败，使用关键词路由: {e}")
+                self.intent_classifier = None
+        
         self.logger.info(f"对话智能体初始化完成 (RAG: {'启用' if self.use_rag else '禁用'})")
     
     def _init_knowledge_base(self) -> Dict[str, List[str]]:
@@ -135,7 +192,7 @@ class ConversationAgent(BaseAgent):
         
         # 使用MindSpore NLP模型生成回复
         response = self._generate_response(
-            user_message, history, context
+            user_message, history, context, session_id
         )
         
         # 更新对话历史
@@ -151,7 +208,9 @@ class ConversationAgent(BaseAgent):
         }
     
     def _get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
-        """获取对话历史"""
+        """获取对话历史（没有会话ID的请求互不共享历史）"""
+        if session_id is None:
+            return []
         if session_id not in self.conversation_history:
             self.conversation_history[session_id] = []
         
@@ -163,44 +222,45 @@ class ConversationAgent(BaseAgent):
         user_message: str,
         ai_response: str
     ):
-        """更新对话历史"""
+        """更新对话历史（没有会话ID时不保存；超出上限时删除最早的消息）"""
+        if session_id is None:
+            return
         if session_id not in self.conversation_history:
             self.conversation_history[session_id] = []
         
-        self.conversation_history[session_id].append({
+        history = self.conversation_history[session_id]
+        history.append({
             'role': 'user',
             'content': user_message
         })
-        self.conversation_history[session_id].append({
+        history.append({
             'role': 'assistant',
             'content': ai_response
         })
+        
+        overflow = len(history) - self.max_stored_history
+        if overflow > 0:
+            # 按问答成对删除，历史始终从用户消息开始
+            overflow += overflow % 2
+            del history[:overflow]
+            self.prompt_builder.drop(session_id, overflow)
     
     def _generate_llm_response(
         self,
         user_message: str,
         history: List[Dict[str, str]],
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        session_id: str = None
     ) -> str:
         """使用GLM-4大模型生成回复"""
-        # 构建消息列表
-        messages = []
-        
-        # 系统提示
-        messages.append({
-            "role": "system",
-            "content": self.system_prompt
-        })
-        
-        # 添加历史对话（保持上下文）
-        for msg in history:
-            messages.append(msg)
-        
-        # 当前用户消息
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
+        # 构建消息列表：系统提示 + 历史摘要 + 预算内的最近对话 + 当前用户消息
+        if session_id is not None and session_id in self.conversation_history:
+            history = self.conversation_history[session_id]
+        messages, prompt_stats = self.prompt_builder.build(self.system_prompt, history, user_message, session_id)
+        self.logger.debug(
+            f"提示词约 {prompt_stats['prompt_tokens']} tokens: 最近 {prompt_stats['history_messages']} 条对话，"
+            f"{prompt_stats['summarized_messages']} 条已摘要"
+        )
         
         # 调用GLM-4
         response = self.llm_client.chat_with_retry(
@@ -211,11 +271,35 @@ class ConversationAgent(BaseAgent):
         
         return response
     
+    def _summarize_with_llm(self, previous: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        """用GLM-4把移出窗口的对话合并进已有摘要（由 PromptBuilder 在后台调用）"""
+        dialogue = '\n'.join(
+            f"{'用户' if msg.get('role') == 'user' else '助手'}: {msg.get('content', '')}" for msg in messages
+        )
+        prompt = f"""已有摘要：
+{previous or '（无）'}
+
+新增对话：
+{dialogue}
+
+请把新增对话合并进已有摘要，保留用户的身体状况、目标、饮食偏好和禁忌以及已经给出的关键建议，
+不超过{max_tokens}字，只输出摘要。"""
+        
+        return self.llm_client.chat(
+            [
+                {"role": "system", "content": "你负责压缩健康饮食助手与用户的对话历史。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=max_tokens
+        ).strip()
+    
     def _generate_response(
         self,
         user_message: str,
         history: List[Dict[str, str]],
-        context: Dict[str, Any]
+        context: Dict[str, Any],
+        session_id: str = None
     ) -> str:
         """
         生成回复
@@ -247,26 +331,26 @@ class ConversationAgent(BaseAgent):
         # 如果启用了LLM，使用大语言模型
         if self.use_llm and self.llm_client:
             try:
-                return self._generate_llm_response(user_message, history, context)
+                return self._generate_llm_response(user_message, history, context, session_id)
             except Exception as e:
                 self.logger.error(f"LLM生成失败，使用规则回复: {e}")
                 # 降级到规则系统
         
         # 规则系统（后备方案）
-        message_lower = user_message.lower()
+        matched = self.keyword_matcher.match(user_message)
         
         # 关键词匹配
-        if '热量' in user_message or '卡路里' in user_message:
+        if 'calorie' in matched:
             return self._get_calorie_advice(context)
-        elif '减肥' in user_message or '瘦身' in user_message:
+        elif 'weight_loss' in matched:
             return self._get_weight_loss_advice()
-        elif '营养' in user_message:
+        elif 'nutrition' in matched:
             return self._get_nutrition_advice()
-        elif '运动' in user_message or '锻炼' in user_message:
+        elif 'exercise' in matched:
             return self._get_exercise_advice()
-        elif '食谱' in user_message or '吃什么' in user_message:
+        elif 'meal' in matched:
             return self._get_meal_suggestion()
-        elif any(word in user_message for word in ['你好', 'hello', 'hi', '您好']):
+        elif 'greeting' in matched:
             return self._get_greeting()
         else:
             return self._get_default_response(user_message)
@@ -281,21 +365,19 @@ class ConversationAgent(BaseAgent):
         Returns:
             是否需要检索
         """
-        # 营养健康相关关键词
-        nutrition_keywords = [
-            '营养', '热量', '卡路里', '蛋白质', '碳水', '脂肪', '维生素', '矿物质',
-            '减肥', '减脂', '增肌', '瘦身', '健身',
-            '食物', '食材', '食谱', '饮食', '吃',
-            '糖尿病', '高血压', '高血脂', '痛风', '疾病',
-            'GI', '血糖', '胰岛素', '代谢',
-            '健康', '养生', '调理'
-        ]
+        if self.intent_classifier is not None:
+            with span('intent.classify', kind=SPAN_RULE) as intent_span:
+                decision = self.intent_classifier.classify(message)
+                intent_span.set_attribute('intent', decision['intent'])
+                intent_span.set_attribute('method', decision['method'])
+            self.logger.debug(
+                f"意图: {decision['intent']} ({decision['method']}, {decision['elapsed_ms']:.2f}ms)"
+            )
+            return decision['use_rag']
         
-        # 检查是否包含关键词
-        message_lower = message.lower()
-        for keyword in nutrition_keywords:
-            if keyword in message:
-                return True
+        # 营养健康相关关键词（RAG_KEYWORDS 及配置追加的 rag_keywords），命中即停止扫描
+        if self.keyword_matcher.matches_any(message, ['rag']):
+            return True
         
         # 默认不使用 RAG（如闲聊、问候等）
         return False
@@ -383,6 +465,7 @@ class ConversationAgent(BaseAgent):
     
     def clear_history(self, session_id: str):
         """清除对话历史"""
+        self.prompt_builder.forget(session_id)
         if session_id in self.conversation_history:
             del self.conversation_history[session_id]
             self.logger.info(f"已清除会话 {session_id} 的历史记录")
@@ -3,14 +3,16 @@
 基于GLM-4V视觉大模型识别食物图片
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from .base_agent import BaseAgent
 from utils.glm4_client import get_glm4_client
+from utils.nutrition_db import load_nutrition_db
 import json
+import numpy as np
 
 
 class FoodRecognitionAgent(BaseAgent):
@@ -43,6 +45,21 @@ class FoodRecognitionAgent(BaseAgent):
         # 营养数据库（简化版）
         self.nutrition_db = self._init_nutrition_db()
         
+        # 本地营养数据库（默认由 config/nutrition_foods.csv 编译），已知食物直接查表，不调用GLM
+        try:
+            self.food_db = load_nutrition_db(
+                self.config.get('nutrition_db_path'),
+                self.config.get('nutrition_csv_path')
+            )
+            self.logger.info(f"✅ 营养数据库已加载: {len(self.food_db)} 种食物")
+        except Exception as e:
+            self.logger.warning(f"⚠️ 营养数据库加载失败，食物营养信息将由LLM分析: {e}")
+            self.food_db = None
+        self.food_db_min_score = self.config.get('food_db_min_score', 0.7)
+        
+        # batch_recognize 中每张图片的时限(秒)，单张图片卡住时不会占满整批的时间
+        self.batch_item_timeout = self.config.get('batch_item_timeout', 20.0)
+        
         # 加载MindSpore模型
         self.model = self._load_model()
         
@@ -64,7 +81,7 @@ class FoodRecognitionAgent(BaseAgent):
             # load_param_into_net(model, param_dict)
             
             return None  # 占位符
-            
+        
         except Exception as e:
             self.logger.warning(f"模型加载失败，将使用规则识别: {e}")
             return None
@@ -125,7 +142,7 @@ class FoodRecognitionAgent(BaseAgent):
             image_array = np.array(image).astype(np.float32) / 255.0
             
             return image_array
-            
+        
         except Exception as e:
             self.logger.error(f"图片加载失败: {e}")
             raise
@@ -143,13 +160,46 @@ class FoodRecognitionAgent(BaseAgent):
             
             # 占位符返回
             return self._recognize_with_rules({})
-            
+        
         except Exception as e:
             self.logger.error(f"模型推理失败: {e}")
             return self._recognize_with_rules({})
     
+    def _recognize_with_db(self, food_name: str) -> Optional[Dict[str, Any]]:
+        """
+        在本地营养数据库中查找食物（精确匹配名称/别名，否则模糊匹配）
+        
+        Args:
+            food_name: 食物名称
+            
+        Returns:
+            识别结果，数据库中没有足够相似的食物时为None
+        """
+        if self.food_db is None or not food_name:
+            return None
+        
+        record = self.food_db.lookup(food_name, min_score=self.food_db_min_score)
+        if record is None:
+            return None
+        
+        score = record.pop('matchScore')
+        matched = record.pop('matchedName')
+        record['calories'] = int(round(record['calories']))
+        record['foodType'] = record['foodType'] or '未分类'
+        record['foodDescription'] = self._generate_description(record['foodName'], record['foodType'])
+        record['ingredients'] = record['ingredients'] or record['foodName']
+        record['confidence'] = 0.99 if score >= 1.0 else round(score, 2)
+        record['recognition_method'] = 'nutrition_db'
+        
+        self.logger.info(f"营养数据库命中: {food_name} -> {record['foodName']} (匹配 {matched}, 相似度 {score})")
+        return record
+    
     def _recognize_with_llm(self, food_name: str) -> Dict[str, Any]:
-        """使用GLM-4识别食物营养信息"""
+        """使用GLM-4识别食物营养信息（本地营养数据库中已有的食物直接返回）"""
+        known = self._recognize_with_db(food_name)
+        if known is not None:
+            return known
+        
         prompt = f"""请分析食物"{food_name}"的营养信息。
 
 要求返回JSON格式，必须包含以下字段：
@@ -165,7 +215,7 @@ class FoodRecognitionAgent(BaseAgent):
 - ingredients: 主要食材，逗号分隔
 
 只返回JSON，不要其他文字。"""
-
+        
         messages = [
             {"role": "system", "content": "你是一个专业的营养分析师，擅长分析食物营养成分。"},
             {"role": "user", "content": prompt}
@@ -189,7 +239,7 @@ class FoodRecognitionAgent(BaseAgent):
             
             self.logger.info(f"GLM-4识别食物: {result.get('foodName')}")
             return result
-            
+        
         except json.JSONDecodeError as e:
             self.logger.error(f"JSON解析失败: {e}, 响应: {response}")
             # 降级到规则系统
@@ -210,6 +260,11 @@ class FoodRecognitionAgent(BaseAgent):
         使用规则识别食物（模拟AI识别）
         实际项目中应该使用训练好的MindSpore模型
         """
+        # 提供了食物名称时先查本地营养数据库
+        known = self._recognize_with_db(input_data.get('food_name', ''))
+        if known is not None:
+            return known
+        
         # 模拟识别结果 - 随机选择一个食物
         import random
         food_name = random.choice(list(self.nutrition_db.keys()))
@@ -269,15 +324,50 @@ class FoodRecognitionAgent(BaseAgent):
         }
         return ingredients_map.get(food_name, food_name)
     
-    def batch_recognize(self, images: list) -> list:
-        """批量识别食物"""
-        results = []
-        for image_data in images:
-            try:
-                result = self.process(image_data)
-                results.append(result)
-            except Exception as e:
-                self.logger.error(f"批量识别失败: {e}")
-                results.append({'error': str(e)})
+    def batch_recognize(
+        self,
+        images: list,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        stream: bool = False
+    ):
+        """
+        批量识别食物（在有界线程池中并发执行，每张图片单独计时）
         
-        return results
+        Args:
+            images: 输入列表（格式同 process）
+            max_workers: 最大并发数，默认使用配置中的 batch_max_workers
+            timeout: 每张图片的时限(秒)，默认使用配置中的 batch_item_timeout
+            stream: 是否按完成顺序逐条返回
+            
+        Returns:
+            与images同序的识别结果列表，失败或超时的条目为 {'error': 错误信息, 'timed_out': 是否超时}；
+            stream=True 时返回生成器，按完成顺序产出 (下标, 识别结果)
+        """
+        if timeout is None:
+            timeout = self.batch_item_timeout
+        results = (
+            (index, self._batch_item(result))
+            for index, result in self.iter_batch(images, max_workers, timeout)
+        )
+        if stream:
+            return results
+        
+        items: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        for index, item in results:
+            items[index] = item
+        
+        failed = sum(1 for item in items if 'error' in item)
+        if failed:
+            timed_out = sum(1 for item in items if item.get('timed_out'))
+            self.logger.warning(f"批量识别 {len(images)} 张，{failed} 张失败（其中 {timed_out} 张超时）")
+        return items
+    
+    @staticmethod
+    def _batch_item(result: Dict[str, Any]) -> Dict[str, Any]:
+        """execute 结果转换为批量识别的单条结果（超时后规则降级的随机结果不可信，按超时失败报告）"""
+        if not result['success']:
+            return {'error': result['error'], 'timed_out': False}
+        if result.get('deadline_exceeded'):
+            return {'error': f"识别超时（{result['execution_time']:.1f}秒）", 'timed_out': True}
+        return result['data']
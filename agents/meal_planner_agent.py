@@ -103,6 +103,10 @@ class MealPlannerAgent(BaseAgent):
             except Exception as e:
                 self.logger.error(f"GLM-4生成失败，使用规则系统: {e}")
         
+        return self._generate_with_rules(target_calories, preferences, restrictions, goal, days)
+    
+    def _generate_with_rules(self, target_calories: int, preferences: List[str], restrictions: List[str], goal: str, days: int) -> Dict[str, Any]:
+        """使用规则系统（食谱库）生成饮食计划"""
         # 调整热量目标
         adjusted_calories = self._adjust_calories_by_goal(target_calories, goal)
         
@@ -3,16 +3,24 @@
 基于GLM-4大模型分析食物营养并提供健康建议
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import time
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from .base_agent import BaseAgent
 from utils.glm4_client import get_glm4_client
+from utils.tracing import propagate, span, SPAN_AGENT
 import json
 
 
+# 每日总摄入统计的营养素（顺序即向量化计算时的列顺序）
+NUTRIENTS = ('calories', 'protein', 'carbohydrate', 'fat', 'fiber')
+
+
 class NutritionAnalyzerAgent(BaseAgent):
     """营养分析智能体"""
     
@@ -39,6 +47,9 @@ class NutritionAnalyzerAgent(BaseAgent):
             'fiber': 25,  # 纤维(g)
         }
         
+        # process_batch 是否逐条调用LLM；默认整批走向量化的规则路径（夜间批量重分析）
+        self.batch_use_llm = self.config.get('batch_use_llm', False)
+        
         # 健康评分权重
         self.health_weights = {
             'calorie_balance': 0.3,
@@ -103,10 +114,298 @@ class NutritionAnalyzerAgent(BaseAgent):
             'analysis_method': 'mindspore_nutrition_model'
         }
     
-    def _analyze_with_llm(self, food_data: Dict[str, Any], user_profile: Dict[str, Any], daily_intake: List[Dict]) -> Dict[str, Any]:
-        """使用GLM-4进行营养分析"""
+    def process_batch(
+        self,
+        inputs: List[Dict[str, Any]],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量执行营养分析
+        
+        配置 batch_use_llm 且LLM可用时与基类一样逐条并发执行；否则整批用NumPy向量化计算
+        规则路径，结果与逐条调用 process 的规则降级结果一致，整批记为一次请求。
+        
+        Args:
+            inputs: 输入数据列表（格式同 process）
+            max_workers: 逐条执行时的最大并发数
+            timeout: 逐条执行时每条输入的时限(秒)（向量化路径是纯数值计算，不受影响）
+            
+        Returns:
+            与inputs同序的执行结果列表（格式同 execute）
+        """
+        if not inputs:
+            return []
+        if not self.enabled or (self.batch_use_llm and self.use_llm and self.llm_client):
+            return super().process_batch(inputs, max_workers, timeout)
+        
+        shard = self.metrics.begin()
+        start_time = time.perf_counter()
+        try:
+            with span(f'agent.{self.agent_id}.batch', kind=SPAN_AGENT, batch_size=len(inputs)):
+                results = self._process_batch_rules(inputs)
+        except (TypeError, ValueError, AttributeError) as e:
+            # 个别输入的格式或营养数值不合法，逐条执行以便单独报告失败
+            self.metrics.end(shard, time.perf_counter() - start_time, success=False)
+            self.logger.warning(f"向量化批量分析失败，改为逐条执行: {e}")
+            return super().process_batch(inputs, max_workers, timeout)
+        
+        elapsed_time = time.perf_counter() - start_time
+        self.metrics.end(shard, elapsed_time, success=True)
+        self.logger.info(f"向量化批量分析完成: {len(inputs)} 条，耗时: {elapsed_time:.3f}秒")
+        
+        per_item_time = elapsed_time / len(inputs)
+        return [
+            {
+                'success': True,
+                'agent_id': self.agent_id,
+                'data': data,
+                'execution_time': per_item_time,
+                'deadline_exceeded': False
+            }
+            for data in results
+        ]
+    
+    def _nutrient_matrix(self, foods: List[Dict[str, Any]]) -> np.ndarray:
+        """食物列表 -> (食物数, 营养素数) 的矩阵，缺失的营养素按0计"""
+        defaults = (0,) * len(NUTRIENTS)
+        matrix = np.array([tuple(map(food.get, NUTRIENTS, defaults)) for food in foods], dtype=np.float64)
+        # None 会被转换成 nan，逐条计算时同样的输入会失败
+        if np.isnan(matrix).any():
+            raise ValueError("营养数值缺失或不是数字")
+        return matrix.reshape(len(foods), len(NUTRIENTS))
+    
+    def _process_batch_rules(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        向量化的规则分析（与 process 的规则降级分支逐条等价）
+        
+        数值部分（每日总摄入、营养密度、三大营养素比例、平衡度、评分）整批计算，
+        只有组装结果字典时逐条循环。
+        """
+        count = len(inputs)
+        foods = [input_data.get('food_data', {}) for input_data in inputs]
+        intakes = [input_data.get('daily_intake', []) for input_data in inputs]
+        food_types = np.array([food.get('foodType', '') for food in foods], dtype=object)
+        
+        current = self._nutrient_matrix(foods)
+        calories, protein, carbs, fat, fiber = current.T
+        
+        # 每日总摄入：按所属输入累加当天已摄入的食物（bincount按出现顺序累加），再加上当前食物
+        intake_rows = self._nutrient_matrix([food for intake in intakes for food in intake])
+        owners = np.repeat(np.arange(count), [len(intake) for intake in intakes])
+        totals = np.column_stack([
+            np.bincount(owners, weights=intake_rows[:, j], minlength=count) for j in range(len(NUTRIENTS))
+        ]) + current
+        
+        # 营养密度
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density_score = np.where(calories != 0, (protein * 4 + fiber * 2) / calories, 0.0)
+        # 等级用整数编码计算，组装结果时再查表（ndarray中的字符串转换很慢）
+        density = np.select([calories == 0, density_score > 0.15, density_score > 0.08], [0, 2, 1], default=0)
+        
+        # 三大营养素供能比例
+        macro_calories = protein * 4 + carbs * 4 + fat * 9
+        with np.errstate(divide='ignore', invalid='ignore'):
+            macro_ratios = np.column_stack([protein * 4, carbs * 4, fat * 9]) / macro_calories[:, None] * 100
+        
+        # 份量描述的取值很少，每种只解析一次
+        serving_sizes = [food.get('servingSize', '') for food in foods]
+        weight_by_size = {size: self._get_serving_weight(size) for size in set(serving_sizes)}
+        serving_weights = np.array([weight_by_size[size] for size in serving_sizes])
+        if (serving_weights == 0).any():
+            raise ValueError("份量重量为0")
+        calories_per_100g = calories * 100 / serving_weights
+        
+        # 食物健康等级(1-5星)
+        is_produce = np.isin(food_types, ['蔬菜', '水果'])
+        is_dessert = food_types == '甜品'
+        rating = (
+            3 + is_produce - is_dessert
+            + np.where(calories < 100, 0.5, np.where(calories > 400, -0.5, 0.0))
+            + np.where(fiber > 3, 0.5, 0.0)
+        )
+        rating = np.clip(np.trunc(rating), 1, 5).astype(int)
+        
+        # 营养平衡
+        standard_values = [self.daily_standards.get(nutrient, 100) for nutrient in NUTRIENTS]
+        percentages = totals / np.array(standard_values, dtype=np.float64) * 100
+        status = np.select([percentages < 80, percentages < 120], [0, 1], default=2)
+        
+        # 健康评分
+        calorie_percentage = percentages[:, 0]
+        health_score = (
+            60
+            + (status == 1).sum(axis=1) * 5
+            + np.where(is_produce, 10, np.where(is_dessert, -5, 0))
+            + np.where((calorie_percentage >= 80) & (calorie_percentage <= 100), 10, np.where(calorie_percentage > 120, -10, 0))
+        )
+        health_score = np.clip(health_score, 0, 100).astype(int)
+        
+        # 健康建议的触发条件
+        high_calories = totals[:, 0] > self.daily_standards['calories'] * 0.8
+        low_protein = totals[:, 1] < self.daily_standards['protein'] * 0.5
+        low_fiber = totals[:, 4] < self.daily_standards['fiber'] * 0.5
+        
+        # 逐条组装结果前一次性转换为Python列表，避免逐个元素访问ndarray
+        type_evaluations = {food_type: self._evaluate_food_type(food_type) for food_type in set(food_types.tolist())}
+        density_levels = ('低', '中', '高')
+        balance_levels = ('不足', '适量', '过量')
+        columns = zip(
+            food_types.tolist(),
+            calories_per_100g.tolist(),
+            density.tolist(),
+            macro_calories.tolist(),
+            macro_ratios.tolist(),
+            rating.tolist(),
+            totals.tolist(),
+            percentages.tolist(),
+            status.tolist(),
+            health_score.tolist(),
+            high_calories.tolist(),
+            low_protein.tolist(),
+            low_fiber.tolist()
+        )
+        
+        results = []
+        for (food_type, per_100g, density_level, macro_total, ratios, stars, total, percentage, state,
+             score, too_many_calories, too_little_protein, too_little_fiber) in columns:
+            if macro_total == 0:
+                macros_ratio = {'protein': 0, 'carbs': 0, 'fat': 0}
+            else:
+                macros_ratio = {'protein': round(ratios[0], 1), 'carbs': round(ratios[1], 1), 'fat': round(ratios[2], 1)}
+            
+            recommendations = []
+            if too_many_calories:
+                recommendations.append("今日热量摄入已接近目标，建议控制后续饮食")
+            if too_little_protein:
+                recommendations.append("蛋白质摄入不足，建议补充鱼肉、豆类等优质蛋白")
+            if too_little_fiber:
+                recommendations.append("膳食纤维摄入不足，建议多吃蔬菜水果和全谷物")
+            if food_type == '甜品':
+                recommendations.append("甜品糖分较高，建议适量食用，可搭配运动消耗")
+            elif food_type == '蔬菜':
+                recommendations.append("蔬菜营养丰富，继续保持这样健康的饮食习惯")
+            if not recommendations:
+                recommendations.append("饮食搭配较为均衡，继续保持")
+            
+            results.append({
+                'nutrition_analysis': {
+                    'calories_per_100g': round(per_100g, 2),
+                    'nutrient_density': density_levels[density_level],
+                    'macros_ratio': macros_ratio,
+                    'type_evaluation': type_evaluations[food_type],
+                    'health_rating': stars
+                },
+                'daily_total': dict(zip(NUTRIENTS, total)),
+                'balance_score': {
+                    nutrient: {
+                        'value': round(value, 2),
+                        'standard': standard,
+                        'percentage': round(pct, 1),
+                        'status': balance_levels[level]
+                    }
+                    for nutrient, value, standard, pct, level in zip(NUTRIENTS, total, standard_values, percentage, state)
+                },
+                'health_score': score,
+                'recommendations': recommendations,
+                'analysis_method': 'mindspore_nutrition_model'
+            })
+        
+        return results
+    
+    def analyze_batch(
+        self,
+        foods: List[Dict[str, Any]],
+        user_profile: Dict[str, Any] = None,
+        daily_intake: List[Dict] = None
+    ) -> Dict[str, Any]:
+        """
+        批量分析一天内的多个食物
+        
+        全天总摄入只计算一次，各食物的LLM分析共用它并发执行。
+        
+        Args:
+            foods: 食物营养数据列表（格式同 process 的 food_data）
+            user_profile: 用户资料（可选）
+            daily_intake: 列表之外当天已摄入的食物（可选）
+            
+        Returns:
+            {'items': 与foods同序的分析结果, 'day_summary': 全天汇总}
+        """
+        user_profile = user_profile or {}
+        daily_total = self._calculate_daily_total((daily_intake or []) + list(foods), {})
+        
+        def analyze(food_data: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                return {
+                    'success': True,
+                    'food_name': food_data.get('foodName', '未知'),
+                    'analysis': self._analyze_item(food_data, user_profile, daily_total)
+                }
+            except Exception as e:
+                self.logger.error(f"批量分析中单个食物失败: {e}")
+                return {
+                    'success': False,
+                    'food_name': food_data.get('foodName', '未知'),
+                    'error': str(e)
+                }
+        
+        workers = max(1, min(self.batch_max_workers, len(foods)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='nutrition-batch') as executor:
+            items = list(executor.map(propagate(analyze), foods))
+        
+        self.logger.info(f"批量营养分析完成: {len(foods)} 个食物，并发 {workers}")
+        
+        return {
+            'items': items,
+            'day_summary': self._summarize_day(foods, items, daily_total, user_profile)
+        }
+    
+    def _analyze_item(self, food_data: Dict[str, Any], user_profile: Dict[str, Any], daily_total: Dict[str, float]) -> Dict[str, Any]:
+        """在已知全天总摄入的前提下分析单个食物（优先LLM，失败降级到规则）"""
+        if self.use_llm and self.llm_client:
+            try:
+                return self._analyze_with_llm(food_data, user_profile, [], daily_total)
+            except Exception as e:
+                self.logger.error(f"LLM分析失败，使用规则系统: {e}")
+        
+        return self._analyze_with_rules(food_data, user_profile, [], daily_total)
+    
+    def _summarize_day(
+        self,
+        foods: List[Dict[str, Any]],
+        items: List[Dict[str, Any]],
+        daily_total: Dict[str, float],
+        user_profile: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """汇总全天的营养情况"""
+        scores = [item['analysis'].get('health_score', 0) for item in items if item['success']]
+        top_calorie_foods = sorted(foods, key=lambda food: food.get('calories', 0), reverse=True)[:3]
+        
+        return {
+            'food_count': len(foods),
+            'analyzed_count': len(scores),
+            'daily_total': daily_total,
+            'balance_score': self._evaluate_nutrition_balance(daily_total),
+            'average_health_score': round(sum(scores) / len(scores), 1) if scores else None,
+            'top_calorie_foods': [
+                {'food_name': food.get('foodName', '未知'), 'calories': food.get('calories', 0)}
+                for food in top_calorie_foods
+            ],
+            'recommendations': self._generate_recommendations({}, daily_total, user_profile)
+        }
+    
+    def _analyze_with_llm(
+        self,
+        food_data: Dict[str, Any],
+        user_profile: Dict[str, Any],
+        daily_intake: List[Dict],
+        daily_total: Dict[str, float] = None
+    ) -> Dict[str, Any]:
+        """使用GLM-4进行营养分析（daily_total 已知时不再重复计算）"""
         # 计算每日总摄入
-        daily_total = self._calculate_daily_total(daily_intake, food_data)
+        if daily_total is None:
+            daily_total = self._calculate_daily_total(daily_intake, food_data)
         
         prompt = f"""请作为营养师分析以下情况：
 
@@ -136,7 +435,7 @@ class NutritionAnalyzerAgent(BaseAgent):
   "health_score": 85,
   "balance_status": "均衡/偏高/偏低"
 }}"""
-
+        
         messages = [
             {"role": "system", "content": "你是一个专业的营养师，擅长分析饮食营养并提供专业建议。"},
             {"role": "user", "content": prompt}
@@ -170,16 +469,23 @@ class NutritionAnalyzerAgent(BaseAgent):
                 'balance_status': llm_result.get('balance_status', '均衡'),
                 'analysis_method': 'glm-4-nutrition-analysis'
             }
-            
+        
         except Exception as e:
             self.logger.error(f"LLM响应解析失败: {e}")
             # 降级到规则系统
-            return self._analyze_with_rules(food_data, user_profile, daily_intake)
+            return self._analyze_with_rules(food_data, user_profile, daily_intake, daily_total)
     
-    def _analyze_with_rules(self, food_data: Dict[str, Any], user_profile: Dict[str, Any], daily_intake: List[Dict]) -> Dict[str, Any]:
+    def _analyze_with_rules(
+        self,
+        food_data: Dict[str, Any],
+        user_profile: Dict[str, Any],
+        daily_intake: List[Dict],
+        daily_total: Dict[str, float] = None
+    ) -> Dict[str, Any]:
         """规则系统分析（降级方案）"""
         nutrition_analysis = self._analyze_single_food(food_data)
-        daily_total = self._calculate_daily_total(daily_intake, food_data)
+        if daily_total is None:
+            daily_total = self._calculate_daily_total(daily_intake, food_data)
         balance_score = self._evaluate_nutrition_balance(daily_total)
         recommendations = self._generate_recommendations(food_data, daily_total, user_profile)
         health_score = self._calculate_health_score(food_data, daily_total, balance_score)
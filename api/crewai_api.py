@@ -3,56 +3,222 @@ CrewAI框架专用API服务 - 真正的多智能体协作
 提供基于 CrewAI + 业务工具的深度集成接口
 """
 
-from flask import Flask, request, jsonify, Blueprint
+from flask import Flask, request, jsonify, Blueprint, Response, stream_with_context
 from flask_cors import CORS
 from loguru import logger
 import sys
 import os
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from agents.food_recognition_agent import FoodRecognitionAgent
-from agents.nutrition_analyzer_agent import NutritionAnalyzerAgent
+from agents.nutrition_analyzer_agent import NutritionAnalyzerAgent, NUTRIENTS
 from agents.health_goal_agent import HealthGoalAgent
 from agents.meal_planner_agent import MealPlannerAgent
 from agents.conversation_agent import ConversationAgent
 from agents.community_recommendation_agent import CommunityRecommendationAgent
-from utils.crewai_adapter import create_health_crew, create_weight_loss_workflow
+from utils.crewai_adapter import (
+    create_health_crew,
+    create_weight_loss_workflow,
+    create_request_crew,
+    fork_adapters,
+    build_task_messages,
+    prefetch_embedder,
+    WEIGHT_LOSS_TASK_NAMES
+)
+from utils.dag_scheduler import DAGScheduler
+from utils.fast_workflow import run_fast_weight_loss_workflow, run_rule_steps, build_summary_messages, build_rule_summary
+from utils.job_queue import JobManager, FINISHED_STATES, JOB_CANCELLED, JOB_RUNNING
+from utils.result_cache import ResultCache, make_result_key
+from utils.warmup import WarmupManager, ComponentSkipped
+from utils.metrics import format_prometheus
+from utils.tracing import configure_tracing, start_trace
+from utils.deadline import deadline_scope
+from utils.llm_registry import get_client_registry
 
 # 创建Blueprint
 crewai_bp = Blueprint('crewai', __name__, url_prefix='/crewai')
 
-# 全局变量存储crew实例
+# 全局变量存储智能体和模板crew实例（只读，每个请求基于它创建独立的Crew）
+_agents = None
 _crew = None
 _adapters = None
+_init_lock = threading.RLock()
+
+# 工作流执行模式：
+#   crew: CrewAI分层流程，逐个执行
+#   dag:  按依赖图并发执行
+#   fast: 规则步骤直接计算，只有综合总结调用LLM（不需要初始化Crew）
+WORKFLOW_MODES = ('crew', 'dag', 'fast')
+_dag_scheduler = DAGScheduler(max_workers=4)
+
+# /process 请求总时限(秒)：请求体可用 "timeout" 缩短或延长，但不超过上限；
+# 时限随调用链传到各智能体和LLM客户端，用完后LLM步骤降级为规则结果
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv('CREWAI_REQUEST_TIMEOUT', 60))
+MAX_REQUEST_TIMEOUT = 300
+
+# 异步任务不占用客户端连接，默认不设总时限（可用 CREWAI_JOB_TIMEOUT 设置秒数），
+# 请求体中显式给出的 "timeout" 仍然生效
+DEFAULT_JOB_TIMEOUT = float(os.environ['CREWAI_JOB_TIMEOUT']) if os.getenv('CREWAI_JOB_TIMEOUT') else None
+
+# 请求上下文中的减脂参数（出现时必须是正数，其中天数必须是整数）
+CONTEXT_NUMBER_FIELDS = ('current_weight', 'target_weight', 'days', 'target_calories')
+CONTEXT_INT_FIELDS = ('days',)
+
+# 批量营养分析单次最多的食物数
+MAX_BATCH_FOODS = 100
+
+# /process 结果缓存：相同的减脂上下文直接返回上次生成的计划
+RESULT_CACHE_TTL = 3600
+RESULT_CACHE_MAX_ENTRIES = 512
+# 结果中可能包含用户ID（LLM按任务描述生成）的执行模式，缓存按用户区分
+USER_SPECIFIC_MODES = ('crew', 'dag')
+_result_cache = ResultCache(max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL)
+
+# 异步任务管理器（首次提交任务时创建）
+_job_manager = None
+
+# 服务预热管理器（create_crewai_app 时启动）
+_warmup = None
+
+# 业务智能体（名称 -> 类）
+AGENT_CLASSES = {
+    'food': FoodRecognitionAgent,
+    'nutrition': NutritionAnalyzerAgent,
+    'health': HealthGoalAgent,
+    'meal': MealPlannerAgent,
+    'conversation': ConversationAgent,
+    'recommendation': CommunityRecommendationAgent
+}
+
+# 各智能体的构造耗时（秒）
+_agent_init_times = {}
+
+
+def _build_agent(name: str):
+    """构造单个智能体并记录耗时"""
+    start = time.perf_counter()
+    agent = AGENT_CLASSES[name]()
+    _agent_init_times[name] = round(time.perf_counter() - start, 3)
+    return agent
+
+
+def init_agents():
+    """初始化所有业务智能体（crew模式和fast模式共用），各智能体并行构造"""
+    global _agents
+    
+    if _agents is not None:
+        return _agents
+    
+    with _init_lock:
+        if _agents is None:
+            with ThreadPoolExecutor(max_workers=len(AGENT_CLASSES), thread_name_prefix='agent-init') as executor:
+                futures = {name: executor.submit(_build_agent, name) for name in AGENT_CLASSES}
+                _agents = {name: future.result() for name, future in futures.items()}
+    
+    return _agents
+
+
+def _warm_agents() -> dict:
+    """预热业务智能体"""
+    init_agents()
+    return {'init_times': dict(_agent_init_times)}
+
+
+def _warm_crew() -> dict:
+    """预热模板Crew（记忆组件在此创建）"""
+    _, adapters = init_crew()
+    return {'agents': list(adapters.keys())}
+
+
+def _warm_embedder() -> dict:
+    """
+    预取Crew记忆使用的embedder：导入依赖并下载模型文件（未安装 sentence-transformers 时跳过）
+    
+    模型实例由 CrewAI 在预热 crew 时创建，这里就绪只表示依赖已导入、模型文件已在本地缓存。
+    """
+    try:
+        files = prefetch_embedder()
+    except ImportError as e:
+        raise ComponentSkipped(f"未安装 sentence-transformers: {e}")
+    return dict(files, note='已导入依赖并下载模型文件；模型实例由CrewAI在预热crew时创建')
+
+
+def get_warmup() -> WarmupManager:
+    """
+    获取服务预热管理器
+    
+    组件：agents（6个智能体并行构造）、embedder（与智能体同时导入依赖、下载模型文件）、
+    crew（依赖前两者，CrewAI在此加载embedder模型）。fast模式只需要 agents 就绪。
+    """
+    global _warmup
+    
+    if _warmup is None:
+        with _init_lock:
+            if _warmup is None:
+                warmup = WarmupManager()
+                warmup.add('agents', _warm_agents)
+                warmup.add('embedder', _warm_embedder, required=False)
+                warmup.add('crew', _warm_crew, depends_on=['agents', 'embedder'])
+                _warmup = warmup
+    
+    return _warmup
+
+
+def start_warmup() -> WarmupManager:
+    """在后台线程开始预热（重复调用无效果）"""
+    return get_warmup().start()
+
+
+def init_tracing():
+    """
+    按环境变量配置链路追踪导出
+    
+    CREWAI_TRACE_FILE: JSON Lines 文件路径（如 logs/traces.jsonl）
+    CREWAI_OTLP_ENDPOINT: OTLP/HTTP 接收地址（如 http://localhost:4318/v1/traces）
+    都未设置时只在请求带 "trace": true 时随响应返回汇总
+    """
+    configure_tracing(
+        jsonl_path=os.getenv('CREWAI_TRACE_FILE'),
+        otlp_endpoint=os.getenv('CREWAI_OTLP_ENDPOINT')
+    )
 
 
 def init_crew():
     """初始化CrewAI Crew - 带工具集成"""
     global _crew, _adapters
     
-    if _crew is None:
+    if _crew is not None:
+        return _crew, _adapters
+    
+    with _init_lock:
+        if _crew is not None:
+            return _crew, _adapters
+        
         logger.info("="*60)
         logger.info("🚀 正在初始化真正的 CrewAI Crew（带业务工具）...")
         logger.info("="*60)
         
         # 初始化所有智能体
-        food_agent = FoodRecognitionAgent()
-        nutrition_agent = NutritionAnalyzerAgent()
-        health_agent = HealthGoalAgent()
-        meal_agent = MealPlannerAgent()
-        conversation_agent = ConversationAgent()
-        recommendation_agent = CommunityRecommendationAgent()
+        agents = init_agents()
         
         # 创建Crew（带工具）
-        _crew, _adapters = create_health_crew(
-            food_agent,
-            nutrition_agent,
-            health_agent,
-            meal_agent,
-            conversation_agent,
-            recommendation_agent
+        crew, adapters = create_health_crew(
+            agents['food'],
+            agents['nutrition'],
+            agents['health'],
+            agents['meal'],
+            agents['conversation'],
+            agents['recommendation']
         )
         
+        # 先写 _adapters 再写 _crew，无锁读取方看到 _crew 时 _adapters 已就绪
+        _adapters = adapters
+        _crew = crew
+        
         logger.info("="*60)
         logger.info("✅ CrewAI Crew 初始化完成")
         logger.info(f"📊 已注册智能体: {list(_adapters.keys())}")
@@ -62,10 +228,593 @@ def init_crew():
     return _crew, _adapters
 
 
-@crewai_bp.route('/health', methods=['GET'])
-def health_check():
-    """健康检查"""
-    return jsonify({
+def _request_scope():
+    """
+    创建请求级的执行环境
+    
+    Returns:
+        (模板Crew, 请求级适配器字典)；适配器中的CrewAI Agent为本请求独享，
+        并发请求之间不会互相覆盖任务和执行状态
+    """
+    crew, adapters = init_crew()
+    return crew, fork_adapters(adapters)
+
+
+def _is_weight_loss_request(context: dict) -> bool:
+    """判断是否为减脂场景"""
+    goal_type = context.get('goal_type', 'weight_loss')
+    return goal_type == 'weight_loss' or bool(context.get('current_weight') and context.get('target_weight'))
+
+
+def _build_workflow_input(user_id, context: dict) -> dict:
+    """从请求上下文构建减脂工作流输入"""
+    return {
+        'user_id': user_id,
+        'current_weight': context.get('current_weight', 75),
+        'target_weight': context.get('target_weight', 70),
+        'days': context.get('days', 30),
+        'target_calories': context.get('target_calories', 1800),
+        'dietary_preferences': context.get('dietary_preferences', []),
+        'restrictions': context.get('restrictions', []),
+        'historical_data': context.get('historical_data', [])
+    }
+
+
+def _create_general_task(adapters, user_message: str, user_id, context: dict):
+    """创建通用咨询任务"""
+    from crewai import Task
+    
+    return Task(
+        description=f"""
+        用户请求: {user_message}
+        用户ID: {user_id}
+        上下文信息: {context}
+        
+        请理解用户需求，协调相关智能体完成任务。
+        """,
+        expected_output="完整的智能响应",
+        agent=adapters['conversation'].crew_agent
+    )
+
+
+def _run_workflow(crew, adapters, tasks, workflow_mode: str, names=None, on_progress=None):
+    """
+    执行任务列表
+    
+    Args:
+        crew: 模板Crew实例
+        adapters: 请求级适配器字典（任务应由这些适配器创建）
+        tasks: 任务列表
+        workflow_mode: 执行模式（crew / dag）
+        names: 任务名称列表（用于调度报告和进度回调）
+        on_progress: 每个任务完成后的回调 on_progress(task_name, **info)
+        
+    Returns:
+        (最后一个任务的输出, 调度报告)，crew模式下调度报告为None
+    """
+    names = list(names) if names else [f"task{i + 1}" for i in range(len(tasks))]
+    
+    if workflow_mode == 'dag':
+        logger.info("⚡ 按依赖图并发执行工作流...")
+        on_task_done = None
+        if on_progress:
+            on_task_done = lambda name, duration: on_progress(name, duration=round(duration, 3))
+        run = _dag_scheduler.run(tasks, names=names, on_task_done=on_task_done)
+        report = run['report']
+        logger.info(
+            f"📊 关键路径: {' -> '.join(report['critical_path'])} "
+            f"({report['critical_path_time']}s / 总耗时 {report['wall_time']}s)"
+        )
+        return run['outputs'][-1], report
+    
+    # CrewAI 在每个 Task 完成后调用 task.callback
+    if on_progress:
+        for task, name in zip(tasks, names):
+            task.callback = lambda output, name=name: on_progress(name)
+    
+    # 每个请求使用独立的Crew，CrewAI 会按依赖顺序执行各个 Task
+    request_crew = create_request_crew(crew, adapters, tasks)
+    return request_crew.kickoff(), None
+
+
+def _fast_weight_loss_response(user_id, result: dict) -> dict:
+    """把快速减脂工作流的结果转换为响应数据（Flask和ASGI服务共用）"""
+    return {
+        'response': result['response'],
+        'user_id': user_id,
+        'scenario': 'weight_loss',
+        'workflow_mode': 'fast',
+        'steps': result['steps'],
+        'details': result['facts'],
+        'llm_calls_made': result['llm_calls_made'],
+        'llm_calls_skipped_estimate': result['llm_calls_skipped_estimate']
+    }
+
+
+def _process_fast(user_message: str, user_id, context: dict, on_progress=None) -> dict:
+    """
+    快速模式：规则步骤直接执行，只调用一次LLM
+    
+    Args:
+        on_progress: 每个步骤完成后的回调 on_progress(step_name, **info)
+        
+    Returns:
+        响应数据
+    """
+    agents = init_agents()
+    
+    if _is_weight_loss_request(context):
+        logger.info("🎯 场景识别: 减脂健康计划（快速模式）")
+        workflow_input = _build_workflow_input(user_id, context)
+        result = run_fast_weight_loss_workflow(agents, workflow_input, on_step=on_progress)
+        return _fast_weight_loss_response(user_id, result)
+    
+    # 通用咨询：直接由 ConversationAgent 回答（一次LLM调用），不经过 manager 协调
+    logger.info("🎯 场景识别: 通用咨询（快速模式）")
+    conversation = agents['conversation']
+    result = conversation.execute({
+        'user_id': user_id,
+        'session_id': context.get('session_id'),
+        'message': user_message,
+        'context': context
+    })
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    if on_progress:
+        on_progress('conversation')
+    
+    return {
+        'response': result['data']['response'],
+        'user_id': user_id,
+        'scenario': 'general',
+        'workflow_mode': 'fast',
+        'llm_calls_made': 1 if conversation.use_llm else 0
+    }
+
+
+def _validate_process_request(data: dict):
+    """校验 /process 类接口的请求体，返回错误信息（合法时返回None）"""
+    if not isinstance(data, dict):
+        return '请求体必须是JSON对象'
+    if 'message' not in data and 'context' not in data:
+        return '缺少message或context字段'
+    if not isinstance(data.get('message', ''), str):
+        return 'message必须是字符串'
+    
+    error = _validate_context(data.get('context', {}))
+    if error:
+        return error
+    
+    workflow_mode = data.get('workflow_mode', 'crew')
+    if workflow_mode not in WORKFLOW_MODES:
+        return f'不支持的workflow_mode: {workflow_mode}，可选值: {list(WORKFLOW_MODES)}'
+    
+    timeout = data.get('timeout')
+    if timeout is not None and (
+        isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not 0 < timeout <= MAX_REQUEST_TIMEOUT
+    ):
+        return f'timeout 必须是 (0, {MAX_REQUEST_TIMEOUT}] 之间的秒数'
+    
+    return None
+
+
+def _validate_context(context):
+    """校验请求上下文及其中的减脂参数（出现时必须是正数，days必须是整数），返回错误信息（合法时返回None）"""
+    if not isinstance(context, dict):
+        return 'context必须是对象'
+    for field in CONTEXT_NUMBER_FIELDS:
+        if field not in context:
+            continue
+        value = context[field]
+        number_types = int if field in CONTEXT_INT_FIELDS else (int, float)
+        if isinstance(value, bool) or not isinstance(value, number_types) or value <= 0:
+            kind = '正整数' if field in CONTEXT_INT_FIELDS else '正数'
+            return f'context.{field} 必须是{kind}，当前为 {value!r}'
+    return None
+
+
+def _request_timeout(data: dict) -> float:
+    """请求总时限(秒)"""
+    return data.get('timeout') or DEFAULT_REQUEST_TIMEOUT
+
+
+def _job_timeout(data: dict):
+    """异步任务总时限(秒)，None表示不限时"""
+    return data.get('timeout') or DEFAULT_JOB_TIMEOUT
+
+
+def _handle_process(data: dict, on_progress=None):
+    """
+    执行一次完整的处理请求（/process 和异步任务共用）
+    
+    Args:
+        data: 请求体（已校验）
+        on_progress: 步骤完成回调 on_progress(step_name, **info)，可在其中抛出异常中止后续步骤
+        
+    Returns:
+        (响应数据, 提示信息)
+    """
+    user_message = data.get('message', '')
+    user_id = data.get('user_id', 0)
+    context = data.get('context', {})
+    workflow_mode = data.get('workflow_mode', 'crew')
+    
+    logger.info("="*60)
+    logger.info(f"📥 收到用户请求")
+    logger.info(f"👤 用户ID: {user_id}")
+    logger.info(f"💬 消息: {user_message}")
+    logger.info(f"📋 上下文: {context}")
+    logger.info("="*60)
+    
+    if workflow_mode == 'fast':
+        response_data = _process_fast(user_message, user_id, context, on_progress)
+        logger.info(
+            f"✅ 快速模式完成: LLM调用 {response_data['llm_calls_made']} 次，"
+            f"约跳过 {response_data.get('llm_calls_skipped_estimate', 0)} 次"
+        )
+        return response_data, '快速模式处理完成（规则步骤直接计算）'
+    
+    # 初始化Crew（请求级）
+    crew, adapters = _request_scope()
+    
+    # 判断场景类型（这里演示减脂场景）
+    if _is_weight_loss_request(context):
+        # 减脂场景：使用完整的多步工作流
+        logger.info("🎯 场景识别: 减脂健康计划")
+        logger.info("🔄 启动多步协作流程...")
+        
+        # 准备输入数据
+        workflow_input = _build_workflow_input(user_id, context)
+        
+        # 创建多步工作流
+        tasks = create_weight_loss_workflow(crew, adapters, workflow_input)
+        
+        logger.info(f"📝 创建了 {len(tasks)} 个协作任务")
+        for i, task in enumerate(tasks, 1):
+            logger.info(f"   Task {i}: {task.description[:50]}...")
+        
+        # 执行工作流
+        logger.info(f"⚡ 开始执行 CrewAI 工作流 (模式: {workflow_mode})...")
+        result, schedule = _run_workflow(crew, adapters, tasks, workflow_mode, WEIGHT_LOSS_TASK_NAMES, on_progress)
+        logger.info("✅ 工作流执行完成")
+        
+        response_data = {
+            'response': str(result),
+            'user_id': user_id,
+            'scenario': 'weight_loss',
+            'tasks_executed': len(tasks),
+            'coordinated_agents': list(adapters.keys()),
+            'workflow_type': 'multi_step_validation',
+            'workflow_mode': workflow_mode
+        }
+        if schedule:
+            response_data['schedule'] = schedule
+        
+        return response_data, 'CrewAI多智能体协作完成（带业务工具和显式校验）'
+    
+    # 其他场景：使用简化流程
+    logger.info("🎯 场景识别: 通用咨询")
+    
+    main_task = _create_general_task(adapters, user_message, user_id, context)
+    
+    result, _ = _run_workflow(crew, adapters, [main_task], 'crew', ['general'], on_progress)
+    
+    return {
+        'response': str(result),
+        'user_id': user_id,
+        'scenario': 'general',
+        'coordinated_agents': list(adapters.keys())
+    }, 'CrewAI协作完成'
+
+
+def _traced_process(data: dict, timeout, on_progress=None):
+    """
+    在一条新的trace中、按总时限执行 _handle_process
+    
+    Args:
+        data: 请求体
+        timeout: 总时限(秒)，None表示不限时
+        on_progress: 进度回调
+        
+    Returns:
+        (响应数据, 提示信息, 根span)
+    """
+    with deadline_scope(timeout) as deadline, start_trace(
+        'crewai.process',
+        user_id=data.get('user_id', 0),
+        workflow_mode=data.get('workflow_mode', 'crew')
+    ) as root:
+        response_data, message = _handle_process(data, on_progress)
+    return _mark_deadline(response_data, deadline), message, root
+
+
+def _mark_deadline(response_data: dict, deadline) -> dict:
+    """超出请求时限（部分步骤已降级）时在响应数据中标记 deadline_exceeded"""
+    if deadline is None or not deadline.expired:
+        return response_data
+    logger.warning(f"⏱️ 请求超出时限 {deadline.timeout}秒，部分步骤使用了规则降级结果")
+    return dict(response_data, deadline_exceeded=True)
+
+
+def _attach_trace(response_data: dict, data: dict, root) -> dict:
+    """请求带 "trace": true 时在响应数据中附上trace汇总（不修改缓存中的数据）"""
+    if root is None or not data.get('trace'):
+        return response_data
+    return dict(response_data, trace=root.trace.summary())
+
+
+def _result_cache_key(data: dict):
+    """
+    生成 /process 结果缓存键
+    
+    减脂场景的响应只由工作流输入和执行模式决定，按规范化后的工作流输入生成缓存键
+    （未填写的字段按默认值处理，偏好和限制与顺序无关）；
+    通用咨询依赖会话上下文，不缓存。
+    
+    crew/dag 模式的任务描述和工具参数中带有用户ID，LLM生成的文本可能引用它，
+    缓存键包含 user_id；fast 模式的 user_id 只回显在响应中，不同用户共享结果，
+    命中时替换为当前请求的用户。
+    
+    Returns:
+        缓存键，不可缓存时返回None
+    """
+    context = data.get('context', {})
+    if not _is_weight_loss_request(context):
+        return None
+    
+    workflow_mode = data.get('workflow_mode', 'crew')
+    user_id = data.get('user_id', 0) if workflow_mode in USER_SPECIFIC_MODES else None
+    workflow_input = _build_workflow_input(user_id, context)
+    if user_id is None:
+        workflow_input.pop('user_id')
+    return make_result_key({
+        'scenario': 'weight_loss',
+        'workflow_mode': workflow_mode,
+        'input': workflow_input
+    })
+
+
+def _cache_lookup(data: dict, cache_control: str = None):
+    """
+    查询 /process 结果缓存
+    
+    Args:
+        data: 请求体（已校验）
+        cache_control: 请求头 Cache-Control，含 no-cache 时跳过读取（仍会写入新结果）
+        
+    Returns:
+        (缓存键, 命中的 (响应数据, 提示信息) 或 None, 响应头)
+    """
+    key = _result_cache_key(data)
+    if key is None:
+        return None, None, {'X-Cache': 'BYPASS'}
+    
+    headers = {'X-Cache-Key': key[:16]}
+    if 'no-cache' in (cache_control or '').lower():
+        _result_cache.record_bypass()
+        headers['X-Cache'] = 'BYPASS'
+        return key, None, headers
+    
+    cached = _result_cache.get(key)
+    if cached is None:
+        headers['X-Cache'] = 'MISS'
+        return key, None, headers
+    
+    (response_data, message), age = cached
+    headers['X-Cache'] = 'HIT'
+    headers['Age'] = str(int(age))
+    logger.info(f"⚡ 结果缓存命中: {key[:16]}")
+    return key, (dict(response_data, user_id=data.get('user_id', 0)), message), headers
+
+
+def _cache_store(key, response_data: dict, message: str):
+    """写入 /process 结果缓存（不可缓存的请求 key 为None，超出时限的降级结果也不缓存）"""
+    if key is not None and not response_data.get('deadline_exceeded'):
+        _result_cache.set(key, (response_data, message))
+
+
+def _invalidate_result_cache(data: dict) -> int:
+    """
+    使 /process 结果缓存失效
+    
+    Args:
+        data: 含 context（和可选的 workflow_mode、user_id）时只删除对应条目，否则清空全部
+        
+    Returns:
+        删除的条目数
+    """
+    if data.get('context'):
+        key = _result_cache_key(data)
+        return _result_cache.invalidate(key) if key else 0
+    return _result_cache.invalidate()
+
+
+def _validate_nutrition_batch_request(data: dict):
+    """校验批量营养分析的请求体，返回错误信息（合法时返回None）"""
+    if not isinstance(data, dict):
+        return '请求体必须是JSON对象'
+    foods = data.get('foods')
+    if not isinstance(foods, list) or not foods:
+        return '缺少foods字段或foods为空'
+    if len(foods) > MAX_BATCH_FOODS:
+        return f'foods最多{MAX_BATCH_FOODS}个，当前{len(foods)}个'
+    if not all(isinstance(food, dict) for food in foods):
+        return 'foods中的每一项都必须是食物营养数据对象'
+    if not isinstance(data.get('user_profile', {}), dict):
+        return 'user_profile必须是对象'
+    daily_intake = data.get('daily_intake', [])
+    if not isinstance(daily_intake, list):
+        return 'daily_intake必须是列表'
+    if not all(isinstance(food, dict) for food in daily_intake):
+        return 'daily_intake中的每一项都必须是食物营养数据对象'
+    return _nutrient_error('foods', foods) or _nutrient_error('daily_intake', daily_intake)
+
+
+def _nutrient_error(field: str, items: list):
+    """校验各项的营养素字段（缺省视为0）都是数字，返回错误信息（合法时返回None）"""
+    for index, item in enumerate(items):
+        for nutrient in NUTRIENTS:
+            value = item.get(nutrient, 0)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return f'{field}[{index}].{nutrient} 必须是数字，当前为 {value!r}'
+    return None
+
+
+def _handle_nutrition_batch(data: dict) -> dict:
+    """执行批量营养分析（Flask和ASGI服务共用）"""
+    nutrition = init_agents()['nutrition']
+    return nutrition.analyze_batch(
+        data['foods'],
+        user_profile=data.get('user_profile', {}),
+        daily_intake=data.get('daily_intake', [])
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一条SSE消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _fast_rule_reply(conversation, user_id, user_message: str, context: dict, facts: dict = None) -> str:
+    """
+    LLM未启用时快速模式流式接口的回复（与非流式快速模式的规则结果一致）
+    
+    Args:
+        facts: 减脂场景规则步骤的结果（通用咨询为None）
+    """
+    if facts is not None:
+        return build_rule_summary(facts)
+    
+    result = conversation.execute({
+        'user_id': user_id,
+        'session_id': context.get('session_id'),
+        'message': user_message,
+        'context': context
+    })
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return result['data']['response']
+
+
+def _stream_events(data: dict):
+    """
+    生成流式处理的SSE消息（Flask服务和ASGI服务的同步路径共用）
+    
+    与 /process 一样在请求总时限内、在一条新的trace中执行；started 事件带trace ID，
+    超出时限（部分步骤已降级）时 done 事件带 "deadline_exceeded": true
+    
+    Args:
+        data: 请求体（已校验）
+        
+    Yields:
+        SSE格式的消息文本
+    """
+    user_message = data.get('message', '')
+    user_id = data.get('user_id', 0)
+    context = data.get('context', {})
+    workflow_mode = data.get('workflow_mode', 'crew')
+    
+    def generate_fast():
+        """快速模式：规则步骤直接计算，总结逐token输出"""
+        agents = init_agents()
+        conversation = agents['conversation']
+        
+        facts = None
+        if _is_weight_loss_request(context):
+            scenario = 'weight_loss'
+            workflow_input = _build_workflow_input(user_id, context)
+            result = run_rule_steps(agents, workflow_input)
+            facts = result['facts']
+            messages = build_summary_messages(workflow_input, facts, conversation.system_prompt)
+            yield _sse('status', {
+                'stage': 'upstream_completed',
+                'steps': result['steps'],
+                'details': facts
+            })
+        else:
+            scenario = 'general'
+            messages = [
+                {"role": "system", "content": conversation.system_prompt},
+                {"role": "user", "content": user_message}
+            ]
+        
+        yield _sse('status', {'stage': 'summarizing'})
+        
+        llm_calls_made = 0
+        if conversation.use_llm and conversation.llm_client:
+            llm_calls_made = 1
+            for chunk in conversation.llm_client.chat_stream(messages):
+                yield _sse('token', {'content': chunk})
+        else:
+            yield _sse('token', {'content': _fast_rule_reply(conversation, user_id, user_message, context, facts)})
+        
+        yield _sse('done', _mark_deadline({
+            'user_id': user_id,
+            'scenario': scenario,
+            'workflow_mode': 'fast',
+            'llm_calls_made': llm_calls_made
+        }, deadline))
+    
+    with deadline_scope(_request_timeout(data)) as deadline, start_trace(
+        'crewai.process',
+        user_id=user_id,
+        workflow_mode=workflow_mode,
+        stream=True
+    ) as root:
+        try:
+            yield _sse('status', {'stage': 'started', 'user_id': user_id, 'trace_id': root.trace_id})
+            
+            if workflow_mode == 'fast':
+                yield from generate_fast()
+                return
+            
+            crew, adapters = _request_scope()
+            
+            if _is_weight_loss_request(context):
+                scenario = 'weight_loss'
+                workflow_input = _build_workflow_input(user_id, context)
+                tasks = create_weight_loss_workflow(crew, adapters, workflow_input)
+                names = WEIGHT_LOSS_TASK_NAMES
+            else:
+                scenario = 'general'
+                tasks = [_create_general_task(adapters, user_message, user_id, context)]
+                names = None
+            
+            # 前置任务交给 Crew（或DAG调度器）执行，最后一步（ConversationAgent 总结）直接流式生成
+            upstream_tasks, final_task = tasks[:-1], tasks[-1]
+            schedule = None
+            if upstream_tasks:
+                logger.info(f"⚡ 执行 {len(upstream_tasks)} 个前置任务...")
+                _, schedule = _run_workflow(crew, adapters, upstream_tasks, workflow_mode, names[:-1] if names else None)
+            
+            upstream_status = {'stage': 'upstream_completed', 'tasks_executed': len(upstream_tasks)}
+            if schedule:
+                upstream_status['schedule'] = schedule
+            yield _sse('status', upstream_status)
+            
+            context_outputs = [str(task.output) for task in (final_task.context or []) if task.output]
+            messages = build_task_messages(adapters['conversation'], final_task, context_outputs)
+            
+            yield _sse('status', {'stage': 'summarizing'})
+            
+            for chunk in adapters['conversation'].llm.client.chat_stream(messages):
+                yield _sse('token', {'content': chunk})
+            
+            yield _sse('done', _mark_deadline({
+                'user_id': user_id,
+                'scenario': scenario,
+                'tasks_executed': len(tasks),
+                'coordinated_agents': list(adapters.keys())
+            }, deadline))
+        
+        except Exception as e:
+            logger.error(f"❌ CrewAI流式处理失败: {e}", exc_info=True)
+            yield _sse('error', {'error': str(e)})
+
+
+def _health_data() -> dict:
+    """健康检查的响应数据"""
+    return {
         'status': 'healthy',
         'service': 'CrewAI Multi-Agent System',
         'version': '2.0.0',
@@ -76,7 +825,28 @@ def health_check():
             '多步协作流程',
             '显式校验和约束'
         ]
-    })
+    }
+
+
+@crewai_bp.route('/health', methods=['GET'])
+def health_check():
+    """健康检查"""
+    return jsonify(_health_data())
+
+
+@crewai_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    就绪检查
+    
+    所有必要组件（agents、crew）预热完成返回200，否则返回503。
+    components 中给出每个组件的状态（pending / warming / ready / failed / skipped）和耗时。
+    """
+    status = get_warmup().get_status()
+    return jsonify({
+        'success': True,
+        'data': status
+    }), 200 if status['ready'] else 503
 
 
 @crewai_bp.route('/process', methods=['POST'])
@@ -95,7 +865,12 @@ def process_request():
             "target_calories": 1800,
             "dietary_preferences": ["高蛋白", "低碳水"],
             "restrictions": ["不吃辣"]
-        }
+        },
+        "workflow_mode": "crew",  // 可选: crew（默认）/ dag（按依赖图并发执行，返回调度报告）
+                                  //       fast（规则步骤直接计算，只有总结调用LLM）
+        "trace": false,           // 可选: true 时响应附带链路追踪汇总（各智能体、工具、LLM、检索耗时）
+        "timeout": 60             // 可选: 请求总时限(秒)，用完后LLM步骤降级为规则结果，
+                                  //       响应数据带 "deadline_exceeded": true 且不写入结果缓存
     }
     
     内部流程：
@@ -106,108 +881,39 @@ def process_request():
     5. ConversationAgent: 综合总结
     
     各智能体会调用自己的业务工具（BaseAgent.process方法）
+    
+    减脂场景的结果按规范化后的上下文缓存，响应头 X-Cache 为 HIT / MISS / BYPASS；
+    请求头 Cache-Control: no-cache 可跳过缓存重新生成。
+    实际执行（未命中缓存）的请求响应头 X-Trace-Id 为本次的trace ID。
     """
     try:
-        data = request.get_json()
+        # 请求体不是合法的JSON时 data 为None，由校验返回400
+        data = request.get_json(silent=True)
         
-        # 验证必需字段
-        if 'message' not in data and 'context' not in data:
+        error = _validate_process_request(data)
+        if error:
             return jsonify({
                 'success': False,
-                'error': '缺少message或context字段'
+                'error': error
             }), 400
         
-        user_message = data.get('message', '')
-        user_id = data.get('user_id', 0)
-        context = data.get('context', {})
-        
-        # 初始化Crew
-        crew, adapters = init_crew()
-        
-        logger.info("="*60)
-        logger.info(f"📥 收到用户请求")
-        logger.info(f"👤 用户ID: {user_id}")
-        logger.info(f"💬 消息: {user_message}")
-        logger.info(f"📋 上下文: {context}")
-        logger.info("="*60)
-        
-        # 判断场景类型（这里演示减脂场景）
-        goal_type = context.get('goal_type', 'weight_loss')
-        
-        if goal_type == 'weight_loss' or (context.get('current_weight') and context.get('target_weight')):
-            # 减脂场景：使用完整的多步工作流
-            logger.info("🎯 场景识别: 减脂健康计划")
-            logger.info("🔄 启动多步协作流程...")
-            
-            # 准备输入数据
-            workflow_input = {
-                'user_id': user_id,
-                'current_weight': context.get('current_weight', 75),
-                'target_weight': context.get('target_weight', 70),
-                'days': context.get('days', 30),
-                'target_calories': context.get('target_calories', 1800),
-                'dietary_preferences': context.get('dietary_preferences', []),
-                'restrictions': context.get('restrictions', [])
-            }
-            
-            # 创建多步工作流
-            tasks = create_weight_loss_workflow(crew, adapters, workflow_input)
-            
-            logger.info(f"📝 创建了 {len(tasks)} 个协作任务")
-            for i, task in enumerate(tasks, 1):
-                logger.info(f"   Task {i}: {task.description[:50]}...")
-            
-            # 执行Crew（CrewAI 会按依赖顺序执行各个 Task）
-            crew.tasks = tasks
-            logger.info("⚡ 开始执行 CrewAI 工作流...")
-            result = crew.kickoff()
-            logger.info("✅ 工作流执行完成")
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'response': str(result),
-                    'user_id': user_id,
-                    'scenario': 'weight_loss',
-                    'tasks_executed': len(tasks),
-                    'coordinated_agents': list(adapters.keys()),
-                    'workflow_type': 'multi_step_validation'
-                },
-                'message': 'CrewAI多智能体协作完成（带业务工具和显式校验）'
-            })
-        
+        key, cached, cache_headers = _cache_lookup(data, request.headers.get('Cache-Control'))
+        root = None
+        if cached:
+            response_data, message = cached
         else:
-            # 其他场景：使用简化流程
-            logger.info("🎯 场景识别: 通用咨询")
-            
-            from crewai import Task
-            
-            main_task = Task(
-                description=f"""
-                用户请求: {user_message}
-                用户ID: {user_id}
-                上下文信息: {context}
-                
-                请理解用户需求，协调相关智能体完成任务。
-                """,
-                expected_output="完整的智能响应",
-                agent=adapters['conversation'].crew_agent
-            )
-            
-            crew.tasks = [main_task]
-            result = crew.kickoff()
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'response': str(result),
-                    'user_id': user_id,
-                    'scenario': 'general',
-                    'coordinated_agents': list(adapters.keys())
-                },
-                'message': 'CrewAI协作完成'
-            })
+            response_data, message, root = _traced_process(data, _request_timeout(data))
+            _cache_store(key, response_data, message)
+            cache_headers['X-Trace-Id'] = root.trace_id
         
+        response = jsonify({
+            'success': True,
+            'data': _attach_trace(response_data, data, root),
+            'message': message
+        })
+        response.headers.update(cache_headers)
+        return response
+    
     except Exception as e:
         logger.error(f"❌ CrewAI处理失败: {e}", exc_info=True)
         return jsonify({
@@ -216,42 +922,322 @@ def process_request():
         }), 500
 
 
+@crewai_bp.route('/process/stream', methods=['POST'])
+def process_request_stream():
+    """
+    统一处理接口的流式版本（SSE）
+    
+    请求体与 /crewai/process 相同。前置任务（安全验证、营养约束、饮食计划、进度跟踪）
+    仍由 CrewAI 执行，最后由 ConversationAgent 生成的综合总结逐token推送给客户端。
+    
+    事件类型:
+        status: 阶段进度 {"stage": "started" | "upstream_completed" | "summarizing"}
+        token:  总结文本增量 {"content": "..."}
+        done:   完成 {"scenario": ..., "tasks_executed": ...}
+        error:  失败 {"error": "..."}
+    """
+    data = request.get_json(silent=True)
+    
+    error = _validate_process_request(data)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    
+    return Response(
+        stream_with_context(_stream_events(data)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@crewai_bp.route('/nutrition/batch', methods=['POST'])
+def nutrition_batch():
+    """
+    批量营养分析 - 一次分析一天内的多个食物
+    
+    请求体:
+    {
+        "foods": [                      // 食物营养数据列表（最多100个）
+            {"foodName": "燕麦粥", "calories": 150, "protein": 5, "carbohydrate": 27, "fat": 3, "fiber": 4, "foodType": "主食"},
+            ...
+        ],
+        "user_profile": {...},          // 可选
+        "daily_intake": [...]           // 可选：列表之外当天已摄入的食物
+    }
+    
+    全天总摄入只计算一次，各食物的分析并发执行。
+    返回 items（与foods同序的分析结果）和 day_summary（全天汇总）。
+    """
+    # 请求体不是合法的JSON时 data 为None，由校验返回400
+    data = request.get_json(silent=True)
+    
+    error = _validate_nutrition_batch_request(data)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    
+    try:
+        result = _handle_nutrition_batch(data)
+        return jsonify({
+            'success': True,
+            'data': result,
+            'message': f"批量营养分析完成（{len(data['foods'])}个食物）"
+        })
+    except Exception as e:
+        logger.error(f"❌ 批量营养分析失败: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@crewai_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    """查询 /process 结果缓存统计"""
+    return jsonify({
+        'success': True,
+        'data': _result_cache.get_stats()
+    })
+
+
+@crewai_bp.route('/cache', methods=['DELETE'])
+def invalidate_cache():
+    """
+    使 /process 结果缓存失效
+    
+    请求体（可选）:
+        {"context": {...}, "workflow_mode": "crew", "user_id": 1001}
+            只删除该上下文对应的结果（crew/dag 模式按用户区分）
+        不带请求体时清空全部缓存
+    """
+    data = request.get_json(silent=True) or {}
+    removed = _invalidate_result_cache(data)
+    
+    return jsonify({
+        'success': True,
+        'data': {'removed': removed},
+        'message': f'已删除 {removed} 条缓存结果'
+    })
+
+
+# Prometheus 文本格式的 Content-Type
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# 导出到 /metrics 的LLM响应缓存计数（按缓存层分别统计）
+LLM_CACHE_COUNTERS = ('lookups', 'memory_hits', 'memory_misses', 'disk_hits', 'disk_misses', 'misses')
+
+
+def _llm_cache_counters() -> dict:
+    """已创建的LLM客户端的响应缓存计数之和（不会触发客户端创建）"""
+    totals = dict.fromkeys(LLM_CACHE_COUNTERS, 0)
+    caches = {id(client.cache): client.cache for client in get_client_registry().clients() if client.cache is not None}
+    for cache in caches.values():
+        stats = cache.get_stats()
+        for name in LLM_CACHE_COUNTERS:
+            totals[name] += stats[name]
+    return {f'llm_cache_{name}_total': value for name, value in totals.items()}
+
+
+def _metrics_text() -> str:
+    """
+    各智能体的请求数、在途请求数、延迟分位数，以及结果缓存、LLM响应缓存和预热状态（Prometheus文本格式）
+    
+    智能体尚未初始化时只输出服务级指标，采集请求不会触发初始化
+    """
+    agents = _agents or {}
+    cache_stats = _result_cache.get_stats()
+    return format_prometheus(
+        [agent.metrics for agent in agents.values()],
+        gauges={
+            'ready': int(get_warmup().is_ready()),
+            'result_cache_entries': cache_stats.get('size', 0)
+        },
+        counters={
+            'result_cache_hits_total': cache_stats.get('hits', 0),
+            'result_cache_misses_total': cache_stats.get('misses', 0),
+            **_llm_cache_counters()
+        }
+    )
+
+
+@crewai_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标"""
+    return Response(_metrics_text(), content_type=METRICS_CONTENT_TYPE)
+
+
+def _run_job(data: dict, job) -> dict:
+    """异步任务处理函数：与 /process 相同的处理流程（使用任务自己的时限），每完成一步上报一次进度"""
+    response_data, message, root = _traced_process(data, _job_timeout(data), on_progress=job.report)
+    return {
+        'data': _attach_trace(response_data, data, root),
+        'message': message
+    }
+
+
+def get_job_manager() -> JobManager:
+    """获取异步任务管理器"""
+    global _job_manager
+    
+    if _job_manager is None:
+        with _init_lock:
+            if _job_manager is None:
+                _job_manager = JobManager(_run_job, max_workers=4)
+    
+    return _job_manager
+
+
+def _job_status_data(job: dict) -> dict:
+    """任务查询的响应数据（不回显请求体）"""
+    job.pop('request', None)
+    job['finished'] = job['status'] in FINISHED_STATES
+    return job
+
+
+def _cancel_message(status: str) -> str:
+    """取消任务后的提示信息"""
+    if status == JOB_CANCELLED:
+        return '任务已取消'
+    if status == JOB_RUNNING:
+        return '已请求取消，当前步骤完成后停止'
+    return '任务已结束，无法取消'
+
+
+@crewai_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    提交异步处理任务
+    
+    请求体与 /crewai/process 相同，立即返回任务ID（HTTP 202），
+    之后通过 GET /crewai/jobs/<job_id> 轮询进度和结果。
+    请求体与 /process 使用同一套校验，在任务入队前拒绝处理时必然失败的请求。
+    """
+    data = request.get_json(silent=True)
+    
+    error = _validate_process_request(data)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 400
+    
+    try:
+        job_id = get_job_manager().submit(data)
+    except Exception as e:
+        logger.error(f"❌ 任务提交失败: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f"{crewai_bp.url_prefix}/jobs/{job_id}"
+        },
+        'message': '任务已提交'
+    }), 202
+
+
+@crewai_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    查询任务状态
+    
+    返回:
+        status: queued / running / succeeded / failed / cancelled
+        progress: 已完成的步骤列表 [{"step": ..., "elapsed": ...}]
+        result: 任务成功时的处理结果（与 /crewai/process 的 data 相同）
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': _job_status_data(job)
+    })
+
+
+@crewai_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    取消任务
+    
+    排队中的任务立即取消；运行中的任务在当前步骤完成后停止。
+    """
+    status = get_job_manager().cancel(job_id)
+    if status is None:
+        return jsonify({
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'job_id': job_id,
+            'status': status,
+            'cancel_requested': status in (JOB_CANCELLED, JOB_RUNNING)
+        },
+        'message': _cancel_message(status)
+    })
+
+
+def _crew_info_data() -> dict:
+    """Crew信息（会在首次调用时初始化Crew）"""
+    crew, adapters = init_crew()
+    
+    # 统计每个智能体的工具数量
+    agent_tools = {}
+    for name, adapter in adapters.items():
+        tools_count = len(adapter.crew_agent.tools) if hasattr(adapter.crew_agent, 'tools') else 0
+        agent_tools[name] = {
+            'role': adapter.role,
+            'tools_count': tools_count,
+            'has_tools': tools_count > 0
+        }
+    
+    return {
+        'agents_count': len(adapters),
+        'agents': list(adapters.keys()),
+        'agent_details': agent_tools,
+        'framework': 'CrewAI',
+        'features': [
+            '真正的 CrewAI 框架',
+            '业务逻辑工具集成',
+            '角色明确的智能体',
+            '自动任务协调',
+            '记忆和上下文管理',
+            '分层管理流程（hierarchical）',
+            '智能体间委托',
+            '显式工具调用',
+            '多步工作流',
+            '交叉校验'
+        ]
+    }
+
+
 @crewai_bp.route('/crew-info', methods=['GET'])
 def crew_info():
     """获取Crew信息"""
     try:
-        crew, adapters = init_crew()
-        
-        # 统计每个智能体的工具数量
-        agent_tools = {}
-        for name, adapter in adapters.items():
-            tools_count = len(adapter.crew_agent.tools) if hasattr(adapter.crew_agent, 'tools') else 0
-            agent_tools[name] = {
-                'role': adapter.role,
-                'tools_count': tools_count,
-                'has_tools': tools_count > 0
-            }
-        
         return jsonify({
             'success': True,
-            'data': {
-                'agents_count': len(adapters),
-                'agents': list(adapters.keys()),
-                'agent_details': agent_tools,
-                'framework': 'CrewAI',
-                'features': [
-                    '真正的 CrewAI 框架',
-                    '业务逻辑工具集成',
-                    '角色明确的智能体',
-                    '自动任务协调',
-                    '记忆和上下文管理',
-                    '分层管理流程（hierarchical）',
-                    '智能体间委托',
-                    '显式工具调用',
-                    '多步工作流',
-                    '交叉校验'
-                ]
-            }
+            'data': _crew_info_data()
         })
     except Exception as e:
         logger.error(f"获取Crew信息失败: {e}")
@@ -262,14 +1248,23 @@ def crew_info():
 
 
 # 创建独立的Flask应用
-def create_crewai_app():
-    """创建CrewAI专用Flask应用"""
+def create_crewai_app(warmup: bool = True):
+    """
+    创建CrewAI专用Flask应用
+    
+    Args:
+        warmup: 是否在后台预热智能体、embedder和Crew（就绪状态见 /crewai/ready）
+    """
     app = Flask(__name__)
     CORS(app)
     
     # 注册Blueprint
     app.register_blueprint(crewai_bp)
     
+    init_tracing()
+    if warmup:
+        start_warmup()
+    
     return app
 
 
@@ -278,4 +1273,4 @@ if __name__ == '__main__':
     logger.info("="*60)
     logger.info("🚀 启动 CrewAI 服务（真正的框架集成）")
     logger.info("="*60)
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    app.run(host='0.0.0.0', port=5001, debug=True, threaded=True)
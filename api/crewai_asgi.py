@@ -0,0 +1,653 @@
+"""
+CrewAI框架专用ASGI服务
+与 api/crewai_api.py（Flask）提供相同的 /crewai/* 接口：
+- fast 模式全程异步：规则步骤在事件循环中直接计算，总结通过 AsyncGLM4Client 生成，
+  单个进程即可同时挂起数百个工作流
+- crew / dag 模式的 CrewAI kickoff 是同步调用，放到线程池中执行，不阻塞事件循环
+
+启动:
+    uvicorn api.crewai_asgi:app --host 0.0.0.0 --port 5002
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import re
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+from urllib.parse import unquote
+from loguru import logger
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from api.crewai_api import (
+    init_agents,
+    get_job_manager,
+    get_warmup,
+    start_warmup,
+    _is_weight_loss_request,
+    _build_workflow_input,
+    _fast_weight_loss_response,
+    _validate_process_request,
+    _cache_lookup,
+    _cache_store,
+    _invalidate_result_cache,
+    _result_cache,
+    _validate_nutrition_batch_request,
+    _handle_nutrition_batch,
+    _stream_events,
+    _fast_rule_reply,
+    _sse,
+    _health_data,
+    _crew_info_data,
+    _job_status_data,
+    _cancel_message,
+    _metrics_text,
+    METRICS_CONTENT_TYPE,
+    init_tracing,
+    _traced_process,
+    _attach_trace,
+    _request_timeout,
+    _mark_deadline
+)
+from utils.fast_workflow import arun_fast_weight_loss_workflow, run_rule_steps, build_summary_messages
+from utils.glm4_async_client import get_async_glm4_client
+from utils.job_queue import JOB_CANCELLED, JOB_RUNNING
+from utils.tracing import start_trace, propagate
+from utils.deadline import deadline_scope
+
+
+URL_PREFIX = '/crewai'
+
+# 同步路径（crew/dag模式、任务存储读写）使用的线程池
+# 每个 crew/dag 工作流占用一个线程直到结束，线程数即这两种模式的并发上限
+SYNC_WORKERS = 64
+_executor = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='crewai-asgi')
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, DELETE, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type, Authorization'),
+]
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+class Request:
+    """一次HTTP请求"""
+    
+    def __init__(self, scope: Dict[str, Any], receive: Callable, params: Dict[str, str]):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.params = params
+        self.headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1')
+            for name, value in scope.get('headers', [])
+        }
+    
+    async def body(self) -> bytes:
+        """读取完整请求体"""
+        chunks = []
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+    
+    async def json(self) -> Dict[str, Any]:
+        """解析JSON请求体（空请求体或非对象返回空字典）"""
+        body = await self.body()
+        if not body:
+            return {}
+        data = json.loads(body)
+        return data if isinstance(data, dict) else {}
+
+
+class StreamingResponse:
+    """SSE流式响应，包装一个产出文本的异步迭代器"""
+    
+    def __init__(self, events: AsyncIterator[str]):
+        self.events = events
+
+
+class TextResponse:
+    """纯文本响应（如Prometheus指标）"""
+    
+    def __init__(self, text: str, content_type: str = 'text/plain; charset=utf-8'):
+        self.text = text
+        self.content_type = content_type
+
+
+# 路由表: [(method, 正则, handler)]
+_routes: List[Tuple[str, Any, Callable]] = []
+
+
+def route(path: str, methods: Tuple[str, ...] = ('GET',)):
+    """
+    注册路由（路径参数写作 <name>，与Flask一致）
+    
+    Args:
+        path: 不含前缀的路径
+        methods: 允许的HTTP方法
+    """
+    pattern = re.compile('^' + URL_PREFIX + re.sub(r'<(\w+)>', r'(?P<\1>[^/]+)', path) + '$')
+    
+    def decorator(handler):
+        for method in methods:
+            _routes.append((method, pattern, handler))
+        return handler
+    
+    return decorator
+
+
+def _match(method: str, path: str):
+    """
+    查找路由
+    
+    Returns:
+        (handler, 路径参数)；路径存在但方法不匹配时返回 (None, {})，路径不存在返回 None
+    """
+    path_matched = False
+    for route_method, pattern, handler in _routes:
+        match = pattern.match(path)
+        if match is None:
+            continue
+        path_matched = True
+        if route_method == method:
+            return handler, {k: unquote(v) for k, v in match.groupdict().items()}
+    return (None, {}) if path_matched else None
+
+
+async def _run_sync(fn: Callable, *args, **kwargs):
+    """在线程池中执行同步函数（保留当前trace上下文）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, propagate(functools.partial(fn, *args, **kwargs)))
+
+
+async def _iterate_sync(generator) -> AsyncIterator[str]:
+    """
+    在线程池中逐条取出同步生成器的输出（每次 next 都不阻塞事件循环）
+    
+    整个生成器在同一个上下文副本中执行，生成器内设置的时限和trace在各次 next 之间保持有效。
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    sentinel = object()
+    try:
+        while True:
+            item = await loop.run_in_executor(_executor, context.run, next, generator, sentinel)
+            if item is sentinel:
+                return
+            yield item
+    finally:
+        # 客户端提前断开时在同一上下文中关闭生成器，让其中的 with 正常退出
+        await loop.run_in_executor(_executor, context.run, generator.close)
+
+
+async def _get_agents() -> Dict[str, Any]:
+    """获取业务智能体（预热未完成时在线程池中等待，不阻塞事件循环）"""
+    if get_warmup().is_ready('agents'):
+        return init_agents()
+    return await _run_sync(init_agents)
+
+
+def _summary_client(conversation):
+    """ConversationAgent 启用LLM时返回共享的异步客户端，否则返回None"""
+    if conversation.use_llm and conversation.llm_client:
+        return get_async_glm4_client()
+    return None
+
+
+async def _process_fast_async(data: dict) -> Tuple[dict, str]:
+    """
+    快速模式减脂场景的异步实现（与 _process_fast 的结果一致）
+    
+    Returns:
+        (响应数据, 提示信息)
+    """
+    user_id = data.get('user_id', 0)
+    context = data.get('context', {})
+    
+    agents = await _get_agents()
+    logger.info("🎯 场景识别: 减脂健康计划（快速模式，异步）")
+    workflow_input = _build_workflow_input(user_id, context)
+    result = await arun_fast_weight_loss_workflow(
+        agents,
+        workflow_input,
+        _summary_client(agents['conversation'])
+    )
+    return _fast_weight_loss_response(user_id, result), '快速模式处理完成（规则步骤直接计算）'
+
+
+async def _stream_fast_async(data: dict) -> AsyncIterator[str]:
+    """快速模式的异步流式输出（事件与 _stream_events 的 fast 分支一致）"""
+    user_message = data.get('message', '')
+    user_id = data.get('user_id', 0)
+    context = data.get('context', {})
+    
+    with deadline_scope(_request_timeout(data)) as deadline, start_trace(
+        'crewai.process',
+        user_id=user_id,
+        workflow_mode='fast',
+        stream=True
+    ) as root:
+        try:
+            yield _sse('status', {'stage': 'started', 'user_id': user_id, 'trace_id': root.trace_id})
+            
+            agents = await _get_agents()
+            conversation = agents['conversation']
+            
+            facts = None
+            if _is_weight_loss_request(context):
+                scenario = 'weight_loss'
+                workflow_input = _build_workflow_input(user_id, context)
+                result = run_rule_steps(agents, workflow_input)
+                facts = result['facts']
+                messages = build_summary_messages(workflow_input, facts, conversation.system_prompt)
+                yield _sse('status', {
+                    'stage': 'upstream_completed',
+                    'steps': result['steps'],
+                    'details': facts
+                })
+            else:
+                scenario = 'general'
+                messages = [
+                    {"role": "system", "content": conversation.system_prompt},
+                    {"role": "user", "content": user_message}
+                ]
+            
+            yield _sse('status', {'stage': 'summarizing'})
+            
+            client = _summary_client(conversation)
+            if client is not None:
+                async for chunk in client.achat_stream(messages):
+                    yield _sse('token', {'content': chunk})
+            else:
+                reply = await _run_sync(_fast_rule_reply, conversation, user_id, user_message, context, facts)
+                yield _sse('token', {'content': reply})
+            
+            yield _sse('done', _mark_deadline({
+                'user_id': user_id,
+                'scenario': scenario,
+                'workflow_mode': 'fast',
+                'llm_calls_made': 1 if client is not None else 0
+            }, deadline))
+        
+        except Exception as e:
+            logger.error(f"❌ CrewAI流式处理失败: {e}", exc_info=True)
+            yield _sse('error', {'error': str(e)})
+
+
+@route('/health')
+async def health_check(request: Request):
+    """健康检查"""
+    data = _health_data()
+    data['server'] = 'asgi'
+    return 200, data
+
+
+@route('/ready')
+async def readiness_check(request: Request):
+    """就绪检查（必要组件预热完成返回200，否则503）"""
+    status = get_warmup().get_status()
+    return 200 if status['ready'] else 503, {
+        'success': True,
+        'data': status
+    }
+
+
+@route('/process', methods=('POST',))
+async def process_request(request: Request):
+    """统一处理接口（请求体与Flask版 /crewai/process 相同）"""
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return 400, {
+            'success': False,
+            'error': f'请求体不是合法的JSON: {e}'
+        }
+    
+    try:
+        error = _validate_process_request(data)
+        if error:
+            return 400, {
+                'success': False,
+                'error': error
+            }
+        
+        key, cached, cache_headers = _cache_lookup(data, request.headers.get('cache-control'))
+        root = None
+        if cached:
+            response_data, message = cached
+        elif data.get('workflow_mode') == 'fast' and _is_weight_loss_request(data.get('context', {})):
+            with deadline_scope(_request_timeout(data)) as deadline:
+                with start_trace('crewai.process', user_id=data.get('user_id', 0), workflow_mode='fast') as root:
+                    response_data, message = await _process_fast_async(data)
+            response_data = _mark_deadline(response_data, deadline)
+            _cache_store(key, response_data, message)
+        else:
+            # crew/dag 模式和快速模式的通用咨询仍走同步实现
+            response_data, message, root = await _run_sync(_traced_process, data, _request_timeout(data))
+            _cache_store(key, response_data, message)
+        
+        if root is not None:
+            cache_headers['X-Trace-Id'] = root.trace_id
+        
+        return 200, {
+            'success': True,
+            'data': _attach_trace(response_data, data, root),
+            'message': message
+        }, cache_headers
+    
+    except Exception as e:
+        logger.error(f"❌ CrewAI处理失败: {e}", exc_info=True)
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@route('/process/stream', methods=('POST',))
+async def process_request_stream(request: Request):
+    """统一处理接口的流式版本（SSE，事件与Flask版相同）"""
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return 400, {
+            'success': False,
+            'error': f'请求体不是合法的JSON: {e}'
+        }
+    
+    error = _validate_process_request(data)
+    if error:
+        return 400, {
+            'success': False,
+            'error': error
+        }
+    
+    if data.get('workflow_mode') == 'fast':
+        return StreamingResponse(_stream_fast_async(data))
+    
+    return StreamingResponse(_iterate_sync(_stream_events(data)))
+
+
+@route('/nutrition/batch', methods=('POST',))
+async def nutrition_batch(request: Request):
+    """批量营养分析（请求体与Flask版 /crewai/nutrition/batch 相同）"""
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return 400, {
+            'success': False,
+            'error': f'请求体不是合法的JSON: {e}'
+        }
+    
+    error = _validate_nutrition_batch_request(data)
+    if error:
+        return 400, {
+            'success': False,
+            'error': error
+        }
+    
+    try:
+        result = await _run_sync(_handle_nutrition_batch, data)
+        return 200, {
+            'success': True,
+            'data': result,
+            'message': f"批量营养分析完成（{len(data['foods'])}个食物）"
+        }
+    except Exception as e:
+        logger.error(f"❌ 批量营养分析失败: {e}", exc_info=True)
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+
+
+@route('/jobs', methods=('POST',))
+async def submit_job(request: Request):
+    """提交异步处理任务"""
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return 400, {
+            'success': False,
+            'error': f'请求体不是合法的JSON: {e}'
+        }
+    
+    error = _validate_process_request(data)
+    if error:
+        return 400, {
+            'success': False,
+            'error': error
+        }
+    
+    try:
+        job_id = await _run_sync(lambda: get_job_manager().submit(data))
+    except Exception as e:
+        logger.error(f"❌ 任务提交失败: {e}", exc_info=True)
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+    
+    return 202, {
+        'success': True,
+        'data': {
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f"{URL_PREFIX}/jobs/{job_id}"
+        },
+        'message': '任务已提交'
+    }
+
+
+@route('/jobs/<job_id>')
+async def get_job(request: Request):
+    """查询任务状态"""
+    job_id = request.params['job_id']
+    job = await _run_sync(lambda: get_job_manager().get(job_id))
+    if job is None:
+        return 404, {
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }
+    
+    return 200, {
+        'success': True,
+        'data': _job_status_data(job)
+    }
+
+
+@route('/jobs/<job_id>/cancel', methods=('POST',))
+async def cancel_job(request: Request):
+    """取消任务"""
+    job_id = request.params['job_id']
+    status = await _run_sync(lambda: get_job_manager().cancel(job_id))
+    if status is None:
+        return 404, {
+            'success': False,
+            'error': f'任务不存在: {job_id}'
+        }
+    
+    return 200, {
+        'success': True,
+        'data': {
+            'job_id': job_id,
+            'status': status,
+            'cancel_requested': status in (JOB_CANCELLED, JOB_RUNNING)
+        },
+        'message': _cancel_message(status)
+    }
+
+
+@route('/cache')
+async def cache_stats(request: Request):
+    """查询 /process 结果缓存统计"""
+    return 200, {
+        'success': True,
+        'data': _result_cache.get_stats()
+    }
+
+
+@route('/cache', methods=('DELETE',))
+async def invalidate_cache(request: Request):
+    """使 /process 结果缓存失效（请求体与Flask版相同）"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    
+    removed = _invalidate_result_cache(data)
+    return 200, {
+        'success': True,
+        'data': {'removed': removed},
+        'message': f'已删除 {removed} 条缓存结果'
+    }
+
+
+@route('/metrics')
+async def metrics(request: Request):
+    """Prometheus 指标"""
+    return TextResponse(_metrics_text(), METRICS_CONTENT_TYPE)
+
+
+@route('/crew-info')
+async def crew_info(request: Request):
+    """获取Crew信息"""
+    try:
+        return 200, {
+            'success': True,
+            'data': await _run_sync(_crew_info_data)
+        }
+    except Exception as e:
+        logger.error(f"获取Crew信息失败: {e}")
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+
+
+async def _send_json(send: Callable, status: int, data: Any, headers: Dict[str, str] = None):
+    """发送JSON响应"""
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    extra_headers = [
+        (name.lower().encode('latin-1'), str(value).encode('latin-1'))
+        for name, value in (headers or {}).items()
+    ]
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json; charset=utf-8'),
+            (b'content-length', str(len(body)).encode()),
+        ] + extra_headers + CORS_HEADERS
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_text(send: Callable, response: TextResponse):
+    """发送纯文本响应"""
+    body = response.text.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', response.content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode()),
+        ] + CORS_HEADERS
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_stream(send: Callable, response: StreamingResponse):
+    """逐条发送SSE消息"""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': SSE_HEADERS + CORS_HEADERS
+    })
+    async for event in response.events:
+        await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _handle_http(scope: Dict[str, Any], receive: Callable, send: Callable):
+    """处理一次HTTP请求"""
+    method = scope['method']
+    
+    if method == 'OPTIONS':
+        # CORS预检
+        await send({'type': 'http.response.start', 'status': 204, 'headers': CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    
+    matched = _match(method, scope['path'])
+    if matched is None:
+        await _send_json(send, 404, {'success': False, 'error': f"接口不存在: {scope['path']}"})
+        return
+    
+    handler, params = matched
+    if handler is None:
+        await _send_json(send, 405, {'success': False, 'error': f"不支持的请求方法: {method}"})
+        return
+    
+    response = await handler(Request(scope, receive, params))
+    
+    if isinstance(response, StreamingResponse):
+        await _send_stream(send, response)
+    elif isinstance(response, TextResponse):
+        await _send_text(send, response)
+    else:
+        # 处理函数返回 (状态码, 数据) 或 (状态码, 数据, 响应头)
+        await _send_json(send, *response)
+
+
+async def _handle_lifespan(receive: Callable, send: Callable):
+    """处理服务启动和关闭事件"""
+    while True:
+        message = await receive()
+        
+        if message['type'] == 'lifespan.startup':
+            # 智能体、embedder和Crew在后台预热，就绪状态见 /crewai/ready
+            init_tracing()
+            start_warmup()
+            logger.info("✅ CrewAI ASGI服务已启动")
+            await send({'type': 'lifespan.startup.complete'})
+        
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                await get_async_glm4_client().aclose()
+            except Exception as e:
+                logger.warning(f"关闭异步LLM客户端失败: {e}")
+            _executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: Dict[str, Any], receive: Callable, send: Callable):
+    """ASGI应用入口"""
+    if scope['type'] == 'http':
+        await _handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await _handle_lifespan(receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    logger.info("="*60)
+    logger.info("🚀 启动 CrewAI ASGI 服务")
+    logger.info("="*60)
+    uvicorn.run(app, host='0.0.0.0', port=5002)
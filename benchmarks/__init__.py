@@ -0,0 +1 @@
+"""性能压测脚本"""
@@ -0,0 +1,145 @@
+"""
+ASGI服务与Flask服务对比压测
+同一个进程内分别启动多线程Flask服务和uvicorn ASGI服务，都指向模拟LLM服务，
+用 10/100/500 个并发客户端调用 fast 模式的 /crewai/process，对比吞吐和延迟
+
+吞吐轮次的每个请求上下文都不同，并带 Cache-Control: no-cache，测的是完整调用链；
+结果缓存命中的延迟单独作为一个场景统计
+
+用法:
+    python benchmarks/bench_asgi_vs_flask.py --clients 10 100 500 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import aiohttp
+from werkzeug.serving import make_server
+
+from benchmarks.stub_llm_server import start_stub_server
+from benchmarks.bench_crewai_throughput import configure_llm_client, weight_loss_request, NO_CACHE_HEADERS
+
+
+def start_flask_server():
+    """在后台线程启动多线程的Flask服务"""
+    from api.crewai_api import create_crewai_app, init_agents
+    
+    init_agents()
+    server = make_server('127.0.0.1', 0, create_crewai_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_asgi_server(port: int):
+    """在后台线程启动uvicorn ASGI服务"""
+    import uvicorn
+    from api.crewai_asgi import app
+    
+    config = uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', backlog=2048)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run_round(base_url: str, clients: int, requests_per_client: int, cache_hit: bool = False):
+    """
+    指定数量的客户端同时压测，每个客户端串行发送若干请求
+    
+    Args:
+        base_url: 服务地址
+        clients: 并发客户端数
+        requests_per_client: 每个客户端发送的请求数
+        cache_hit: 是否为缓存命中场景（所有请求相同且不带 no-cache，先发一次写入缓存）
+        
+    Returns:
+        (吞吐 req/s, p50延迟秒, p99延迟秒, 失败数)
+    """
+    latencies = []
+    failures = 0
+    
+    shared = weight_loss_request('fast', distinct=False)
+    headers = None if cache_hit else NO_CACHE_HEADERS
+    
+    async def client(session: aiohttp.ClientSession):
+        nonlocal failures
+        for _ in range(requests_per_client):
+            payload = shared if cache_hit else weight_loss_request('fast')
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/crewai/process", json=payload, headers=headers) as response:
+                    data = await response.json()
+                    if response.status != 200 or not data.get('success'):
+                        failures += 1
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+    
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        if cache_hit:
+            async with session.post(f"{base_url}/crewai/process", json=shared) as response:
+                await response.read()
+        start = time.perf_counter()
+        await asyncio.gather(*[client(session) for _ in range(clients)])
+        elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / elapsed, p50, p99, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ASGI服务与Flask服务对比压测')
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 100, 500], help='并发客户端数')
+    parser.add_argument('--requests-per-client', type=int, default=3, help='每个客户端发送的请求数')
+    parser.add_argument('--latency', type=float, default=0.5, help='模拟LLM每次调用延迟(秒)')
+    parser.add_argument('--asgi-port', type=int, default=5102, help='ASGI服务端口')
+    parser.add_argument('--max-in-flight', type=int, default=1024, help='异步客户端的全局在途请求上限')
+    args = parser.parse_args()
+    
+    from utils.glm4_async_client import get_async_glm4_client, set_max_in_flight
+    
+    stub, api_base = start_stub_server(args.latency)
+    config = configure_llm_client(api_base)
+    get_async_glm4_client().reload(config)
+    set_max_in_flight(args.max_in_flight)
+    
+    flask_server, flask_url = start_flask_server()
+    asgi_server, asgi_url = start_asgi_server(args.asgi_port)
+    
+    print(f"\n模拟LLM: {api_base} (延迟 {args.latency}s)  模式: fast  每客户端请求数: {args.requests_per_client}")
+    print(f"{'服务':>6} {'并发':>6} {'吞吐(req/s)':>12} {'p50(s)':>8} {'p99(s)':>8} {'失败':>6}")
+    
+    for clients in args.clients:
+        for name, base_url in (('flask', flask_url), ('asgi', asgi_url)):
+            throughput, p50, p99, failures = asyncio.run(run_round(base_url, clients, args.requests_per_client))
+            print(f"{name:>6} {clients:>6} {throughput:>12.2f} {p50:>8.2f} {p99:>8.2f} {failures:>6}")
+    llm_calls = stub.request_count
+    
+    print(f"\n结果缓存命中（{args.clients[0]} 个并发客户端，请求相同）")
+    print(f"{'服务':>6} {'吞吐(req/s)':>12} {'p50(ms)':>8} {'p99(ms)':>8} {'失败':>6}")
+    for name, base_url in (('flask', flask_url), ('asgi', asgi_url)):
+        throughput, p50, p99, failures = asyncio.run(
+            run_round(base_url, args.clients[0], args.requests_per_client, cache_hit=True)
+        )
+        print(f"{name:>6} {throughput:>12.2f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {failures:>6}")
+    
+    print(f"\n吞吐轮次模拟LLM共收到 {llm_calls} 次调用，缓存场景 {stub.request_count - llm_calls} 次")
+    asgi_server.should_exit = True
+    flask_server.shutdown()
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
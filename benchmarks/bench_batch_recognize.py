@@ -0,0 +1,110 @@
+"""
+批量食物识别压测
+启动本地模拟LLM服务（固定延迟），对 1/8/64 张图片的批次分别测量
+逐张识别（1个线程）和 batch_recognize 并发识别的吞吐、流式返回首条结果的耗时，
+并用一张超慢的请求验证单张时限和部分失败报告
+
+用法:
+    python benchmarks/bench_batch_recognize.py --latency 0.2 --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from loguru import logger
+
+from benchmarks.stub_llm_server import start_stub_server
+from benchmarks.bench_crewai_throughput import configure_llm_client
+
+# 模拟服务在回复末尾附上的JSON，使识别结果可以正常解析
+STUB_REPLY = '```json\n' + json.dumps({
+    'foodName': '模拟菜品',
+    'calories': 320,
+    'protein': 12.0,
+    'carbohydrate': 40.0,
+    'fat': 10.0,
+    'fiber': 2.0,
+    'servingSize': '1份(250g)',
+    'foodType': '主食',
+    'foodDescription': '模拟服务返回的识别结果',
+    'ingredients': '模拟食材'
+}, ensure_ascii=False) + '\n```'
+
+
+def build_images(count: int) -> list:
+    """生成 count 张图片输入（文件名不在本地营养数据库中，每张都会调用LLM）"""
+    return [{'image_path': f"/tmp/uploads/unlisted_dish_{index:04d}.jpg"} for index in range(count)]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def first_result_time(agent, images: list, workers: int) -> float:
+    """流式返回第一条结果的耗时"""
+    start = time.perf_counter()
+    stream = agent.batch_recognize(images, max_workers=workers, stream=True)
+    next(stream)
+    elapsed = time.perf_counter() - start
+    stream.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量食物识别压测')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟LLM每次调用的延迟(秒)')
+    parser.add_argument('--workers', type=int, default=8, help='batch_recognize 的并发数')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 8, 64], help='批次大小')
+    args = parser.parse_args()
+    
+    logger.remove()
+    logger.add(sys.stderr, level='CRITICAL')
+    
+    stub, api_base = start_stub_server(args.latency, reply=STUB_REPLY)
+    # 超时的请求被客户端断开后，模拟服务写回响应会失败，不打印异常
+    stub.handle_error = lambda request, client_address: None
+    configure_llm_client(api_base)
+    
+    from agents.food_recognition_agent import FoodRecognitionAgent
+    
+    agent = FoodRecognitionAgent()
+    print(f"\n模拟LLM: {api_base} (延迟 {args.latency}s)  并发: {args.workers}")
+    print(f"  {'批次':>4}  {'逐张(img/s)':>12}  {'并发(img/s)':>12}  {'加速':>6}  {'首条结果':>9}  失败")
+    
+    for size in args.sizes:
+        images = build_images(size)
+        _, sequential_time = _timed(lambda: agent.batch_recognize(images, max_workers=1))
+        results, parallel_time = _timed(lambda: agent.batch_recognize(images, max_workers=args.workers))
+        first = first_result_time(agent, images, args.workers)
+        failed = sum(1 for result in results if 'error' in result)
+        print(
+            f"  {size:>4}  {size / sequential_time:>12.1f}  {size / parallel_time:>12.1f}  "
+            f"{sequential_time / parallel_time:>5.1f}x  {first * 1000:>7.0f}ms  {failed}"
+        )
+    
+    # 单张时限: 模拟服务变慢，需要调用LLM的图片报告为超时，营养数据库中已有的食物照常返回
+    stub.latency = args.latency * 10
+    item_timeout = args.latency * 3
+    images = build_images(args.workers // 2) + [{'image_path': "/tmp/uploads/米饭.jpg"}] * (args.workers - args.workers // 2)
+    results, elapsed = _timed(lambda: agent.batch_recognize(images, max_workers=args.workers, timeout=item_timeout))
+    timed_out = sum(1 for result in results if result.get('timed_out'))
+    succeeded = sum(1 for result in results if 'error' not in result)
+    print(
+        f"\n  模拟服务延迟 {stub.latency:.1f}s、单张时限 {item_timeout:.1f}s: "
+        f"{len(images)} 张耗时 {elapsed:.2f}s，成功 {succeeded} 张，超时 {timed_out} 张"
+    )
+    
+    print(f"\n模拟LLM共收到 {stub.request_count} 次调用")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+CrewAI接口吞吐压测
+启动模拟LLM服务和 /crewai/process 服务，分别用 1/2/4/8... 个并发客户端压测，
+验证请求级Crew在多线程下的吞吐是否随并发线性增长
+
+吞吐轮次的每个请求上下文都不同，并带 Cache-Control: no-cache，测的是完整工作流；
+结果缓存命中的延迟单独作为一个场景统计
+
+用法:
+    python benchmarks/bench_crewai_throughput.py --requests 32 --workers 1 2 4 8 --latency 0.2
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import requests
+import yaml
+from werkzeug.serving import make_server
+
+from benchmarks.stub_llm_server import start_stub_server
+
+# 吞吐轮次跳过 /process 结果缓存（仍会写入，不影响后续轮次，因为每个请求的上下文都不同）
+NO_CACHE_HEADERS = {'Cache-Control': 'no-cache'}
+
+_request_ids = itertools.count()
+
+
+def weight_loss_request(workflow_mode: str, distinct: bool = True) -> dict:
+    """
+    生成一个减脂请求体
+    
+    Args:
+        workflow_mode: 执行模式
+        distinct: 是否让每个请求的上下文都不同（体重每次增加0.001kg，结果缓存键不会重复）；
+            为False时用户也固定（crew/dag 模式的缓存键包含 user_id）
+        
+    Returns:
+        /crewai/process 请求体
+    """
+    index = next(_request_ids)
+    return {
+        'message': '我想减肥，帮我制定一个健康计划',
+        'user_id': 10000 + index if distinct else 10000,
+        'context': {
+            'current_weight': round(80.0 + index * 0.001, 3) if distinct else 80.0,
+            'target_weight': 70.0,
+            'days': 30,
+            'target_calories': 1800
+        },
+        'workflow_mode': workflow_mode
+    }
+
+
+def configure_llm_client(api_base: str):
+    """让GLM客户端指向模拟服务，并关闭缓存和客户端限流（避免掩盖并发效果）"""
+    os.environ['GLM_API_BASE'] = api_base
+    os.environ.setdefault('GLM_API_KEY', 'benchmark')
+    
+    from utils.glm4_client import get_glm4_client
+    from utils.llm_registry import DEFAULT_CONFIG_PATH
+    
+    with open(DEFAULT_CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config.setdefault('cache', {})['enabled'] = False
+    config.setdefault('rate_limit', {})['enabled'] = False
+    config.setdefault('singleflight', {})['enabled'] = False
+    get_glm4_client().reload(config)
+    return config
+
+
+def start_api_server():
+    """在后台线程启动多线程的CrewAI Flask服务"""
+    from api.crewai_api import create_crewai_app, init_crew
+    
+    init_crew()
+    app = create_crewai_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_round(base_url: str, workers: int, total: int, workflow_mode: str):
+    """
+    用指定并发数发送一轮请求
+    
+    Returns:
+        (吞吐 req/s, 平均延迟秒, 失败数)
+    """
+    payloads = [weight_loss_request(workflow_mode) for _ in range(total)]
+    
+    def call(payload: dict):
+        start = time.perf_counter()
+        response = requests.post(f"{base_url}/crewai/process", json=payload, headers=NO_CACHE_HEADERS, timeout=600)
+        return time.perf_counter() - start, response.status_code == 200 and response.json().get('success')
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(call, payloads))
+    elapsed = time.perf_counter() - start
+    
+    latencies = [latency for latency, _ in results]
+    failures = sum(1 for _, ok in results if not ok)
+    return total / elapsed, sum(latencies) / len(latencies), failures
+
+
+def run_cache_hit_round(base_url: str, total: int, workflow_mode: str):
+    """
+    结果缓存命中场景：同一个请求先执行一次写入缓存，再串行重复发送
+    
+    Returns:
+        (p50延迟秒, p99延迟秒, 命中数)
+    """
+    payload = weight_loss_request(workflow_mode, distinct=False)
+    requests.post(f"{base_url}/crewai/process", json=payload, timeout=600)
+    
+    latencies = []
+    hits = 0
+    for _ in range(total):
+        start = time.perf_counter()
+        response = requests.post(f"{base_url}/crewai/process", json=payload, timeout=600)
+        latencies.append(time.perf_counter() - start)
+        hits += response.headers.get('X-Cache') == 'HIT'
+    
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CrewAI接口吞吐压测')
+    parser.add_argument('--requests', type=int, default=32, help='每轮请求数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='并发客户端数')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟LLM每次调用延迟(秒)')
+    parser.add_argument('--mode', choices=['crew', 'dag'], default='crew', help='workflow_mode')
+    args = parser.parse_args()
+    
+    stub, api_base = start_stub_server(args.latency)
+    configure_llm_client(api_base)
+    server, base_url = start_api_server()
+    
+    print(f"\n模拟LLM: {api_base} (延迟 {args.latency}s)  服务: {base_url}  模式: {args.mode}")
+    print(f"{'并发':>6} {'吞吐(req/s)':>12} {'平均延迟(s)':>12} {'扩展效率':>10} {'失败':>6}")
+    
+    baseline = None
+    for workers in args.workers:
+        throughput, latency, failures = run_round(base_url, workers, args.requests, args.mode)
+        baseline = baseline or throughput / workers
+        efficiency = throughput / (baseline * workers)
+        print(f"{workers:>6} {throughput:>12.2f} {latency:>12.2f} {efficiency:>10.0%} {failures:>6}")
+    
+    llm_calls = stub.request_count
+    p50, p99, hits = run_cache_hit_round(base_url, args.requests, args.mode)
+    print(f"\n结果缓存命中: p50 {p50 * 1000:.1f}ms  p99 {p99 * 1000:.1f}ms  命中 {hits}/{args.requests}")
+    print(f"\n吞吐轮次模拟LLM共收到 {llm_calls} 次调用，缓存场景 {stub.request_count - llm_calls} 次")
+    server.shutdown()
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
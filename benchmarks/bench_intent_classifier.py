@@ -0,0 +1,98 @@
+"""
+意图分类压测
+在一组带标注的消息（含不带关键词的问法）上对比关键词路由和 IntentClassifier 的
+检索判断准确率，并统计分类耗时的分位数（预算每条 5ms）
+
+用法:
+    python benchmarks/bench_intent_classifier.py --repeat 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from loguru import logger
+
+# (消息, 是否需要检索)；都不在分类器的示例句中
+LABELED_MESSAGES = [
+    ('一天该吃多少克米饭', True),
+    ('吃完饭马上睡觉会胖吗', True),
+    ('如何让自己的肚子变小', True),
+    ('香蕉和苹果哪个更适合控糖', True),
+    ('熬夜后第二天吃什么', True),
+    ('鸡胸肉怎么做好吃又低卡', True),
+    ('喝豆浆会不会影响激素', True),
+    ('吃辣对胃不好吗', True),
+    ('运动完能喝可乐吗', True),
+    ('糖尿病人能吃西瓜吗', True),
+    ('减脂期可以吃火锅吗', True),
+    ('蛋白粉要怎么喝', True),
+    ('你好', False),
+    ('谢谢啦', False),
+    ('你会干什么', False),
+    ('今天好无聊', False),
+    ('你是真人吗', False),
+    ('我们聊点别的吧', False),
+    ('你喜欢什么颜色', False),
+    ('给我讲个故事', False),
+    ('你今天过得怎么样', False),
+    ('明天会下雨吗', False),
+    ('祝你身体健康', False),
+    ('你吃饭了吗', False)
+]
+
+
+def percentile(values: list, q: float) -> float:
+    """分位数（q 取 0~100）"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='意图分类压测')
+    parser.add_argument('--repeat', type=int, default=200, help='每条消息重复分类次数')
+    args = parser.parse_args()
+    
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    
+    from agents.conversation_agent import RAG_KEYWORDS
+    from utils.intent_classifier import IntentClassifier
+    from utils.keyword_matcher import KeywordMatcher
+    
+    keywords = KeywordMatcher({'rag': RAG_KEYWORDS})
+    start = time.perf_counter()
+    classifier = IntentClassifier(cache_path=None).load()
+    load_ms = (time.perf_counter() - start) * 1000
+    
+    keyword_correct = sum(keywords.matches_any(message) == label for message, label in LABELED_MESSAGES)
+    decisions = [classifier.classify(message) for message, _ in LABELED_MESSAGES]
+    classifier_correct = sum(decision['use_rag'] == label for decision, (_, label) in zip(decisions, LABELED_MESSAGES))
+    stats = classifier.get_stats()
+    
+    latencies = []
+    for _ in range(args.repeat):
+        for message, _ in LABELED_MESSAGES:
+            begin = time.perf_counter()
+            classifier.classify(message)
+            latencies.append((time.perf_counter() - begin) * 1000)
+    
+    total = len(LABELED_MESSAGES)
+    print(f"\n{total} 条标注消息，质心计算 {load_ms:.1f}ms")
+    print(f"  关键词路由准确率  {keyword_correct}/{total}")
+    print(f"  意图分类准确率    {classifier_correct}/{total}（词法预判 {stats['lexical']} 次，向量比较 {stats['embedding']} 次）")
+    print(
+        f"  分类耗时  p50 {percentile(latencies, 50):.3f}ms  p99 {percentile(latencies, 99):.3f}ms  "
+        f"max {max(latencies):.3f}ms  超出5ms {sum(latency > 5 for latency in latencies)} 次"
+    )
+    for (message, label), decision in zip(LABELED_MESSAGES, decisions):
+        if decision['use_rag'] != label:
+            print(f"  ✗ {message}  期望 {'检索' if label else '不检索'}，判为 {decision['intent']} ({decision['method']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+关键词匹配压测
+对比逐个关键词 in 判断和 KeywordMatcher（Aho-Corasick 自动机）在不同词典规模下
+匹配同一批用户消息的耗时，并校验两者命中的意图一致
+
+用法:
+    python benchmarks/bench_keyword_matcher.py --sizes 30 1000 10000 --messages 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from utils.keyword_matcher import KeywordMatcher
+
+# 生成合成关键词和消息用的常见汉字
+CHARS = '营养热量卡路里蛋白质碳水脂肪维生素矿物减肥脂增肌瘦身健食材谱饮吃糖尿病高血压痛风疾胰岛代谢康养调理运动锻炼你好今天早午晚餐米饭面条鸡蛋牛奶水果蔬菜'
+INTENTS = 8
+
+
+def build_keywords(size: int, rng: random.Random) -> dict:
+    """生成 size 个关键词，均分到 INTENTS 个意图（包含 ConversationAgent 的默认关键词）"""
+    from agents.conversation_agent import RAG_KEYWORDS, RULE_INTENT_KEYWORDS
+    
+    keywords = {'rag': list(RAG_KEYWORDS)}
+    keywords.update({intent: list(words) for intent, words in RULE_INTENT_KEYWORDS.items()})
+    total = sum(len(words) for words in keywords.values())
+    while total < size:
+        intent = f"intent_{rng.randrange(INTENTS)}"
+        keywords.setdefault(intent, []).append(''.join(rng.choice(CHARS) for _ in range(rng.randint(2, 6))))
+        total += 1
+    return keywords
+
+
+def build_messages(count: int, rng: random.Random) -> list:
+    """生成长度 10~80 的合成用户消息"""
+    return [''.join(rng.choice(CHARS) for _ in range(rng.randint(10, 80))) for _ in range(count)]
+
+
+def naive_match(keywords: dict, message: str) -> set:
+    """逐个关键词 in 判断（原 _need_rag_retrieval 的做法）"""
+    return {intent for intent, words in keywords.items() if any(word in message for word in words)}
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='关键词匹配压测')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 1000, 10000], help='词典规模（关键词数）')
+    parser.add_argument('--messages', type=int, default=2000, help='消息数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    
+    rng = random.Random(args.seed)
+    messages = build_messages(args.messages, rng)
+    failed = False
+    
+    print(f"\n{args.messages} 条消息")
+    for size in args.sizes:
+        keywords = build_keywords(size, rng)
+        matcher, build_time = _timed(lambda: KeywordMatcher(keywords).compile())
+        
+        expected, naive_time = _timed(lambda: [naive_match(keywords, message) for message in messages])
+        matched, matcher_time = _timed(lambda: [set(matcher.match(message)) for message in messages])
+        consistent = expected == matched
+        failed = failed or not consistent
+        
+        print(
+            f"  {matcher.keyword_count():>6} 个关键词  编译 {build_time * 1e3:>7.1f}ms  "
+            f"in 判断 {naive_time / args.messages * 1e6:>9.1f}us/条  "
+            f"自动机 {matcher_time / args.messages * 1e6:>7.1f}us/条  "
+            f"{naive_time / matcher_time:>7.1f}x  结果一致: {consistent}"
+        )
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
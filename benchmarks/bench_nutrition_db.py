@@ -0,0 +1,129 @@
+"""
+营养数据库压测
+生成合成食物表编译成数据库文件，统计编译耗时、文件大小、打开耗时，
+以及精确查找和模糊查找的单次耗时（模糊查找与逐条计算 Dice 系数的线性扫描对比结果和耗时）
+
+用法:
+    python benchmarks/bench_nutrition_db.py --foods 50000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from loguru import logger
+
+PREFIXES = ['清蒸', '红烧', '凉拌', '香煎', '爆炒', '水煮', '糖醋', '麻辣', '蒜蓉', '干煸', '酱爆', '椒盐']
+INGREDIENTS = [
+    '鸡', '鸭', '鱼', '虾', '牛', '羊', '猪', '豆腐', '茄子', '土豆', '白菜', '青菜', '排骨', '鸡蛋',
+    '蘑菇', '木耳', '藕', '冬瓜', '南瓜', '山药', '豆角', '芹菜', '花菜', '莴笋', '腰果', '鱿鱼', '蛤蜊'
+]
+SUFFIXES = ['', '丁', '片', '丝', '块', '汤', '煲', '羹', '卷', '饼']
+FOOD_TYPES = ['主食', '蔬菜', '肉类', '水果', '饮品', '甜品']
+
+
+def random_records(count: int, rng: random.Random) -> list:
+    """生成 count 条不重名的合成食物记录（约三分之一带别名）"""
+    records = []
+    names = set()
+    while len(records) < count:
+        name = rng.choice(PREFIXES) + rng.choice(INGREDIENTS) + rng.choice(INGREDIENTS) + rng.choice(SUFFIXES)
+        if name in names:
+            name += str(len(records))
+        names.add(name)
+        records.append({
+            'name': name,
+            'aliases': name[2:] + '菜' if rng.random() < 0.33 else '',
+            'calories': rng.randint(20, 600),
+            'protein': round(rng.uniform(0, 40), 1),
+            'carbohydrate': round(rng.uniform(0, 80), 1),
+            'fat': round(rng.uniform(0, 40), 1),
+            'fiber': round(rng.uniform(0, 8), 1),
+            'servingSize': '1份(200g)',
+            'foodType': rng.choice(FOOD_TYPES),
+            'ingredients': name[2:]
+        })
+    return records
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """随机替换一个字，模拟错别字"""
+    index = rng.randrange(len(name))
+    return name[:index] + rng.choice('的一是了我不人在他有') + name[index + 1:]
+
+
+def linear_search(names: list, query: str) -> float:
+    """逐条计算 bigram Dice 系数的线性扫描（对照组），返回最高分"""
+    from utils.nutrition_db import _BEGIN, _END
+    
+    def grams(text):
+        padded = _BEGIN + text + _END
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+    
+    query_grams = grams(query)
+    best_score = 0.0
+    for name in names:
+        name_grams = grams(name)
+        best_score = max(best_score, 2 * len(query_grams & name_grams) / (len(query_grams) + len(name_grams)))
+    return best_score
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='营养数据库压测')
+    parser.add_argument('--foods', type=int, default=50000, help='食物数')
+    parser.add_argument('--queries', type=int, default=2000, help='查询数')
+    parser.add_argument('--linear', type=int, default=50, help='线性扫描对照的查询数')
+    args = parser.parse_args()
+    
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    
+    from utils.nutrition_db import NutritionDB, build_nutrition_db
+    
+    rng = random.Random(42)
+    records = random_records(args.foods, rng)
+    path = os.path.join(tempfile.mkdtemp(), 'nutrition_db.bin')
+    
+    _, build_time = _timed(lambda: build_nutrition_db(records, path))
+    db, open_time = _timed(lambda: NutritionDB(path))
+    
+    exact_queries = [rng.choice(records)['name'] for _ in range(args.queries)]
+    fuzzy_queries = [typo(name, rng) for name in exact_queries]
+    
+    exact, exact_time = _timed(lambda: [db.find_exact(name) for name in exact_queries])
+    fuzzy, fuzzy_time = _timed(lambda: [db.search(name, limit=1) for name in fuzzy_queries])
+    
+    names = [record['name'] for record in records]
+    linear, linear_time = _timed(lambda: [linear_search(names, name) for name in fuzzy_queries[:args.linear]])
+    
+    exact_correct = sum(row is not None and names[row] == name for row, name in zip(exact, exact_queries))
+    fuzzy_hits = sum(1 for matches, name in zip(fuzzy, exact_queries) if matches and names[matches[0][0]] == name)
+    # 同分的食物可能不止一个，按最高分比较
+    agree = sum(
+        1 for matches, best_score in zip(fuzzy, linear)
+        if (matches[0][1] if matches else 0.0) == round(best_score, 4) or (not matches and best_score < 0.5)
+    )
+    
+    print(f"\n{args.foods} 种食物，文件 {os.path.getsize(path) / 1024 / 1024:.1f}MB")
+    print(f"  编译 {build_time:.2f}s  打开 {open_time * 1e3:.2f}ms")
+    print(f"  精确查找  {exact_time / args.queries * 1e6:>8.1f}us/次  命中 {exact_correct}/{args.queries}")
+    print(f"  模糊查找  {fuzzy_time / args.queries * 1e6:>8.1f}us/次  错别字找回原名 {fuzzy_hits}/{args.queries}")
+    print(f"  线性扫描  {linear_time / args.linear * 1e6:>8.1f}us/次  与索引结果一致 {agree}/{args.linear}")
+    
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
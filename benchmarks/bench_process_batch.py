@@ -0,0 +1,95 @@
+"""
+批量营养分析压测
+对比逐条 execute、基类并发 process_batch 和 NutritionAnalyzerAgent 向量化 process_batch
+处理同一批合成餐食记录（仅规则路径，不调用LLM）的耗时，并校验三者结果一致
+
+用法:
+    python benchmarks/bench_process_batch.py --items 10000 --intake 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from loguru import logger
+
+FOOD_TYPES = ['蔬菜', '水果', '主食', '肉类', '饮品', '甜品', '未分类']
+SERVING_SIZES = ['1份(200g)', '1碗(150g)', '100g', '']
+
+
+def random_food(rng: random.Random) -> dict:
+    """生成一条合成食物营养数据"""
+    return {
+        'foodName': f"食物{rng.randint(1, 500)}",
+        'calories': round(rng.uniform(0, 800), 1),
+        'protein': round(rng.uniform(0, 50), 1),
+        'carbohydrate': round(rng.uniform(0, 120), 1),
+        'fat': round(rng.uniform(0, 40), 1),
+        'fiber': round(rng.uniform(0, 10), 1),
+        'foodType': rng.choice(FOOD_TYPES),
+        'servingSize': rng.choice(SERVING_SIZES)
+    }
+
+
+def build_inputs(items: int, intake: int, seed: int = 42) -> list:
+    """生成 process_batch 的输入（每条带0~intake条当天已摄入食物）"""
+    rng = random.Random(seed)
+    return [
+        {
+            'food_data': random_food(rng),
+            'daily_intake': [random_food(rng) for _ in range(rng.randint(0, intake))]
+        }
+        for _ in range(items)
+    ]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量营养分析压测')
+    parser.add_argument('--items', type=int, default=10000, help='餐食记录数')
+    parser.add_argument('--intake', type=int, default=4, help='每条记录最多的当天已摄入食物数')
+    parser.add_argument('--workers', type=int, default=8, help='基类并发 process_batch 的线程数')
+    args = parser.parse_args()
+    
+    # 逐条执行时每次都会写INFO日志，压测时只保留警告
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    
+    from agents.nutrition_analyzer_agent import NutritionAnalyzerAgent
+    from agents.base_agent import BaseAgent
+    
+    agent = NutritionAnalyzerAgent()
+    agent.use_llm = False
+    inputs = build_inputs(args.items, args.intake)
+    
+    loop, loop_time = _timed(lambda: [agent.execute(input_data) for input_data in inputs])
+    threaded, threaded_time = _timed(lambda: BaseAgent.process_batch(agent, inputs, args.workers))
+    vectorized, vectorized_time = _timed(lambda: agent.process_batch(inputs))
+    
+    print(f"\n{args.items} 条记录（每条最多 {args.intake} 条当天摄入）")
+    for name, elapsed in (
+        ('execute 逐条', loop_time),
+        (f'process_batch 并发({args.workers})', threaded_time),
+        ('process_batch 向量化', vectorized_time)
+    ):
+        print(f"  {name:<28} {elapsed:>8.3f}s  {elapsed / args.items * 1e6:>8.1f}us/条  {loop_time / elapsed:>5.2f}x")
+    
+    expected = [result['data'] for result in loop]
+    consistent = expected == [result['data'] for result in threaded] == [result['data'] for result in vectorized]
+    print(f"  结果一致: {consistent}")
+    if not consistent:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+服务启动耗时压测
+在全新的子进程中分别测量冷启动各阶段耗时：模块导入、智能体构造、embedder加载、Crew创建，
+并对比串行初始化与后台并行预热的总耗时
+
+用法:
+    python benchmarks/bench_startup.py --repeat 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+
+def _timed(timings: dict, name: str, fn):
+    """执行并记录耗时"""
+    start = time.perf_counter()
+    result = fn()
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+def child_serial() -> dict:
+    """串行冷启动：逐个导入、逐个构造智能体、预取embedder、创建Crew"""
+    timings = {}
+    _timed(timings, 'import:crewai', lambda: __import__('crewai'))
+    _timed(timings, 'import:agents', lambda: __import__('agents'))
+    _timed(timings, 'import:api', lambda: __import__('api.crewai_api'))
+    
+    from api import crewai_api
+    
+    agents = {}
+    for name, agent_class in crewai_api.AGENT_CLASSES.items():
+        agents[name] = _timed(timings, f'agent:{name}', agent_class)
+    crewai_api._agents = agents
+    
+    try:
+        _timed(timings, 'embedder', crewai_api.prefetch_embedder)
+    except ImportError:
+        timings['embedder'] = None
+    
+    _timed(timings, 'crew', crewai_api.init_crew)
+    return timings
+
+
+def child_warmup() -> dict:
+    """并行预热：导入后启动 WarmupManager 并等待全部完成"""
+    timings = {}
+    _timed(timings, 'import:api', lambda: __import__('api.crewai_api'))
+    
+    from api import crewai_api
+    
+    warmup = crewai_api.get_warmup()
+    ready = _timed(timings, 'warmup:wall', lambda: warmup.start().wait())
+    status = warmup.get_status()
+    
+    for name, component in status['components'].items():
+        timings[f'component:{name}'] = component['duration']
+    for name, duration in crewai_api._agent_init_times.items():
+        timings[f'agent:{name}'] = duration
+    timings['ready'] = ready
+    return timings
+
+
+def run_child(mode: str) -> dict:
+    """在新进程中运行一次测量"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    # 子进程的日志也会输出到stdout，结果在最后一行
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _median(values):
+    values = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    return statistics.median(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务启动耗时压测')
+    parser.add_argument('--repeat', type=int, default=3, help='每种模式重复次数（取中位数）')
+    parser.add_argument('--child', choices=['serial', 'warmup'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        timings = child_serial() if args.child == 'serial' else child_warmup()
+        print(json.dumps(timings))
+        return
+    
+    for mode in ('serial', 'warmup'):
+        runs = [run_child(mode) for _ in range(args.repeat)]
+        keys = list(runs[0].keys())
+        
+        print(f"\n[{mode}] {args.repeat} 次冷启动中位数")
+        for key in keys:
+            value = _median([run.get(key) for run in runs])
+            if key == 'ready':
+                print(f"  {key:<28} {all(run.get('ready') for run in runs)}")
+            else:
+                print(f"  {key:<28} {'-' if value is None else f'{value:.3f}s'}")
+        
+        if mode == 'serial':
+            total = _median([sum(v for k, v in run.items() if not k.startswith('import') and v) for run in runs])
+            print(f"  {'init:total':<28} {total:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+模块导入耗时检查
+在全新的子进程中用 python -X importtime 导入各模块，统计导入总耗时和最慢的依赖，
+超过预算或导入了不该导入的重依赖（crewai、langchain、sentence-transformers等）时以非0状态退出，
+可以直接放进CI
+
+用法:
+    python benchmarks/check_import_time.py
+    python benchmarks/check_import_time.py --module agents --budget 300 --top 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各模块导入耗时预算(毫秒)
+IMPORT_BUDGETS = {
+    'agents': 500,
+    'utils.fast_workflow': 600,
+    'utils.job_queue': 600,
+    'api.crewai_api': 1000,
+}
+
+# 只在第一次创建Crew、加载embedder时才允许导入的重依赖
+DEFERRED_MODULES = [
+    'crewai',
+    'crewai_tools',
+    'langchain',
+    'langchain_core',
+    'sentence_transformers',
+    'transformers',
+    'torch',
+    'llama_index',
+    'pymilvus',
+    'cupy',
+]
+
+# 子进程中在导入目标模块前写到stderr的标记，之前的是解释器启动时的导入
+_MARKER = '@@import-start'
+
+_CHILD_CODE = (
+    "import sys, json\n"
+    "sys.stderr.write({marker!r} + '\\n')\n"
+    "import {module}\n"
+    "print(json.dumps(sorted(m for m in {deferred!r} if m in sys.modules)))\n"
+)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    解析 -X importtime 的输出
+    
+    Args:
+        stderr: 子进程的stderr
+        
+    Returns:
+        [(模块名, 嵌套深度, 自身耗时us, 累计耗时us), ...]，只包含标记之后的导入
+    """
+    entries = []
+    started = False
+    for line in stderr.splitlines():
+        if line.strip() == _MARKER:
+            started = True
+            continue
+        if not started or not line.startswith('import time:'):
+            continue
+        
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 表头
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return entries
+
+
+def measure(module: str) -> Dict:
+    """
+    在新进程中导入模块并测量耗时
+    
+    Args:
+        module: 模块名
+        
+    Returns:
+        {'total_ms', 'entries', 'deferred_loaded'}
+    """
+    code = _CHILD_CODE.format(marker=_MARKER, module=module, deferred=DEFERRED_MODULES)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    
+    entries = parse_importtime(result.stderr)
+    # 顶层条目的累计耗时之和即为本次导入的总耗时
+    total_us = sum(cumulative for _, depth, _, cumulative in entries if depth == 0)
+    deferred_loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    
+    return {
+        'total_ms': total_us / 1000,
+        'entries': entries,
+        'deferred_loaded': deferred_loaded
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模块导入耗时检查')
+    parser.add_argument('--module', action='append', help='只检查指定模块（可重复），默认检查 IMPORT_BUDGETS 中全部模块')
+    parser.add_argument('--budget', type=float, help='覆盖预算(毫秒)')
+    parser.add_argument('--repeat', type=int, default=3, help='每个模块测量次数（取中位数）')
+    parser.add_argument('--top', type=int, default=10, help='显示累计耗时最高的依赖数量')
+    args = parser.parse_args()
+    
+    modules = args.module or list(IMPORT_BUDGETS)
+    failures = []
+    
+    for module in modules:
+        budget = args.budget or IMPORT_BUDGETS.get(module, 1000)
+        runs = [measure(module) for _ in range(args.repeat)]
+        total_ms = statistics.median(run['total_ms'] for run in runs)
+        slowest = max(runs, key=lambda run: run['total_ms'])
+        deferred_loaded = sorted({name for run in runs for name in run['deferred_loaded']})
+        
+        ok = total_ms <= budget and not deferred_loaded
+        print(f"\n[{'OK' if ok else 'FAIL'}] {module}: {total_ms:.1f}ms (预算 {budget:.0f}ms，{args.repeat} 次中位数)")
+        
+        top = sorted(slowest['entries'], key=lambda entry: entry[3], reverse=True)[:args.top]
+        print(f"  {'累计(ms)':>10} {'自身(ms)':>10}  模块")
+        for name, depth, self_us, cumulative_us in top:
+            print(f"  {cumulative_us / 1000:>10.1f} {self_us / 1000:>10.1f}  {'  ' * depth}{name}")
+        
+        if total_ms > budget:
+            failures.append(f"{module} 导入耗时 {total_ms:.1f}ms 超过预算 {budget:.0f}ms")
+        if deferred_loaded:
+            failures.append(f"{module} 导入时加载了应延迟导入的模块: {deferred_loaded}")
+    
+    if failures:
+        print("\n导入耗时检查未通过:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    
+    print("\n导入耗时检查通过")
+
+
+if __name__ == '__main__':
+    main()
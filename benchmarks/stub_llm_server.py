@@ -0,0 +1,119 @@
+"""
+模拟LLM服务
+兼容GLM-4 /chat/completions 接口（含SSE流式输出），按固定延迟返回，
+用于在不消耗真实配额的情况下压测整条调用链
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """模拟 /chat/completions 接口"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        """关闭默认的访问日志"""
+        pass
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        
+        time.sleep(server.latency)
+        
+        messages = payload.get('messages', [])
+        prompt = str(messages[-1].get('content', '')) if messages else ''
+        content = f"[stub] 已收到{len(messages)}条消息，最后一条{len(prompt)}字。{server.reply}"
+        
+        if payload.get('stream'):
+            self._send_stream(content)
+        else:
+            self._send_json(payload, content, prompt)
+    
+    def _send_json(self, payload, content: str, prompt: str):
+        """返回非流式响应"""
+        body = json.dumps({
+            'id': 'stub',
+            'model': payload.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': len(prompt),
+                'completion_tokens': len(content),
+                'total_tokens': len(prompt) + len(content)
+            }
+        }, ensure_ascii=False).encode('utf-8')
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_stream(self, content: str):
+        """返回SSE流式响应（逐字输出）"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        
+        for char in content:
+            chunk = {'choices': [{'index': 0, 'delta': {'content': char}}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def start_stub_server(latency: float = 0.2, port: int = 0, reply: str = '') -> Tuple[ThreadingHTTPServer, str]:
+    """
+    在后台线程启动模拟LLM服务
+    
+    Args:
+        latency: 每次调用的模拟延迟(秒)
+        port: 监听端口（0表示随机端口）
+        reply: 追加到回复末尾的固定文本
+        
+    Returns:
+        (服务实例, api_base地址)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.reply = reply
+    server.request_count = 0
+    server.lock = threading.Lock()
+    
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟GLM-4 /chat/completions 服务')
+    parser.add_argument('--port', type=int, default=18080, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0.2, help='每次调用的模拟延迟(秒)')
+    args = parser.parse_args()
+    
+    server, api_base = start_stub_server(args.latency, args.port)
+    print(f"模拟LLM服务已启动: {api_base}  (延迟 {args.latency}s)")
+    print(f"使用方式: GLM_API_BASE={api_base} python main.py")
+    
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -34,17 +34,38 @@ def main():
     logger.info("  3️⃣  MealPlannerAgent: 生成+验证饮食计划（调用业务工具）")
     logger.info("  4️⃣  HealthGoalAgent: 生成进度跟踪（调用业务工具）")
     logger.info("  5️⃣  ConversationAgent: 综合总结")
+    logger.info("  workflow_mode: crew（默认）/ dag（并发执行）/ fast（规则直算，仅总结调用LLM）")
+    logger.info("  timeout: 请求总时限(秒，默认60，CREWAI_REQUEST_TIMEOUT)，用完后LLM步骤降级为规则结果")
+    logger.info("\n流式接口 (SSE，最后一步逐token输出):")
+    logger.info("  POST /crewai/process/stream")
+    logger.info("\n批量营养分析 (一次分析一天的多个食物):")
+    logger.info("  POST /crewai/nutrition/batch")
+    logger.info("\n异步任务接口 (提交后轮询进度):")
+    logger.info("  POST /crewai/jobs                 - 提交任务")
+    logger.info("  GET  /crewai/jobs/<job_id>        - 查询进度和结果")
+    logger.info("  POST /crewai/jobs/<job_id>/cancel - 取消任务")
+    logger.info("\n结果缓存 (相同减脂上下文直接返回，响应头 X-Cache):")
+    logger.info("  GET    /crewai/cache      - 缓存统计")
+    logger.info("  DELETE /crewai/cache      - 清空缓存（可按 context 删除单条）")
     logger.info("\n辅助接口:")
     logger.info("  GET  /crewai/health     - 健康检查")
+    logger.info("  GET  /crewai/ready      - 就绪检查（后台预热状态）")
+    logger.info("  GET  /crewai/metrics    - Prometheus指标（各智能体请求数、p50/p90/p99延迟）")
     logger.info("  GET  /crewai/crew-info  - Crew信息（含工具统计）")
+    logger.info("\n链路追踪 (请求体 \"trace\": true 时响应附带各阶段耗时，响应头 X-Trace-Id):")
+    logger.info("  CREWAI_TRACE_FILE=traces.jsonl       - 导出到本地JSON-lines文件")
+    logger.info("  CREWAI_OTLP_ENDPOINT=http://...:4318  - 导出到OTLP/HTTP收集器")
     logger.info("\n💡 这是真正的 CrewAI 框架：")
     logger.info("   ✓ 每个 Agent 都有专业工具")
     logger.info("   ✓ 多步工作流（Task 依赖）")
     logger.info("   ✓ 显式校验和约束")
     logger.info("   ✓ Agent 之间互相制约")
+    logger.info("\n⚡ 高并发部署（ASGI，fast模式全程异步）:")
+    logger.info("   uvicorn api.crewai_asgi:app --host 0.0.0.0 --port 5002")
     logger.info("=" * 70)
 
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    # 每个请求使用独立的Crew实例，可以多线程并发处理
+    app.run(host="0.0.0.0", port=5001, debug=True, threaded=True)
 
 
 if __name__ == "__main__":
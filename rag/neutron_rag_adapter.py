@@ -8,6 +8,9 @@ import os
 from typing import Dict, Any, List, Optional
 from loguru import logger
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.tracing import span, instrument_methods, SPAN_RETRIEVAL
+
 # 添加 NeutronRAG 路径到 Python 路径
 NEUTRON_RAG_PATH = os.path.join(
     os.path.dirname(os.path.dirname(__file__)),
@@ -134,6 +137,7 @@ class NeutronRAGAdapter:
             else:
                 raise ValueError(f"不支持的 RAG 模式: {self.rag_mode}")
             
+            self._instrument_retrievers()
             self._initialized = True
             logger.success("✅ NeutronRAG 初始化成功")
             
@@ -144,6 +148,21 @@ class NeutronRAGAdapter:
             self._initialized = False
             raise
     
+    def _instrument_retrievers(self):
+        """给检索器和数据库查询方法加上链路追踪span（Milvus 检索、Nebula 查询等）"""
+        targets = [
+            (getattr(self.chat_engine, 'retriver_vector', None), ['retrieve']),
+            (getattr(self.chat_engine, 'retriver_graph', None), ['retrieve_2hop', 'retrieve_2hop_with_keywords']),
+            (getattr(self.chat_engine, 'retriever_entites', None), ['retrieve']),
+            (self.vector_db, ['retrieve_nodes', 'search', 'get_topk_vector']),
+            (self.graph_db, ['get_retrieve_triplets_1hop', 'get_retrieve_triplets_2hop', 'execute'])
+        ]
+        
+        for target, methods in targets:
+            instrumented = instrument_methods(target, methods, kind=SPAN_RETRIEVAL)
+            if instrumented:
+                logger.debug(f"链路追踪: {type(target).__name__}.{instrumented}")
+    
     def _create_llm_client(self):
         """
         创建 LLM 客户端
@@ -182,10 +201,19 @@ class NeutronRAGAdapter:
             def __init__(self, glm4_client):
                 self.client = glm4_client
             
-            def chat_with_ai(self, prompt: str) -> str:
+            def construct_messages(self, prompt: str, history=None) -> List[Dict[str, str]]:
+                """将 NeutronRAG 的 [[用户, 回复], ...] 历史转换为消息列表"""
+                messages = []
+                for user_input, ai_response in history or []:
+                    messages.append({"role": "user", "content": user_input})
+                    messages.append({"role": "assistant", "content": str(ai_response)})
+                messages.append({"role": "user", "content": prompt})
+                return messages
+            
+            def chat_with_ai(self, prompt: str, history=None) -> str:
                 """调用 LLM 生成回复"""
                 try:
-                    messages = [{"role": "user", "content": prompt}]
+                    messages = self.construct_messages(prompt, history)
                     response = self.client.chat_with_retry(
                         messages=messages,
                         temperature=0.7,
@@ -197,11 +225,24 @@ class NeutronRAGAdapter:
                     return f"抱歉，生成回复时出现错误: {str(e)}"
             
             def chat_with_ai_stream(self, prompt: str, history=None):
-                """流式生成（如果支持）"""
-                # 如果 GLM-4 支持流式，在这里实现
-                # 否则直接返回完整结果
-                result = self.chat_with_ai(prompt)
-                yield result
+                """
+                流式生成
+                
+                与 NeutronRAG 其他客户端保持一致，每次 yield 截至目前的完整回复
+                """
+                result = ""
+                try:
+                    for chunk in self.client.chat_stream(
+                        messages=self.construct_messages(prompt, history),
+                        temperature=0.7,
+                        max_tokens=2048
+                    ):
+                        result += chunk
+                        yield result
+                except Exception as e:
+                    logger.error(f"GLM-4 流式调用失败: {e}")
+                    if not result:
+                        yield f"抱歉，生成回复时出现错误: {str(e)}"
         
         return GLM4Wrapper(glm4_client)
     
@@ -226,16 +267,18 @@ class NeutronRAGAdapter:
         if not self._initialized:
             self.initialize()
         
-        try:
-            # 调用 NeutronRAG 的 chat 接口
-            answer = self.chat_engine.chat_without_stream(question)
-            
-            logger.info(f"RAG 查询成功: {question[:50]}...")
-            return answer
-            
-        except Exception as e:
-            logger.error(f"RAG 查询失败: {e}")
-            return f"抱歉，查询知识库时出现错误: {str(e)}"
+        with span('rag.query', kind=SPAN_RETRIEVAL, rag_mode=self.rag_mode) as rag_span:
+            try:
+                # 调用 NeutronRAG 的 chat 接口
+                answer = self.chat_engine.chat_without_stream(question)
+                
+                logger.info(f"RAG 查询成功: {question[:50]}...")
+                return answer
+                
+            except Exception as e:
+                rag_span.record_error(e)
+                logger.error(f"RAG 查询失败: {e}")
+                return f"抱歉，查询知识库时出现错误: {str(e)}"
     
     def get_retrieval_results(self) -> List[str]:
         """
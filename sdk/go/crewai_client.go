@@ -109,6 +109,46 @@ type NutritionAnalysisResponse struct {
 	Error string `json:"error,omitempty"`
 }
 
+// NutritionBatchRequest 批量营养分析请求
+type NutritionBatchRequest struct {
+	Foods       []map[string]interface{} `json:"foods"` // 食物营养数据列表（最多100个）
+	UserProfile map[string]interface{}   `json:"user_profile,omitempty"`
+	DailyIntake []map[string]interface{} `json:"daily_intake,omitempty"` // 列表之外当天已摄入的食物
+}
+
+// NutritionBatchItem 批量营养分析中单个食物的结果
+type NutritionBatchItem struct {
+	Success  bool                   `json:"success"`
+	FoodName string                 `json:"food_name"`
+	Analysis map[string]interface{} `json:"analysis,omitempty"`
+	Error    string                 `json:"error,omitempty"`
+}
+
+// NutritionDaySummary 全天营养汇总
+type NutritionDaySummary struct {
+	FoodCount          int                    `json:"food_count"`
+	AnalyzedCount      int                    `json:"analyzed_count"`
+	DailyTotal         map[string]float64     `json:"daily_total"`
+	BalanceScore       map[string]interface{} `json:"balance_score"`
+	AverageHealthScore *float64               `json:"average_health_score"`
+	TopCalorieFoods    []struct {
+		FoodName string  `json:"food_name"`
+		Calories float64 `json:"calories"`
+	} `json:"top_calorie_foods"`
+	Recommendations []string `json:"recommendations"`
+}
+
+// NutritionBatchResponse 批量营养分析响应
+type NutritionBatchResponse struct {
+	Success bool `json:"success"`
+	Data    struct {
+		Items      []NutritionBatchItem `json:"items"`
+		DaySummary NutritionDaySummary  `json:"day_summary"`
+	} `json:"data"`
+	Message string `json:"message"`
+	Error   string `json:"error,omitempty"`
+}
+
 // CrewInfo Crew信息
 type CrewInfo struct {
 	Success bool   `json:"success"`
@@ -193,6 +233,13 @@ func (c *CrewAIClient) AnalyzeNutrition(req *NutritionAnalysisRequest) (*Nutriti
 	return &result, err
 }
 
+// AnalyzeNutritionBatch 批量营养分析（一次分析一天内的多个食物）
+func (c *CrewAIClient) AnalyzeNutritionBatch(req *NutritionBatchRequest) (*NutritionBatchResponse, error) {
+	var result NutritionBatchResponse
+	err := c.doRequest("POST", "/crewai/nutrition/batch", req, &result)
+	return &result, err
+}
+
 // GetCrewInfo 获取Crew信息
 func (c *CrewAIClient) GetCrewInfo() (*CrewInfo, error) {
 	var result CrewInfo
@@ -3,40 +3,60 @@ CrewAI适配器 - 真正的 CrewAI 框架集成
 将现有的BaseAgent智能体适配为CrewAI Agent，并挂载业务工具
 """
 
-from typing import Dict, Any, Optional, List
-from crewai import Agent, Task, Crew, Process
-from langchain.llms.base import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+import copy
+import functools
+from typing import Dict, Any, Optional, List, TYPE_CHECKING
 from utils.glm4_client import GLM4Client, get_glm4_client
 from utils.crewai_tools import create_agent_tools
 from loguru import logger as main_logger
 
+# crewai / langchain 导入耗时数秒，推迟到第一次创建Crew时再导入，
+# 只用到规则智能体的脚本和worker导入本模块时不受影响
+if TYPE_CHECKING:
+    from crewai import Agent, Task, Crew
 
-class GLM4LangChainWrapper(LLM):
-    """将GLM4Client包装为LangChain LLM"""
-    
-    client: GLM4Client
-    
-    def __init__(self, client: GLM4Client = None):
-        """初始化LangChain包装器"""
-        super().__init__()
-        self.client = client or get_glm4_client()
-    
-    @property
-    def _llm_type(self) -> str:
-        """返回LLM类型"""
-        return "glm4"
-    
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
-        """调用GLM-4生成回复"""
-        messages = [{"role": "user", "content": prompt}]
-        return self.client.chat(messages, **kwargs)
+
+@functools.lru_cache(maxsize=None)
+def _langchain_wrapper_class() -> type:
+    """首次使用时导入 langchain 并创建 GLM4LangChainWrapper 类"""
+    from langchain.llms.base import LLM
+    from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+    
+    class GLM4LangChainWrapper(LLM):
+        """将GLM4Client包装为LangChain LLM"""
+        
+        client: GLM4Client
+        
+        def __init__(self, client: GLM4Client = None):
+            """初始化LangChain包装器"""
+            super().__init__()
+            self.client = client or get_glm4_client()
+        
+        @property
+        def _llm_type(self) -> str:
+            """返回LLM类型"""
+            return "glm4"
+        
+        def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+        ) -> str:
+            """调用GLM-4生成回复"""
+            messages = [{"role": "user", "content": prompt}]
+            return self.client.chat(messages, **kwargs)
+    
+    GLM4LangChainWrapper.__module__ = __name__
+    return GLM4LangChainWrapper
+
+
+def __getattr__(name: str) -> Any:
+    """兼容 from utils.crewai_adapter import GLM4LangChainWrapper"""
+    if name == 'GLM4LangChainWrapper':
+        return _langchain_wrapper_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class CrewAIAgentAdapter:
@@ -60,29 +80,49 @@ class CrewAIAgentAdapter:
         
         # 创建LangChain包装的GLM-4客户端
         if hasattr(base_agent, 'llm_client') and base_agent.llm_client:
-            self.llm = GLM4LangChainWrapper(base_agent.llm_client)
+            self.llm = _langchain_wrapper_class()(base_agent.llm_client)
         else:
-            self.llm = GLM4LangChainWrapper()
+            self.llm = _langchain_wrapper_class()()
         
         # 创建业务工具（把 BaseAgent 的 process 方法暴露给 CrewAI）
-        tools = []
+        self.tools = []
         if enable_tools:
-            tools = create_agent_tools(base_agent)
-            main_logger.info(f"✅ 为 {base_agent.agent_id} 创建了 {len(tools)} 个工具")
+            self.tools = create_agent_tools(base_agent)
+            main_logger.info(f"✅ 为 {base_agent.agent_id} 创建了 {len(self.tools)} 个工具")
         
         # 创建CrewAI Agent
-        self.crew_agent = Agent(
-            role=role,
-            goal=goal,
-            backstory=backstory,
+        self.crew_agent = self._build_crew_agent()
+    
+    def _build_crew_agent(self) -> 'Agent':
+        """创建CrewAI Agent（共享LLM和工具）"""
+        from crewai import Agent
+        
+        return Agent(
+            role=self.role,
+            goal=self.goal,
+            backstory=self.backstory,
             llm=self.llm,
-            tools=tools,  # 挂载业务工具
+            tools=self.tools,  # 挂载业务工具
             verbose=True,
             allow_delegation=True,
             memory=True
         )
     
-    def create_task(self, description: str, expected_output: str, context: List[Task] = None) -> Task:
+    def fork(self) -> 'CrewAIAgentAdapter':
+        """
+        复制出一个请求级适配器
+        
+        BaseAgent、LLM客户端和业务工具都是无状态或线程安全的，直接共享；
+        只有执行任务时会改写内部状态的CrewAI Agent重新创建。
+        
+        Returns:
+            新的适配器实例
+        """
+        forked = copy.copy(self)
+        forked.crew_agent = self._build_crew_agent()
+        return forked
+    
+    def create_task(self, description: str, expected_output: str, context: List['Task'] = None) -> 'Task':
         """
         创建任务
         
@@ -94,6 +134,8 @@ class CrewAIAgentAdapter:
         Returns:
             CrewAI Task实例
         """
+        from crewai import Task
+        
         return Task(
             description=description,
             expected_output=expected_output,
@@ -102,6 +144,43 @@ class CrewAIAgentAdapter:
         )
 
 
+def build_task_messages(adapter: CrewAIAgentAdapter, task: 'Task', context_outputs: List[str] = None) -> List[Dict[str, str]]:
+    """
+    将单个任务转换为直接调用LLM的消息列表
+    
+    用于绕过 Crew 直接执行（例如流式输出最后一步），
+    提示词结构与 CrewAI Agent 执行任务时保持一致：角色背景 + 任务描述 + 前置任务结果 + 期望输出
+    
+    Args:
+        adapter: 执行该任务的智能体适配器
+        task: CrewAI Task实例
+        context_outputs: 前置任务的输出文本列表
+        
+    Returns:
+        消息列表 [{"role": ..., "content": ...}]
+    """
+    system_prompt = f"你是{adapter.role}。{adapter.backstory}\n你的目标：{adapter.goal}"
+    
+    user_prompt = task.description.strip()
+    if context_outputs:
+        user_prompt += "\n\n前置任务结果：\n" + "\n\n----------\n\n".join(context_outputs)
+    user_prompt += f"\n\n期望输出：{task.expected_output}"
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+# Crew记忆使用的embedder配置
+CREW_EMBEDDER = {
+    "provider": "huggingface",
+    "config": {
+        "model": "sentence-transformers/all-MiniLM-L6-v2"
+    }
+}
+
+
 def create_health_crew(
     food_agent,
     nutrition_agent,
@@ -120,6 +199,8 @@ def create_health_crew(
         配置好的Crew实例和适配器字典
     """
     
+    from crewai import Crew, Process
+    
     # 适配各个智能体（启用工具）
     food_adapter = CrewAIAgentAdapter(
         food_agent,
@@ -169,39 +250,123 @@ def create_health_crew(
         enable_tools=False
     )
     
+    adapters = {
+        'food': food_adapter,
+        'nutrition': nutrition_adapter,
+        'health': health_adapter,
+        'meal': meal_adapter,
+        'conversation': conversation_adapter,
+        'recommendation': recommendation_adapter
+    }
+    
     # 创建Crew（使用分层流程，由 conversation 作为 manager）
     crew = Crew(
-        agents=[
-            conversation_adapter.crew_agent,  # Manager 放第一位
-            health_adapter.crew_agent,
-            nutrition_adapter.crew_agent,
-            meal_adapter.crew_agent,
-            food_adapter.crew_agent,
-            recommendation_adapter.crew_agent
-        ],
+        agents=_crew_agents(adapters),
         process=Process.hierarchical,  # 分层管理
         manager_agent=conversation_adapter.crew_agent,  # 指定 manager
         verbose=True,
         memory=True,  # 启用记忆功能
-        embedder={
-            "provider": "huggingface",
-            "config": {
-                "model": "sentence-transformers/all-MiniLM-L6-v2"
-            }
-        }
+        embedder=CREW_EMBEDDER
     )
     
-    return crew, {
-        'food': food_adapter,
-        'nutrition': nutrition_adapter,
-        'health': health_adapter,
-        'meal': meal_adapter,
-        'conversation': conversation_adapter,
-        'recommendation': recommendation_adapter
-    }
+    return crew, adapters
 
 
-def create_weight_loss_workflow(crew: Crew, adapters: Dict, user_input: Dict[str, Any]) -> List[Task]:
+def prefetch_embedder(embedder: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    预取Crew记忆使用的embedder（只导入依赖并下载模型文件，不创建模型实例）
+    
+    导入 sentence-transformers 和 torch 本身就要数秒，首次使用还要下载模型文件；
+    服务启动时在后台调用，之后 CrewAI 创建记忆组件时按 embedder 配置自行加载模型，
+    只需从本地缓存读取。这里不保留模型实例，避免同一模型在进程中加载两份。
+    
+    Args:
+        embedder: embedder配置（默认 CREW_EMBEDDER）
+        
+    Returns:
+        {'model': 模型名, 'path': 模型文件的本地缓存目录}
+        
+    Raises:
+        ImportError: 未安装 sentence-transformers
+    """
+    model_name = (embedder or CREW_EMBEDDER)["config"]["model"]
+    
+    import sentence_transformers  # noqa: F401  导入 torch 等依赖
+    from huggingface_hub import snapshot_download
+    
+    path = snapshot_download(model_name)
+    main_logger.info(f"✅ embedder模型文件已就绪: {model_name}")
+    return {'model': model_name, 'path': path}
+
+
+# Crew中智能体的排列顺序（Manager 放第一位）
+CREW_AGENT_ORDER = ['conversation', 'health', 'nutrition', 'meal', 'food', 'recommendation']
+
+
+def _crew_agents(adapters: Dict[str, CrewAIAgentAdapter]) -> List['Agent']:
+    """按固定顺序取出各适配器的CrewAI Agent"""
+    return [adapters[name].crew_agent for name in CREW_AGENT_ORDER]
+
+
+def fork_adapters(adapters: Dict[str, CrewAIAgentAdapter]) -> Dict[str, CrewAIAgentAdapter]:
+    """
+    为单个请求复制一组适配器
+    
+    Args:
+        adapters: 预先创建好的适配器字典
+        
+    Returns:
+        请求级适配器字典（CrewAI Agent 独立，其余共享）
+    """
+    return {name: adapter.fork() for name, adapter in adapters.items()}
+
+
+def create_request_crew(template: 'Crew', adapters: Dict[str, CrewAIAgentAdapter], tasks: List['Task']) -> 'Crew':
+    """
+    基于模板Crew创建请求级Crew
+    
+    流程、manager和embedder配置与模板一致，记忆组件直接复用模板已创建好的实例，
+    避免每个请求重新初始化向量存储。不同请求的Crew互不共享可变状态，可以并发执行。
+    
+    Args:
+        template: init时创建的模板Crew
+        adapters: 请求级适配器字典（fork_adapters的返回值）
+        tasks: 本次请求要执行的任务（应使用adapters创建）
+        
+    Returns:
+        请求级Crew实例
+    """
+    from crewai import Crew
+    
+    memory_kwargs = {}
+    for field in ('short_term_memory', 'long_term_memory', 'entity_memory'):
+        shared = getattr(template, f'_{field}', None)
+        if shared is not None:
+            memory_kwargs[field] = shared
+    
+    return Crew(
+        agents=_crew_agents(adapters),
+        tasks=tasks,
+        process=template.process,
+        manager_agent=adapters['conversation'].crew_agent,
+        verbose=template.verbose,
+        memory=template.memory,
+        embedder=template.embedder,
+        **memory_kwargs
+    )
+
+
+# 减脂工作流各任务名称（与 create_weight_loss_workflow 返回顺序一致）
+WEIGHT_LOSS_TASK_NAMES = [
+    'goal_safety',
+    'nutrition_constraints',
+    'meal_plan',
+    'progress_tracking',
+    'final_summary'
+]
+
+
+def create_weight_loss_workflow(crew: 'Crew', adapters: Dict, user_input: Dict[str, Any]) -> List['Task']:
     """
     创建减脂场景的多步工作流
     这是真正的 CrewAI 多智能体协作，带显式校验
@@ -213,7 +378,7 @@ def create_weight_loss_workflow(crew: Crew, adapters: Dict, user_input: Dict[str
             'user_id', 'current_weight', 'target_weight', 
             'days', 'target_calories', 'dietary_preferences', 'restrictions'
         }
-    
+        
     Returns:
         任务列表（按依赖顺序）
     """
@@ -4,66 +4,39 @@ CrewAI 工具集成（修复版）
 """
 
 from typing import Dict, Any, Callable
-from crewai_tools import tool
 from loguru import logger
+from utils.health_rules import check_goal_safety, check_nutrition_balance, check_meal_plan
+from utils.tracing import traced, SPAN_TOOL
+
+
+def _execute_agent(base_agent, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """通过 execute 调用智能体（计入请求统计和延迟分布），失败时抛出异常"""
+    result = base_agent.execute(input_data)
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return result['data']
 
 
 def create_health_goal_tools(base_agent):
     """为 HealthGoalAgent 创建工具"""
+    from crewai_tools import tool  # 推迟导入，仅在创建Crew时需要
     
+    @traced('tool.analyze_health_progress', kind=SPAN_TOOL)
     def _analyze_progress_impl(input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """内部实现：调用 BaseAgent 的 process 方法"""
+        """内部实现：调用 BaseAgent 的 execute 方法"""
         try:
-            logger.info(f"[HealthGoalTools] 调用 {base_agent.agent_id}.process()")
-            result = base_agent.process(input_data)
+            logger.info(f"[HealthGoalTools] 调用 {base_agent.agent_id}.execute()")
+            result = _execute_agent(base_agent, input_data)
             logger.info(f"[HealthGoalTools] 调用成功，返回结果")
             return result
         except Exception as e:
             logger.error(f"[HealthGoalTools] 调用失败: {e}")
             return {"error": str(e)}
     
+    @traced('tool.validate_goal_safety', kind=SPAN_TOOL)
     def _validate_safety_impl(current_weight: float, target_weight: float, days: int) -> Dict[str, Any]:
         """验证目标安全性（规则逻辑）"""
-        try:
-            weight_change = abs(target_weight - current_weight)
-            daily_change = weight_change / days if days > 0 else 0
-            
-            safe_daily_min = 0.05
-            safe_daily_max = 0.15
-            
-            is_safe = safe_daily_min <= daily_change <= safe_daily_max
-            
-            if current_weight > target_weight:
-                goal_type = "减重"
-                if daily_change > safe_daily_max:
-                    risk_level = "高风险"
-                    suggestion = f"减重速度过快！建议延长至 {int(weight_change / safe_daily_max)} 天"
-                elif daily_change < safe_daily_min:
-                    risk_level = "过慢"
-                    suggestion = f"减重速度较慢，可适当调整"
-                else:
-                    risk_level = "安全"
-                    suggestion = "目标设定合理"
-            else:
-                goal_type = "增重"
-                if daily_change > safe_daily_max:
-                    risk_level = "高风险"
-                    suggestion = f"增重速度过快！建议延长至 {int(weight_change / safe_daily_max)} 天"
-                else:
-                    risk_level = "安全"
-                    suggestion = "目标设定合理"
-            
-            logger.info(f"[HealthGoalTools] 安全验证: {risk_level}")
-            return {
-                "is_safe": is_safe,
-                "risk_level": risk_level,
-                "goal_type": goal_type,
-                "daily_change_kg": round(daily_change, 3),
-                "suggestion": suggestion
-            }
-        except Exception as e:
-            logger.error(f"[HealthGoalTools] 验证失败: {e}")
-            return {"error": str(e), "is_safe": False}
+        return check_goal_safety(current_weight, target_weight, days)
     
     # 创建工具（使用闭包正确捕获 base_agent）
     @tool("分析健康目标进度")
@@ -108,50 +81,24 @@ def create_health_goal_tools(base_agent):
 
 def create_nutrition_tools(base_agent):
     """为 NutritionAnalyzerAgent 创建工具"""
+    from crewai_tools import tool  # 推迟导入，仅在创建Crew时需要
     
+    @traced('tool.analyze_nutrition', kind=SPAN_TOOL)
     def _analyze_nutrition_impl(input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """调用 BaseAgent 的 process 方法"""
+        """调用 BaseAgent 的 execute 方法"""
         try:
-            logger.info(f"[NutritionTools] 调用 {base_agent.agent_id}.process()")
-            result = base_agent.process(input_data)
+            logger.info(f"[NutritionTools] 调用 {base_agent.agent_id}.execute()")
+            result = _execute_agent(base_agent, input_data)
             logger.info(f"[NutritionTools] 调用成功")
             return result
         except Exception as e:
             logger.error(f"[NutritionTools] 调用失败: {e}")
             return {"error": str(e)}
     
+    @traced('tool.validate_nutrition_balance', kind=SPAN_TOOL)
     def _validate_balance_impl(daily_total: Dict[str, float]) -> Dict[str, Any]:
         """验证营养平衡（规则逻辑）"""
-        try:
-            standards = {
-                'calories': (1200, 2500),
-                'protein': (50, 150),
-                'carbohydrate': (200, 400),
-                'fat': (30, 100)
-            }
-            
-            validation = {
-                "is_balanced": True,
-                "issues": [],
-                "warnings": []
-            }
-            
-            for nutrient, (min_val, max_val) in standards.items():
-                value = daily_total.get(nutrient, 0)
-                if value < min_val:
-                    validation["is_balanced"] = False
-                    validation["issues"].append(f"{nutrient} 过低: {value} (最低{min_val})")
-                elif value > max_val:
-                    validation["is_balanced"] = False
-                    validation["issues"].append(f"{nutrient} 过高: {value} (最高{max_val})")
-                else:
-                    validation["warnings"].append(f"{nutrient} 正常: {value}")
-            
-            logger.info(f"[NutritionTools] 营养验证: {'平衡' if validation['is_balanced'] else '不平衡'}")
-            return validation
-        except Exception as e:
-            logger.error(f"[NutritionTools] 验证失败: {e}")
-            return {"error": str(e), "is_balanced": False}
+        return check_nutrition_balance(daily_total)
     
     @tool("分析食物营养")
     def analyze_nutrition(input_data_str: str) -> str:
@@ -200,44 +147,24 @@ def create_nutrition_tools(base_agent):
 
 def create_meal_planner_tools(base_agent):
     """为 MealPlannerAgent 创建工具"""
+    from crewai_tools import tool  # 推迟导入，仅在创建Crew时需要
     
+    @traced('tool.generate_meal_plan', kind=SPAN_TOOL)
     def _generate_plan_impl(input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """调用 BaseAgent 的 process 方法"""
+        """调用 BaseAgent 的 execute 方法"""
         try:
-            logger.info(f"[MealPlannerTools] 调用 {base_agent.agent_id}.process()")
-            result = base_agent.process(input_data)
+            logger.info(f"[MealPlannerTools] 调用 {base_agent.agent_id}.execute()")
+            result = _execute_agent(base_agent, input_data)
             logger.info(f"[MealPlannerTools] 调用成功")
             return result
         except Exception as e:
             logger.error(f"[MealPlannerTools] 调用失败: {e}")
             return {"error": str(e)}
     
+    @traced('tool.validate_meal_plan', kind=SPAN_TOOL)
     def _validate_plan_impl(meal_plan: Dict[str, Any], target_calories: int) -> Dict[str, Any]:
         """验证饮食计划（规则逻辑）"""
-        try:
-            validation = {
-                "is_valid": True,
-                "issues": [],
-                "adjustments_needed": []
-            }
-            
-            daily_plans = meal_plan.get('daily_plans', [])
-            for i, day_plan in enumerate(daily_plans):
-                day_calories = day_plan.get('total_calories', 0)
-                calorie_diff = abs(day_calories - target_calories)
-                calorie_tolerance = target_calories * 0.1
-                
-                if calorie_diff > calorie_tolerance:
-                    validation["is_valid"] = False
-                    validation["issues"].append(
-                        f"第{i+1}天热量偏差: {day_calories} vs 目标{target_calories}"
-                    )
-            
-            logger.info(f"[MealPlannerTools] 计划验证: {'通过' if validation['is_valid'] else '不通过'}")
-            return validation
-        except Exception as e:
-            logger.error(f"[MealPlannerTools] 验证失败: {e}")
-            return {"error": str(e), "is_valid": False}
+        return check_meal_plan(meal_plan, target_calories)
     
     @tool("生成饮食计划")
     def generate_meal_plan(input_data_str: str) -> str:
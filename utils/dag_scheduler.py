@@ -0,0 +1,313 @@
+"""
+工作流DAG调度器
+按任务的 context 依赖构建有向无环图，依赖全部完成的任务并发执行，
+执行结束后给出各任务耗时和关键路径
+"""
+
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+
+from utils.tracing import span, propagate
+from utils.deadline import DeadlineExceeded, check_deadline, remaining_time
+
+
+# 与 CrewAI 拼接前置任务输出时使用的分隔符保持一致
+CONTEXT_DIVIDER = "\n\n----------\n\n"
+
+_agent_locks: Dict[int, threading.Lock] = {}
+_agent_locks_guard = threading.Lock()
+
+
+def _drop_agent_lock(agent_id: int):
+    """智能体被回收时移除它的锁（id 可能被新对象复用）"""
+    with _agent_locks_guard:
+        _agent_locks.pop(agent_id, None)
+
+
+def _get_agent_lock(agent: Any) -> threading.Lock:
+    """
+    获取智能体级别的锁（同一个CrewAI Agent同一时刻只执行一个任务）
+    
+    CrewAI Agent 是 pydantic 模型（按字段比较、不可哈希），不能作为 WeakKeyDictionary 的键，
+    因此按 id 索引，并在智能体被回收时通过 weakref.finalize 移除对应的锁，
+    避免每个请求复制出的智能体让锁表无限增长，或把旧锁交给复用了同一 id 的新对象。
+    """
+    with _agent_locks_guard:
+        lock = _agent_locks.get(id(agent))
+        if lock is None:
+            lock = threading.Lock()
+            _agent_locks[id(agent)] = lock
+            try:
+                weakref.finalize(agent, _drop_agent_lock, id(agent))
+            except TypeError:
+                # 不支持弱引用的对象（如内置类型）只能常驻
+                pass
+        return lock
+
+
+def _task_dependencies(task: Any) -> List[Any]:
+    """读取任务的前置依赖（兼容 context 未设置的情况）"""
+    context = getattr(task, 'context', None)
+    if isinstance(context, (list, tuple)):
+        return list(context)
+    return []
+
+
+def execute_crewai_task(task: Any, context_outputs: List[str]) -> str:
+    """
+    直接执行单个CrewAI任务（不经过Crew的manager调度）
+    
+    Args:
+        task: CrewAI Task实例
+        context_outputs: 前置任务的输出文本列表
+        
+    Returns:
+        任务输出文本
+    """
+    context = CONTEXT_DIVIDER.join(context_outputs) if context_outputs else None
+    
+    # CrewAI Agent 执行任务时会改写自身的执行器状态，同一Agent的任务需要串行
+    with _get_agent_lock(task.agent):
+        output = task.execute_sync(agent=task.agent, context=context)
+    
+    return str(output)
+
+
+class TaskGraph:
+    """任务依赖图"""
+    
+    def __init__(self, tasks: List[Any], names: Optional[List[str]] = None):
+        """
+        构建任务依赖图
+        
+        Args:
+            tasks: 任务列表（依赖通过 task.context 声明）
+            names: 任务名称列表（用于报告，默认 task1、task2...）
+        """
+        self.tasks = list(tasks)
+        self.names = list(names) if names else [
+            getattr(task, 'name', None) or f"task{i + 1}" for i, task in enumerate(self.tasks)
+        ]
+        if len(self.names) != len(self.tasks):
+            raise ValueError("任务名称数量与任务数量不一致")
+        
+        index = {id(task): i for i, task in enumerate(self.tasks)}
+        
+        # 只调度列表内的依赖，列表外的前置任务视为已完成
+        self.dependencies: List[List[int]] = [
+            [index[id(dep)] for dep in _task_dependencies(task) if id(dep) in index]
+            for task in self.tasks
+        ]
+        self.dependents: List[List[int]] = [[] for _ in self.tasks]
+        for i, deps in enumerate(self.dependencies):
+            for dep in deps:
+                self.dependents[dep].append(i)
+        
+        self.order = self._topological_order()
+    
+    def _topological_order(self) -> List[int]:
+        """拓扑排序（Kahn算法），存在环时抛出异常"""
+        indegree = [len(deps) for deps in self.dependencies]
+        ready = [i for i, degree in enumerate(indegree) if degree == 0]
+        order = []
+        
+        while ready:
+            node = ready.pop(0)
+            order.append(node)
+            for child in self.dependents[node]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        
+        if len(order) != len(self.tasks):
+            cyclic = [self.names[i] for i, degree in enumerate(indegree) if degree > 0]
+            raise ValueError(f"任务依赖存在环: {cyclic}")
+        
+        return order
+    
+    def levels(self) -> List[List[str]]:
+        """
+        按依赖深度分层
+        
+        Returns:
+            每一层可并发执行的任务名称
+        """
+        depth = [0] * len(self.tasks)
+        for node in self.order:
+            for dep in self.dependencies[node]:
+                depth[node] = max(depth[node], depth[dep] + 1)
+        
+        levels: List[List[str]] = [[] for _ in range(max(depth, default=-1) + 1)]
+        for node, d in enumerate(depth):
+            levels[d].append(self.names[node])
+        return levels
+    
+    def critical_path(self, durations: List[float]) -> List[int]:
+        """
+        计算关键路径（按实际耗时加权的最长依赖链）
+        
+        Args:
+            durations: 各任务耗时
+            
+        Returns:
+            关键路径上的任务下标（按执行顺序）
+        """
+        finish = [0.0] * len(self.tasks)
+        previous: List[Optional[int]] = [None] * len(self.tasks)
+        
+        for node in self.order:
+            for dep in self.dependencies[node]:
+                if previous[node] is None or finish[dep] > finish[previous[node]]:
+                    previous[node] = dep
+            finish[node] = durations[node] + (finish[previous[node]] if previous[node] is not None else 0.0)
+        
+        if not self.tasks:
+            return []
+        
+        node = max(range(len(self.tasks)), key=lambda i: finish[i])
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return list(reversed(path))
+
+
+class DAGScheduler:
+    """DAG并发调度器
+    
+    依赖全部完成的任务立即提交到线程池，与 Process.sequential/hierarchical
+    逐个执行相比，互不依赖的任务可以同时等待LLM响应。
+    """
+    
+    def __init__(self, max_workers: int = 4):
+        """
+        初始化调度器
+        
+        Args:
+            max_workers: 最大并发任务数
+        """
+        self.max_workers = max_workers
+    
+    def run(
+        self,
+        tasks: List[Any],
+        names: Optional[List[str]] = None,
+        execute_fn: Callable[[Any, List[str]], str] = execute_crewai_task,
+        on_task_done: Optional[Callable[[str, float], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        按依赖关系并发执行任务
+        
+        Args:
+            tasks: 任务列表
+            names: 任务名称列表（用于报告）
+            execute_fn: 执行单个任务的函数 (task, 前置任务输出列表) -> 输出文本
+            on_task_done: 任务完成回调 (任务名称, 耗时)，抛出异常会取消尚未开始的任务
+            
+        Returns:
+            {'outputs': 与tasks同序的输出列表, 'report': 调度报告}
+            
+        Raises:
+            DeadlineExceeded: 请求时限用完（尚未开始的任务被取消，不再等待执行中的任务）
+        """
+        graph = TaskGraph(tasks, names)
+        count = len(graph.tasks)
+        
+        outputs: List[Optional[str]] = [None] * count
+        starts = [0.0] * count
+        ends = [0.0] * count
+        remaining = [len(deps) for deps in graph.dependencies]
+        
+        task_ids = {id(task) for task in graph.tasks}
+        started_at = time.perf_counter()
+        
+        def run_one(node: int) -> str:
+            check_deadline(f'task.{graph.names[node]}')
+            starts[node] = time.perf_counter() - started_at
+            context_outputs = [outputs[dep] for dep in graph.dependencies[node] if outputs[dep]]
+            # 列表外的前置任务（已执行过的）直接读取其输出
+            context_outputs += [
+                str(dep.output) for dep in _task_dependencies(graph.tasks[node])
+                if id(dep) not in task_ids and getattr(dep, 'output', None)
+            ]
+            try:
+                with span(f'task.{graph.names[node]}'):
+                    return execute_fn(graph.tasks[node], context_outputs)
+            finally:
+                ends[node] = time.perf_counter() - started_at
+        
+        # 线程池中执行的任务仍属于调用方的trace和请求时限
+        run_one = propagate(run_one)
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dag-task')
+        timed_out = False
+        try:
+            running = {
+                executor.submit(run_one, node): node
+                for node in range(count) if remaining[node] == 0
+            }
+            
+            while running:
+                done, _ = wait(running, timeout=remaining_time(), return_when=FIRST_COMPLETED)
+                if not done:
+                    timed_out = True
+                    logger.error(f"DAG工作流超出请求时限，取消未完成的任务: {[graph.names[node] for node in running.values()]}")
+                    raise DeadlineExceeded("DAG工作流超出请求时限")
+                
+                for future in done:
+                    node = running.pop(future)
+                    try:
+                        outputs[node] = future.result()
+                        if on_task_done:
+                            on_task_done(graph.names[node], ends[node] - starts[node])
+                    except Exception:
+                        for pending in running:
+                            pending.cancel()
+                        logger.error(f"DAG任务执行失败: {graph.names[node]}")
+                        raise
+                    
+                    logger.info(f"✅ DAG任务完成: {graph.names[node]} ({ends[node] - starts[node]:.2f}s)")
+                    for child in graph.dependents[node]:
+                        remaining[child] -= 1
+                        if remaining[child] == 0:
+                            running[executor.submit(run_one, child)] = child
+        finally:
+            # 超时后不再等待执行中的任务（其LLM调用也会因时限用完很快失败）
+            executor.shutdown(wait=not timed_out, cancel_futures=timed_out)
+        
+        wall_time = time.perf_counter() - started_at
+        return {
+            'outputs': outputs,
+            'report': self._build_report(graph, starts, ends, wall_time)
+        }
+    
+    def _build_report(self, graph: TaskGraph, starts: List[float], ends: List[float], wall_time: float) -> Dict[str, Any]:
+        """生成调度报告"""
+        durations = [end - start for start, end in zip(starts, ends)]
+        path = graph.critical_path(durations)
+        serial_time = sum(durations)
+        
+        return {
+            'mode': 'dag',
+            'max_workers': self.max_workers,
+            'wall_time': round(wall_time, 3),
+            'serial_time': round(serial_time, 3),
+            'speedup': round(serial_time / wall_time, 2) if wall_time > 0 else 1.0,
+            'levels': graph.levels(),
+            'critical_path': [graph.names[i] for i in path],
+            'critical_path_time': round(sum(durations[i] for i in path), 3),
+            'tasks': [
+                {
+                    'name': graph.names[i],
+                    'depends_on': [graph.names[dep] for dep in graph.dependencies[i]],
+                    'start': round(starts[i], 3),
+                    'end': round(ends[i], 3),
+                    'duration': round(durations[i], 3)
+                }
+                for i in range(len(graph.tasks))
+            ]
+        }
@@ -0,0 +1,121 @@
+"""
+请求时限（deadline）传递
+API为每个请求设定总时限，保存在 contextvar 中，随调用链传到 BaseAgent.execute、
+DAG任务和 GLM4Client；每个阶段只能使用剩余的时间，HTTP超时和重试等待都按剩余时间收缩，
+时间用完后LLM调用直接失败，由各智能体已有的规则系统兜底
+
+线程池中的任务需要用 utils.tracing.propagate 包装，才能继承调用方的时限
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """请求时限已用完"""
+
+
+class Deadline:
+    """单调时钟上的截止时间"""
+    
+    def __init__(self, timeout: float):
+        """
+        Args:
+            timeout: 从现在起的可用时间(秒)
+        """
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+    
+    def remaining(self) -> float:
+        """剩余时间(秒)，已过期时为0"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+    
+    @property
+    def expired(self) -> bool:
+        """是否已过期"""
+        return time.monotonic() >= self.expires_at
+    
+    def check(self, stage: str = ''):
+        """已过期时抛出 DeadlineExceeded"""
+        if self.expired:
+            where = f"（{stage}）" if stage else ''
+            raise DeadlineExceeded(f"请求时限 {self.timeout:.1f}秒 已用完{where}")
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar('crewai_deadline', default=None)
+
+
+def get_deadline() -> Optional[Deadline]:
+    """当前上下文的截止时间（未设置时为None）"""
+    return _current_deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """当前上下文的剩余时间(秒)，未设置时限时为None"""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check_deadline(stage: str = ''):
+    """当前上下文的时限已用完时抛出 DeadlineExceeded"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def bounded_timeout(timeout: float, stage: str = '') -> float:
+    """
+    按剩余时间收缩超时
+    
+    Args:
+        timeout: 本阶段原本的超时(秒)
+        stage: 阶段名称（用于错误信息）
+        
+    Returns:
+        不超过剩余时间的超时(秒)
+        
+    Raises:
+        DeadlineExceeded: 时限已用完
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    deadline.check(stage)
+    return min(timeout, deadline.remaining())
+
+
+def can_wait(seconds: float) -> bool:
+    """等待指定时间后是否仍在时限内（用于判断是否值得重试）"""
+    remaining = remaining_time()
+    return remaining is None or seconds < remaining
+
+
+@contextmanager
+def deadline_scope(timeout: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    在时限内执行一段代码
+    
+    嵌套时取更早的截止时间，内层不能延长外层的时限。
+    
+    Args:
+        timeout: 可用时间(秒)，None表示沿用外层时限
+        
+    Yields:
+        生效的截止时间（没有任何时限时为None）
+    """
+    outer = _current_deadline.get()
+    if timeout is None:
+        yield outer
+        return
+    
+    deadline = Deadline(timeout)
+    if outer is not None and outer.expires_at <= deadline.expires_at:
+        deadline = outer
+    
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
@@ -0,0 +1,283 @@
+"""
+减脂场景快速工作流
+安全验证、饮食计划、计划校验、营养平衡、进度跟踪都是可以直接计算的规则步骤，
+直接在Python中执行，只有最后的综合总结调用一次LLM
+"""
+
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+
+from utils.health_rules import check_goal_safety, check_nutrition_balance, check_meal_plan
+from utils.tracing import span, SPAN_RULE
+
+
+# CrewAI 模式下除总结外的4个任务（安全验证、营养约束、饮食计划、进度跟踪）都由智能体执行，
+# 每个任务至少需要两次LLM调用：决定调用哪个工具 + 根据工具结果生成回答；
+# 快速模式据此估算省下的LLM调用数（llm_calls_skipped_estimate，不是实际计数）
+CREW_RULE_TASKS = 4
+LLM_CALLS_PER_AGENT_STEP = 2
+
+# 快速模式下饮食计划最多生成的天数（更长的周期按周循环即可）
+MAX_PLAN_DAYS = 7
+
+
+def _record_step(steps: List[Dict[str, Any]], on_step: Optional[Callable], name: str, method: str, start: float):
+    """记录步骤耗时并触发进度回调"""
+    step = {
+        'name': name,
+        'method': method,
+        'duration': round(time.perf_counter() - start, 4)
+    }
+    steps.append(step)
+    if on_step:
+        on_step(name, method=method, duration=step['duration'])
+
+
+def run_rule_steps(
+    agents: Dict[str, Any],
+    workflow_input: Dict[str, Any],
+    on_step: Optional[Callable] = None
+) -> Dict[str, Any]:
+    """
+    执行减脂工作流中所有可直接计算的步骤
+    
+    Args:
+        agents: 智能体字典（需要 'meal'、'health'）
+        workflow_input: 工作流输入（同 create_weight_loss_workflow）
+        on_step: 步骤完成回调 on_step(step_name, **info)，抛出异常会中止后续步骤
+        
+    Returns:
+        {'facts': 各步骤结果, 'steps': 步骤耗时记录}
+    """
+    current_weight = float(workflow_input.get('current_weight', 75))
+    target_weight = float(workflow_input.get('target_weight', 70))
+    days = int(workflow_input.get('days', 30))
+    target_calories = int(workflow_input.get('target_calories', 1800))
+    steps: List[Dict[str, Any]] = []
+    
+    def _timed(name: str, fn, *args):
+        """执行一个规则步骤并记录耗时"""
+        start = time.perf_counter()
+        with span(f'rule.{name}', kind=SPAN_RULE):
+            result = fn(*args)
+        _record_step(steps, on_step, name, 'rules', start)
+        return result
+    
+    # 1. 目标安全性验证
+    safety = _timed('goal_safety', check_goal_safety, current_weight, target_weight, days)
+    
+    # 2. 按规则生成饮食计划
+    meal_plan = _timed(
+        'meal_plan',
+        agents['meal']._generate_with_rules,
+        target_calories,
+        workflow_input.get('dietary_preferences', []),
+        workflow_input.get('restrictions', []),
+        'weight_loss',
+        max(1, min(days, MAX_PLAN_DAYS))
+    )
+    
+    # 3. 计划热量校验
+    plan_validation = _timed('meal_plan_validation', check_meal_plan, meal_plan, meal_plan['target_calories'])
+    
+    # 4. 以计划的日均营养做营养平衡校验
+    average = meal_plan['nutrition_summary']['average_daily_nutrition']
+    nutrition_balance = _timed('nutrition_balance', check_nutrition_balance, {
+        'calories': average.get('calories', 0),
+        'protein': average.get('protein', 0),
+        'carbohydrate': average.get('carbs', 0),
+        'fat': average.get('fat', 0)
+    })
+    
+    # 5. 健康目标进度跟踪
+    progress = _timed('progress_tracking', agents['health'].process, {
+        'user_id': workflow_input.get('user_id'),
+        'goal_type': 'weight_loss',
+        'current_data': {'value': current_weight},
+        'historical_data': workflow_input.get('historical_data', []),
+        'target': {'value': target_weight}
+    })
+    
+    return {
+        'facts': {
+            'goal_safety': safety,
+            'meal_plan': meal_plan,
+            'meal_plan_validation': plan_validation,
+            'nutrition_balance': nutrition_balance,
+            'progress_tracking': progress
+        },
+        'steps': steps
+    }
+
+
+def build_summary_messages(workflow_input: Dict[str, Any], facts: Dict[str, Any], system_prompt: str) -> List[Dict[str, str]]:
+    """
+    根据规则步骤的结果构建综合总结的提示词
+    
+    Args:
+        workflow_input: 工作流输入
+        facts: run_rule_steps 返回的 facts
+        system_prompt: 系统提示词
+        
+    Returns:
+        消息列表
+    """
+    meal_plan = facts['meal_plan']
+    # 只取第一天作为示例，避免提示词过长
+    plan_brief = {
+        'target_calories': meal_plan['target_calories'],
+        'nutrition_summary': meal_plan['nutrition_summary'],
+        'sample_day': meal_plan['meal_plan'][0] if meal_plan['meal_plan'] else {},
+        'shopping_list': meal_plan['shopping_list']
+    }
+    progress = facts['progress_tracking']
+    
+    report = {
+        '用户目标': {
+            '当前体重kg': workflow_input.get('current_weight'),
+            '目标体重kg': workflow_input.get('target_weight'),
+            '计划天数': workflow_input.get('days'),
+            '饮食偏好': workflow_input.get('dietary_preferences', []),
+            '饮食限制': workflow_input.get('restrictions', [])
+        },
+        '目标安全性评估': facts['goal_safety'],
+        '饮食计划': plan_brief,
+        '计划校验': facts['meal_plan_validation'],
+        '营养平衡校验': facts['nutrition_balance'],
+        '进度跟踪': {
+            'recommendations': progress.get('recommendations', []),
+            'alerts': progress.get('alerts', [])
+        }
+    }
+    
+    user_prompt = f"""以下是各专家规则系统的计算结果：
+{json.dumps(report, ensure_ascii=False, indent=2)}
+
+请综合以上结果，为用户提供完整的减脂方案，用友好、专业的语言解释：
+- 这个减脂计划是否安全
+- 每天应该吃什么
+- 如何跟踪进度
+- 注意事项和建议"""
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def build_rule_summary(facts: Dict[str, Any]) -> str:
+    """LLM不可用时的规则总结"""
+    safety = facts['goal_safety']
+    meal_plan = facts['meal_plan']
+    average = meal_plan['nutrition_summary']['average_daily_nutrition']
+    balance = facts['nutrition_balance']
+    recommendations = facts['progress_tracking'].get('recommendations', [])
+    
+    lines = [
+        f"目标安全性：{safety.get('risk_level', '未知')}，{safety.get('suggestion', '')}",
+        f"饮食计划：每日约 {average.get('calories')} 千卡（蛋白质 {average.get('protein')}g，"
+        f"碳水 {average.get('carbs')}g，脂肪 {average.get('fat')}g）",
+        "营养平衡：" + ('良好' if balance.get('is_balanced') else '；'.join(balance.get('issues', [])))
+    ]
+    lines.extend(recommendations)
+    return '\n'.join(lines)
+
+
+def _finish_workflow(
+    facts: Dict[str, Any],
+    steps: List[Dict[str, Any]],
+    response: Optional[str],
+    llm_calls_made: int,
+    start: float,
+    on_step: Optional[Callable]
+) -> Dict[str, Any]:
+    """记录总结步骤并组装快速工作流结果（LLM未返回时使用规则总结）"""
+    summary_method = 'llm' if response is not None else 'rules'
+    if response is None:
+        response = build_rule_summary(facts)
+    
+    _record_step(steps, on_step, 'final_summary', summary_method, start)
+    
+    return {
+        'response': response,
+        'facts': facts,
+        'steps': steps,
+        'llm_calls_made': llm_calls_made,
+        'llm_calls_skipped_estimate': CREW_RULE_TASKS * LLM_CALLS_PER_AGENT_STEP
+    }
+
+
+def run_fast_weight_loss_workflow(
+    agents: Dict[str, Any],
+    workflow_input: Dict[str, Any],
+    on_step: Optional[Callable] = None
+) -> Dict[str, Any]:
+    """
+    执行快速减脂工作流
+    
+    Args:
+        agents: 智能体字典（需要 'meal'、'health'、'conversation'）
+        workflow_input: 工作流输入
+        on_step: 步骤完成回调 on_step(step_name, **info)
+        
+    Returns:
+        {'response', 'facts', 'steps', 'llm_calls_made', 'llm_calls_skipped_estimate'}
+    """
+    result = run_rule_steps(agents, workflow_input, on_step)
+    facts, steps = result['facts'], result['steps']
+    
+    conversation = agents['conversation']
+    messages = build_summary_messages(workflow_input, facts, conversation.system_prompt)
+    
+    llm_calls_made = 0
+    response = None
+    start = time.perf_counter()
+    if conversation.use_llm and conversation.llm_client:
+        llm_calls_made = 1
+        try:
+            response = conversation.llm_client.chat_with_retry(messages, temperature=conversation.temperature)
+        except Exception as e:
+            logger.error(f"快速工作流总结生成失败，使用规则总结: {e}")
+    
+    return _finish_workflow(facts, steps, response, llm_calls_made, start, on_step)
+
+
+async def arun_fast_weight_loss_workflow(
+    agents: Dict[str, Any],
+    workflow_input: Dict[str, Any],
+    async_client: Any,
+    on_step: Optional[Callable] = None
+) -> Dict[str, Any]:
+    """
+    执行快速减脂工作流（异步版本，总结通过 AsyncGLM4Client 生成）
+    
+    规则步骤都是微秒级的纯计算，直接在事件循环中执行。
+    
+    Args:
+        agents: 智能体字典（需要 'meal'、'health'、'conversation'）
+        workflow_input: 工作流输入
+        async_client: AsyncGLM4Client实例（None表示只使用规则总结）
+        on_step: 步骤完成回调 on_step(step_name, **info)
+        
+    Returns:
+        同 run_fast_weight_loss_workflow
+    """
+    result = run_rule_steps(agents, workflow_input, on_step)
+    facts, steps = result['facts'], result['steps']
+    
+    conversation = agents['conversation']
+    messages = build_summary_messages(workflow_input, facts, conversation.system_prompt)
+    
+    llm_calls_made = 0
+    response = None
+    start = time.perf_counter()
+    if async_client is not None:
+        llm_calls_made = 1
+        try:
+            response = await async_client.achat_with_retry(messages, temperature=conversation.temperature)
+        except Exception as e:
+            logger.error(f"快速工作流总结生成失败，使用规则总结: {e}")
+    
+    return _finish_workflow(facts, steps, response, llm_calls_made, start, on_step)
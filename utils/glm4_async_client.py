@@ -0,0 +1,344 @@
+"""
+智谱AI GLM-4异步客户端
+基于asyncio + aiohttp，单个进程即可同时挂起数百个LLM调用
+"""
+
+import asyncio
+import json
+import weakref
+from typing import List, Dict, Any, Optional, AsyncIterator
+from loguru import logger
+
+from utils.glm4_client import (
+    GLM4Client,
+    GLM4APIError,
+    parse_retry_after,
+    parse_stream_line,
+    is_retryable_error,
+    retry_delay
+)
+from utils.llm_cache import make_prompt_key
+from utils.singleflight import AsyncSingleFlight
+from utils.rate_limiter import estimate_tokens
+from utils.tracing import span, start_span, SPAN_LLM
+from utils.deadline import DeadlineExceeded, bounded_timeout, can_wait, get_deadline
+
+
+# 全局并发上限（所有AsyncGLM4Client实例共享）
+_max_in_flight = 256
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def set_max_in_flight(limit: int):
+    """
+    设置全局在途请求上限
+    
+    只对之后新建的事件循环生效，已创建的信号量保持原上限。
+    """
+    global _max_in_flight
+    _max_in_flight = max(1, int(limit))
+
+
+def get_global_semaphore() -> asyncio.Semaphore:
+    """获取当前事件循环的全局信号量（每个事件循环一个）"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_in_flight)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+class AsyncGLM4Client(GLM4Client):
+    """智谱AI GLM-4异步客户端
+    
+    请求体、请求头、错误信息、重试策略、响应缓存和请求合并与GLM4Client保持一致，
+    仅把阻塞的HTTP调用和退避等待换成了协程。
+    所有在途请求受全局信号量约束，避免打爆上游配额。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化GLM-4异步客户端
+        
+        Args:
+            config: GLM-4配置字典
+        """
+        self._aio_session = None
+        self._aio_loop = None
+        self.async_singleflight = None
+        
+        super().__init__(config)
+    
+    def _apply_config(self, config: Dict[str, Any]):
+        """应用配置（额外处理异步配置段）"""
+        super()._apply_config(config)
+        
+        # 协程的请求合并与同步客户端共用 singleflight 开关
+        if self.singleflight is not None:
+            self.async_singleflight = self.async_singleflight or AsyncSingleFlight()
+        else:
+            self.async_singleflight = None
+        
+        self.async_config = config.get('async', {})
+        if 'max_concurrency' in self.async_config:
+            set_max_in_flight(self.async_config['max_concurrency'])
+    
+    async def _get_aio_session(self):
+        """获取当前事件循环的aiohttp会话（首次使用时创建）"""
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("AsyncGLM4Client 需要安装 aiohttp: pip install aiohttp") from e
+        
+        loop = asyncio.get_running_loop()
+        if self._aio_session is None or self._aio_session.closed or self._aio_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.http_config.get('pool_maxsize', 16) * self.http_config.get('pool_connections', 4),
+                limit_per_host=self.async_config.get('limit_per_host', 0),
+                keepalive_timeout=self.async_config.get('keepalive_timeout', 30) if self.keep_alive else None,
+                force_close=not self.keep_alive
+            )
+            self._aio_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._aio_loop = loop
+        return self._aio_session
+    
+    def _request_timeout(self):
+        """单次请求的超时（不超过请求剩余时限）"""
+        import aiohttp
+        
+        return aiohttp.ClientTimeout(total=bounded_timeout(self.timeout, 'llm'))
+    
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> str:
+        """
+        GLM-4异步聊天接口
+        
+        Args:
+            messages: 消息列表 [{"role": "user", "content": "..."}]
+            model: 模型名称（默认使用glm-4-flash）
+            temperature: 温度参数（0-1，控制创造性）
+            max_tokens: 最大输出token数
+            
+        Returns:
+            模型回复文本
+        """
+        payload = self.build_payload(messages, model, temperature, max_tokens)
+        
+        prompt_key = make_prompt_key(
+            payload['model'],
+            payload['messages'],
+            payload['temperature'],
+            payload['max_tokens']
+        )
+        
+        with span('llm.achat', kind=SPAN_LLM, model=payload['model'], messages=len(messages)) as llm_span:
+            # 命中缓存则直接返回，不再请求上游
+            use_cache = self._is_cacheable(payload)
+            if use_cache:
+                cached = self.cache.get(prompt_key)
+                if cached is not None:
+                    logger.debug(f"GLM-4缓存命中，长度: {len(cached)}")
+                    llm_span.set_attribute('cache', 'hit')
+                    return cached
+            
+            async def fetch() -> str:
+                content = await self._arequest_limited(payload)
+                if use_cache:
+                    self.cache.set(prompt_key, content)
+                return content
+            
+            llm_span.set_attribute('cache', 'miss' if use_cache else 'disabled')
+            
+            # 相同提示词的并发请求合并为一次上游调用
+            if self.async_singleflight is not None:
+                return await self.async_singleflight.do(prompt_key, fetch)
+            return await fetch()
+    
+    async def _arequest_limited(self, payload: Dict[str, Any]) -> str:
+        """请求上游聊天接口并返回回复文本（经过全局信号量和客户端限流）"""
+        headers = self.build_headers()
+        async with get_global_semaphore():
+            if self.rate_limiter is None:
+                return (await self._arequest_completion(payload, headers))[0]
+            
+            async with self.rate_limiter.alimit(estimate_tokens(payload['messages'])) as permit:
+                try:
+                    content, usage = await self._arequest_completion(payload, headers)
+                except GLM4APIError as e:
+                    permit['throttled'] = e.status_code == 429
+                    raise
+                
+                permit['success'] = True
+                if usage.get('total_tokens'):
+                    permit['actual_tokens'] = usage['total_tokens']
+                return content
+    
+    async def _arequest_completion(self, payload: Dict[str, Any], headers: Dict[str, str]):
+        """发送请求，返回(回复文本, token用量)"""
+        session = await self._get_aio_session()
+        timeout = self._request_timeout()
+        try:
+            logger.debug(f"调用GLM-4 API(async): {payload['model']}")
+            async with session.post(self.chat_url, json=payload, headers=headers, timeout=timeout) as response:
+                status = response.status
+                body = await response.text()
+                retry_after = response.headers.get('Retry-After')
+        except Exception as e:
+            logger.error(f"GLM API调用失败: {e}")
+            raise
+        
+        if status >= 400:
+            error_msg = f"GLM API HTTP错误: {status}"
+            if body:
+                error_msg += f" - {body}"
+            logger.error(error_msg)
+            raise GLM4APIError(error_msg, status_code=status, retry_after=parse_retry_after(retry_after))
+        
+        result = json.loads(body)
+        content = result['choices'][0]['message']['content']
+        
+        logger.debug(f"GLM-4响应成功，长度: {len(content)}")
+        return content, result.get('usage') or {}
+    
+    async def achat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        GLM-4异步流式聊天接口（SSE）
+        
+        整个流式响应期间占用一个全局并发名额。
+        
+        Args:
+            messages: 消息列表 [{"role": "user", "content": "..."}]
+            model: 模型名称（默认使用glm-4-flash）
+            temperature: 温度参数（0-1，控制创造性）
+            max_tokens: 最大输出token数
+            
+        Yields:
+            模型逐步生成的文本片段（增量）
+        """
+        payload = self.build_payload(messages, model, temperature, max_tokens, stream=True)
+        headers = self.build_headers()
+        headers["Accept"] = "text/event-stream"
+        
+        # 生成器中不切换当前span，只记录区间
+        stream_span = start_span('llm.achat_stream', kind=SPAN_LLM, model=payload['model'], messages=len(messages))
+        try:
+            async with get_global_semaphore():
+                session = await self._get_aio_session()
+                timeout = self._request_timeout()
+                logger.debug(f"调用GLM-4 流式API(async): {payload['model']}")
+                async with session.post(self.chat_url, json=payload, headers=headers, timeout=timeout) as response:
+                    if response.status >= 400:
+                        body = await response.text()
+                        error_msg = f"GLM API HTTP错误: {response.status}"
+                        if body:
+                            error_msg += f" - {body}"
+                        logger.error(error_msg)
+                        raise GLM4APIError(
+                            error_msg,
+                            status_code=response.status,
+                            retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                        )
+                    
+                    total_length = 0
+                    async for raw_line in response.content:
+                        done, content = parse_stream_line(raw_line.decode('utf-8').strip())
+                        if done:
+                            break
+                        if content:
+                            total_length += len(content)
+                            yield content
+                    
+                    logger.debug(f"GLM-4流式响应结束，长度: {total_length}")
+        except Exception as e:
+            stream_span.record_error(e)
+            raise
+        finally:
+            stream_span.end()
+    
+    async def achat_with_retry(
+        self,
+        messages: List[Dict[str, str]],
+        max_retries: int = 3,
+        **kwargs
+    ) -> str:
+        """
+        带重试的异步聊天接口
+        
+        Args:
+            messages: 消息列表
+            max_retries: 最大重试次数
+            **kwargs: 其他参数
+            
+        Returns:
+            模型回复
+        """
+        last_error = None
+        attempts = 0
+        
+        for attempt in range(max_retries):
+            attempts += 1
+            try:
+                return await self.achat(messages, **kwargs)
+            except Exception as e:
+                last_error = e
+                if not is_retryable_error(e):
+                    logger.warning(f"API调用失败且不可重试: {e}")
+                    break
+                if attempt < max_retries - 1:
+                    wait_time = retry_delay(e, attempt)
+                    if not can_wait(wait_time):
+                        logger.warning(f"API调用失败，剩余时限不足以等待{wait_time:.1f}秒后重试")
+                        break
+                    logger.warning(f"API调用失败，{wait_time:.1f}秒后重试 ({attempt + 1}/{max_retries})")
+                    await asyncio.sleep(wait_time)
+        
+        deadline = get_deadline()
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"API调用超出请求时限，已尝试{attempts}次: {last_error}")
+        raise Exception(f"API调用失败，已重试{attempts}次: {last_error}")
+    
+    def get_singleflight_stats(self) -> Optional[Dict[str, Any]]:
+        """获取请求合并统计（协程调用的合并统计在 async 字段中）"""
+        stats = super().get_singleflight_stats()
+        if stats is not None and self.async_singleflight is not None:
+            stats['async'] = self.async_singleflight.get_stats()
+        return stats
+    
+    async def aclose(self):
+        """关闭aiohttp会话"""
+        if self._aio_session is not None and not self._aio_session.closed:
+            await self._aio_session.close()
+        self._aio_session = None
+        self._aio_loop = None
+
+
+def get_async_glm4_client(config_path: str = None) -> AsyncGLM4Client:
+    """
+    获取GLM-4异步客户端实例（同一配置文件共享一个实例，支持热更新）
+    
+    Args:
+        config_path: 配置文件路径
+        
+    Returns:
+        GLM-4异步客户端实例
+    """
+    from utils.llm_registry import get_client_registry
+    
+    return get_client_registry().get(config_path, AsyncGLM4Client)
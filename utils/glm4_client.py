@@ -4,10 +4,106 @@
 """
 
 import os
+import json
+import random
+import socket
+import threading
 import requests
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional, Iterator
 from loguru import logger
 import time
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.llm_cache import create_llm_cache, make_prompt_key
+from utils.singleflight import SingleFlight
+from utils.rate_limiter import get_rate_limiter, estimate_tokens
+from utils.tracing import span, start_span, SPAN_LLM
+from utils.deadline import DeadlineExceeded, bounded_timeout, can_wait, check_deadline, get_deadline
+
+
+class GLM4APIError(Exception):
+    """GLM API返回的HTTP错误"""
+    
+    def __init__(self, message: str, status_code: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（仅支持秒数）"""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    判断错误是否值得重试
+    
+    429（限流）和5xx（服务端错误）以及网络错误可以重试；
+    其他4xx（参数错误、鉴权失败等）重试也不会成功，直接失败；
+    请求时限用完后也不再重试。
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, GLM4APIError) and error.status_code is not None:
+        return error.status_code == 429 or error.status_code >= 500
+    return True
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+    计算重试等待时间
+    
+    优先遵循服务端的Retry-After，否则使用带随机抖动的指数退避，
+    避免大量调用方在同一时刻集中重试。
+    """
+    if isinstance(error, GLM4APIError) and error.retry_after is not None:
+        return error.retry_after
+    base = 2 ** attempt
+    return base * (0.5 + random.random() / 2)
+
+
+def parse_stream_line(line: str):
+    """
+    解析SSE流式响应中的一行
+    
+    Args:
+        line: 已解码的一行文本
+        
+    Returns:
+        (是否结束, 文本增量)，非data行或无内容时文本增量为None
+    """
+    if not line.startswith('data:'):
+        return False, None
+    
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return True, None
+    
+    chunk = json.loads(data)
+    choices = chunk.get('choices') or [{}]
+    return False, (choices[0].get('delta') or {}).get('content')
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """开启TCP keep-alive的连接池适配器"""
+    
+    def __init__(self, tcp_keepalive: bool = True, **kwargs):
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        if self.tcp_keepalive:
+            from urllib3.connection import HTTPConnection
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        super().init_poolmanager(*args, **kwargs)
 
 
 class GLM4Client:
@@ -15,6 +111,7 @@ class GLM4Client:
     
     用于调用智谱AI提供的GLM-4-Flash模型，永久免费。
     支持聊天完成，自带重试机制。
+    所有请求复用同一个线程安全的HTTP连接池（keep-alive），避免每次调用重新握手。
     """
     
     def __init__(self, config: Dict[str, Any]):
@@ -24,6 +121,24 @@ class GLM4Client:
         Args:
             config: GLM-4配置字典
         """
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._request_count = 0
+        self.config = None
+        self.cache = None
+        self.singleflight = None
+        
+        self._apply_config(config)
+        
+        logger.info(f"✅ GLM-4客户端初始化成功 - 使用永久免费的GLM-4-Flash")
+    
+    def _apply_config(self, config: Dict[str, Any]):
+        """
+        应用配置（初始化和热更新共用）
+        
+        连接池和缓存只在对应配置段变化时重建，未变化的部分原样保留。
+        """
+        previous = self.config or {}
         self.config = config
         self.provider_config = config.get('glm', {})
         
@@ -33,12 +148,46 @@ class GLM4Client:
         if not self.api_key:
             logger.warning("⚠️ 未设置GLM API Key，请访问 https://open.bigmodel.cn 获取")
         
-        self.api_base = self.provider_config.get('api_base')
+        # API地址也可通过环境变量覆盖（例如压测时指向本地模拟服务）
+        self.api_base = os.getenv('GLM_API_BASE') or self.provider_config.get('api_base')
         self.models = self.provider_config.get('models', {})
         self.temperature = self.provider_config.get('temperature', 0.7)
         self.max_tokens = self.provider_config.get('max_tokens', 4096)
+        self.timeout = config.get('general', {}).get('timeout', 30)
         
-        logger.info(f"✅ GLM-4客户端初始化成功 - 使用永久免费的GLM-4-Flash")
+        # HTTP连接池配置（变化时丢弃旧连接池，下次请求时按新配置创建）
+        self.http_config = config.get('http', {})
+        self.keep_alive = self.http_config.get('keep_alive', True)
+        if previous and previous.get('http') != config.get('http'):
+            with self._session_lock:
+                self._session = None
+        
+        # LLM响应缓存（内存LRU + 磁盘SQLite）
+        cache_config = config.get('cache', {})
+        self.cache_max_temperature = cache_config.get('max_temperature', 0.5)
+        if not previous or previous.get('cache') != config.get('cache'):
+            self.cache = create_llm_cache(cache_config)
+        
+        # 相同提示词的并发请求合并（single-flight）
+        if config.get('singleflight', {}).get('enabled', True):
+            self.singleflight = self.singleflight or SingleFlight()
+        else:
+            self.singleflight = None
+        
+        # 客户端限流（同一API地址的所有客户端共享配额）
+        self.rate_limiter = get_rate_limiter(f"glm:{self.api_base}", config.get('rate_limit', {}))
+    
+    def reload(self, config: Dict[str, Any]):
+        """
+        热更新配置
+        
+        已持有该客户端引用的智能体无需重建即可使用新配置。
+        
+        Args:
+            config: 新的GLM-4配置字典
+        """
+        self._apply_config(config)
+        logger.info("🔄 GLM-4客户端配置已热更新")
     
     def chat(
         self,
@@ -60,43 +209,278 @@ class GLM4Client:
         Returns:
             模型回复文本
         """
-        url = f"{self.api_base}/chat/completions"
+        payload = self.build_payload(messages, model, temperature, max_tokens)
         
-        payload = {
-            "model": model or self.models.get('flash', 'glm-4-flash'),
-            "messages": messages,
-            "temperature": temperature or self.temperature,
-            "max_tokens": max_tokens or self.max_tokens,
-            "top_p": self.provider_config.get('top_p', 0.9),
-            "stream": False
-        }
+        prompt_key = make_prompt_key(
+            payload['model'],
+            payload['messages'],
+            payload['temperature'],
+            payload['max_tokens']
+        )
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        with span('llm.chat', kind=SPAN_LLM, model=payload['model'], messages=len(messages)) as llm_span:
+            # 命中缓存则直接返回，不再请求上游
+            use_cache = self._is_cacheable(payload)
+            if use_cache:
+                cached = self.cache.get(prompt_key)
+                if cached is not None:
+                    logger.debug(f"GLM-4缓存命中，长度: {len(cached)}")
+                    llm_span.set_attribute('cache', 'hit')
+                    return cached
+            
+            def fetch() -> str:
+                content = self._request_completion(payload)
+                if use_cache:
+                    self.cache.set(prompt_key, content)
+                return content
+            
+            llm_span.set_attribute('cache', 'miss' if use_cache else 'disabled')
+            
+            # 相同提示词的并发请求合并为一次上游调用
+            if self.singleflight is not None:
+                return self.singleflight.do(prompt_key, fetch)
+            return fetch()
+    
+    def _request_completion(self, payload: Dict[str, Any]) -> str:
+        """请求上游聊天接口并返回回复文本（经过客户端限流）"""
+        check_deadline('llm')
+        if self.rate_limiter is None:
+            return self._do_request_completion(payload)[0]
+        
+        estimated_tokens = estimate_tokens(payload['messages'])
+        with self.rate_limiter.limit(estimated_tokens) as permit:
+            try:
+                content, usage = self._do_request_completion(payload)
+            except GLM4APIError as e:
+                permit['throttled'] = e.status_code == 429
+                raise
+            
+            permit['success'] = True
+            if usage.get('total_tokens'):
+                permit['actual_tokens'] = usage['total_tokens']
+            return content
+    
+    def _do_request_completion(self, payload: Dict[str, Any]):
+        """发送请求，返回(回复文本, token用量)"""
+        headers = self.build_headers()
         
         try:
-            logger.debug(f"调用GLM-4 API: {model or 'glm-4-flash'}")
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            logger.debug(f"调用GLM-4 API: {payload['model']}")
+            response = self._post(self.chat_url, payload, headers)
             response.raise_for_status()
             
             result = response.json()
             content = result['choices'][0]['message']['content']
             
             logger.debug(f"GLM-4响应成功，长度: {len(content)}")
-            return content
+            return content, result.get('usage') or {}
             
         except requests.exceptions.HTTPError as e:
             error_msg = f"GLM API HTTP错误: {e.response.status_code}"
             if e.response.text:
                 error_msg += f" - {e.response.text}"
             logger.error(error_msg)
-            raise Exception(error_msg)
+            raise GLM4APIError(
+                error_msg,
+                status_code=e.response.status_code,
+                retry_after=parse_retry_after(e.response.headers.get('Retry-After'))
+            )
         except Exception as e:
             logger.error(f"GLM API调用失败: {e}")
             raise
     
+    def _is_cacheable(self, payload: Dict[str, Any]) -> bool:
+        """
+        判断请求结果是否可以缓存
+        
+        只有启用缓存且温度不高于 cache.max_temperature（输出基本确定）的请求才会缓存。
+        """
+        return self.cache is not None and payload['temperature'] <= self.cache_max_temperature
+    
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取LLM响应缓存统计（未启用缓存时返回None）"""
+        return self.cache.get_stats() if self.cache is not None else None
+    
+    def get_rate_limit_stats(self) -> Optional[Dict[str, Any]]:
+        """获取客户端限流统计（未启用时返回None）"""
+        return self.rate_limiter.get_stats() if self.rate_limiter is not None else None
+    
+    def get_singleflight_stats(self) -> Optional[Dict[str, Any]]:
+        """获取请求合并统计（saved 即节省的上游调用数，未启用时返回None）"""
+        return self.singleflight.get_stats() if self.singleflight is not None else None
+    
+    def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        GLM-4流式聊天接口（SSE）
+        
+        Args:
+            messages: 消息列表 [{"role": "user", "content": "..."}]
+            model: 模型名称（默认使用glm-4-flash）
+            temperature: 温度参数（0-1，控制创造性）
+            max_tokens: 最大输出token数
+            
+        Yields:
+            模型逐步生成的文本片段（增量）
+        """
+        payload = self.build_payload(messages, model, temperature, max_tokens, stream=True)
+        headers = self.build_headers()
+        headers["Accept"] = "text/event-stream"
+        
+        # 生成器中不切换当前span，只记录区间
+        stream_span = start_span('llm.chat_stream', kind=SPAN_LLM, model=payload['model'], messages=len(messages))
+        try:
+            logger.debug(f"调用GLM-4 流式API: {model or 'glm-4-flash'}")
+            with self._post(self.chat_url, payload, headers, stream=True) as response:
+                response.raise_for_status()
+                
+                total_length = 0
+                for raw_line in response.iter_lines():
+                    # SSE响应通常不声明charset，按UTF-8自行解码，避免中文乱码
+                    line = raw_line.decode('utf-8') if raw_line else ''
+                    done, content = parse_stream_line(line)
+                    if done:
+                        break
+                    if content:
+                        total_length += len(content)
+                        yield content
+                
+                logger.debug(f"GLM-4流式响应结束，长度: {total_length}")
+                
+        except requests.exceptions.HTTPError as e:
+            error_msg = f"GLM API HTTP错误: {e.response.status_code}"
+            if e.response.text:
+                error_msg += f" - {e.response.text}"
+            logger.error(error_msg)
+            stream_span.record_error(error_msg)
+            raise GLM4APIError(
+                error_msg,
+                status_code=e.response.status_code,
+                retry_after=parse_retry_after(e.response.headers.get('Retry-After'))
+            )
+        except Exception as e:
+            stream_span.record_error(e)
+            logger.error(f"GLM API流式调用失败: {e}")
+            raise
+        finally:
+            stream_span.end()
+    
+    @property
+    def chat_url(self) -> str:
+        """聊天接口地址"""
+        return f"{self.api_base}/chat/completions"
+    
+    def build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """构建请求体（同步/异步客户端共用）"""
+        return {
+            "model": model or self.models.get('flash', 'glm-4-flash'),
+            "messages": messages,
+            "temperature": temperature or self.temperature,
+            "max_tokens": max_tokens or self.max_tokens,
+            "top_p": self.provider_config.get('top_p', 0.9),
+            "stream": stream
+        }
+    
+    def build_headers(self) -> Dict[str, str]:
+        """构建请求头（同步/异步客户端共用）"""
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+            "Connection": "keep-alive" if self.keep_alive else "close"
+        }
+    
+    @property
+    def session(self) -> requests.Session:
+        """共享的HTTP会话（首次使用时创建连接池）"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+    
+    def _create_session(self) -> requests.Session:
+        """创建带连接池的HTTP会话"""
+        adapter = KeepAliveHTTPAdapter(
+            tcp_keepalive=self.keep_alive,
+            pool_connections=self.http_config.get('pool_connections', 4),
+            pool_maxsize=self.http_config.get('pool_maxsize', 16),
+            pool_block=self.http_config.get('pool_block', False),
+            max_retries=0
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        
+        logger.debug(
+            f"GLM-4连接池已创建: pool_connections={adapter._pool_connections}, "
+            f"pool_maxsize={adapter._pool_maxsize}, keep_alive={self.keep_alive}"
+        )
+        return session
+    
+    def _post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str], **kwargs) -> requests.Response:
+        """通过连接池发送POST请求（超时不超过请求剩余时限）"""
+        timeout = bounded_timeout(self.timeout, 'llm')
+        with self._session_lock:
+            self._request_count += 1
+        return self.session.post(url, json=payload, headers=headers, timeout=timeout, **kwargs)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+        
+        Returns:
+            {
+                'requests': 已发送的请求数,
+                'pool_hits': 复用已有连接的请求数,
+                'pool_misses': 新建连接（TCP/TLS握手）的次数,
+                'hit_rate': 连接复用率,
+                'hosts': 当前连接池覆盖的主机数
+            }
+        """
+        hits = 0
+        misses = 0
+        hosts = 0
+        
+        if self._session is not None:
+            for adapter in set(self._session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    hosts += 1
+                    misses += pool.num_connections
+                    hits += max(0, pool.num_requests - pool.num_connections)
+        
+        total = hits + misses
+        return {
+            'requests': self._request_count,
+            'pool_hits': hits,
+            'pool_misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'hosts': hosts
+        }
+    
+    def close(self):
+        """关闭连接池"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+    
     def chat_with_retry(
         self,
         messages: List[Dict[str, str]],
@@ -115,43 +499,47 @@ class GLM4Client:
             模型回复
         """
         last_error = None
+        attempts = 0
         
         for attempt in range(max_retries):
+            attempts += 1
             try:
                 return self.chat(messages, **kwargs)
             except Exception as e:
                 last_error = e
+                if not is_retryable_error(e):
+                    logger.warning(f"API调用失败且不可重试: {e}")
+                    break
                 if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # 指数退避
-                    logger.warning(f"API调用失败，{wait_time}秒后重试 ({attempt + 1}/{max_retries})")
+                    wait_time = retry_delay(e, attempt)
+                    if not can_wait(wait_time):
+                        logger.warning(f"API调用失败，剩余时限不足以等待{wait_time:.1f}秒后重试")
+                        break
+                    logger.warning(f"API调用失败，{wait_time:.1f}秒后重试 ({attempt + 1}/{max_retries})")
                     time.sleep(wait_time)
         
-        raise Exception(f"API调用失败，已重试{max_retries}次: {last_error}")
+        deadline = get_deadline()
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded(f"API调用超出请求时限，已尝试{attempts}次: {last_error}")
+        raise Exception(f"API调用失败，已重试{attempts}次: {last_error}")
 
 
 def get_glm4_client(config_path: str = None) -> GLM4Client:
     """
     获取GLM-4客户端实例
     
+    同一配置文件在进程内只解析一次、只创建一个客户端，所有智能体共享同一个连接池；
+    配置文件修改后会自动热更新（见 utils.llm_registry）。
+    
     Args:
         config_path: 配置文件路径
         
     Returns:
         GLM-4客户端实例
     """
-    import yaml
-    
-    if config_path is None:
-        config_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            'config',
-            'glm4_config.yaml'
-        )
-    
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    from utils.llm_registry import get_client_registry
     
-    return GLM4Client(config)
+    return get_client_registry().get(config_path, GLM4Client)
 
 
 # 使用示例
@@ -0,0 +1,158 @@
+"""
+健康规则校验
+目标安全性、营养平衡、饮食计划合理性等纯计算规则，
+既供 CrewAI 工具调用，也供不经过LLM的快速工作流直接调用
+"""
+
+from typing import Dict, Any, List
+from loguru import logger
+
+
+# 安全的每日体重变化范围(kg)
+SAFE_DAILY_CHANGE_MIN = 0.05
+SAFE_DAILY_CHANGE_MAX = 0.15
+
+# 每日营养摄入标准范围
+NUTRITION_STANDARDS = {
+    'calories': (1200, 2500),
+    'protein': (50, 150),
+    'carbohydrate': (200, 400),
+    'fat': (30, 100)
+}
+
+# 饮食计划每日热量允许偏差
+PLAN_CALORIE_TOLERANCE = 0.1
+
+
+def check_goal_safety(current_weight: float, target_weight: float, days: int) -> Dict[str, Any]:
+    """
+    验证目标安全性
+    
+    Args:
+        current_weight: 当前体重(kg)
+        target_weight: 目标体重(kg)
+        days: 计划天数
+        
+    Returns:
+        {'is_safe', 'risk_level', 'goal_type', 'daily_change_kg', 'suggestion'}
+    """
+    try:
+        weight_change = abs(target_weight - current_weight)
+        daily_change = weight_change / days if days > 0 else 0
+        
+        is_safe = SAFE_DAILY_CHANGE_MIN <= daily_change <= SAFE_DAILY_CHANGE_MAX
+        
+        if current_weight > target_weight:
+            goal_type = "减重"
+            if daily_change > SAFE_DAILY_CHANGE_MAX:
+                risk_level = "高风险"
+                suggestion = f"减重速度过快！建议延长至 {int(weight_change / SAFE_DAILY_CHANGE_MAX)} 天"
+            elif daily_change < SAFE_DAILY_CHANGE_MIN:
+                risk_level = "过慢"
+                suggestion = f"减重速度较慢，可适当调整"
+            else:
+                risk_level = "安全"
+                suggestion = "目标设定合理"
+        else:
+            goal_type = "增重"
+            if daily_change > SAFE_DAILY_CHANGE_MAX:
+                risk_level = "高风险"
+                suggestion = f"增重速度过快！建议延长至 {int(weight_change / SAFE_DAILY_CHANGE_MAX)} 天"
+            else:
+                risk_level = "安全"
+                suggestion = "目标设定合理"
+        
+        logger.info(f"[HealthRules] 安全验证: {risk_level}")
+        return {
+            "is_safe": is_safe,
+            "risk_level": risk_level,
+            "goal_type": goal_type,
+            "daily_change_kg": round(daily_change, 3),
+            "suggestion": suggestion
+        }
+    except Exception as e:
+        logger.error(f"[HealthRules] 安全验证失败: {e}")
+        return {"error": str(e), "is_safe": False}
+
+
+def check_nutrition_balance(daily_total: Dict[str, float]) -> Dict[str, Any]:
+    """
+    验证每日营养摄入是否平衡
+    
+    Args:
+        daily_total: {'calories', 'protein', 'carbohydrate', 'fat'}
+        
+    Returns:
+        {'is_balanced', 'issues', 'warnings'}
+    """
+    try:
+        validation = {
+            "is_balanced": True,
+            "issues": [],
+            "warnings": []
+        }
+        
+        for nutrient, (min_val, max_val) in NUTRITION_STANDARDS.items():
+            value = daily_total.get(nutrient, 0)
+            if value < min_val:
+                validation["is_balanced"] = False
+                validation["issues"].append(f"{nutrient} 过低: {value} (最低{min_val})")
+            elif value > max_val:
+                validation["is_balanced"] = False
+                validation["issues"].append(f"{nutrient} 过高: {value} (最高{max_val})")
+            else:
+                validation["warnings"].append(f"{nutrient} 正常: {value}")
+        
+        logger.info(f"[HealthRules] 营养验证: {'平衡' if validation['is_balanced'] else '不平衡'}")
+        return validation
+    except Exception as e:
+        logger.error(f"[HealthRules] 营养验证失败: {e}")
+        return {"error": str(e), "is_balanced": False}
+
+
+def _plan_days(meal_plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """取出计划中的每日安排（兼容 daily_plans 和 MealPlannerAgent 的 meal_plan 字段）"""
+    return meal_plan.get('daily_plans') or meal_plan.get('meal_plan') or []
+
+
+def _day_calories(day_plan: Dict[str, Any]) -> float:
+    """取出单日总热量（兼容 total_calories 和 total_nutrition.calories）"""
+    if 'total_calories' in day_plan:
+        return day_plan.get('total_calories') or 0
+    return (day_plan.get('total_nutrition') or {}).get('calories', 0)
+
+
+def check_meal_plan(meal_plan: Dict[str, Any], target_calories: int) -> Dict[str, Any]:
+    """
+    验证饮食计划是否符合热量约束
+    
+    Args:
+        meal_plan: 饮食计划
+        target_calories: 目标卡路里
+        
+    Returns:
+        {'is_valid', 'issues', 'adjustments_needed'}
+    """
+    try:
+        validation = {
+            "is_valid": True,
+            "issues": [],
+            "adjustments_needed": []
+        }
+        
+        for i, day_plan in enumerate(_plan_days(meal_plan)):
+            day_calories = _day_calories(day_plan)
+            calorie_diff = abs(day_calories - target_calories)
+            calorie_tolerance = target_calories * PLAN_CALORIE_TOLERANCE
+            
+            if calorie_diff > calorie_tolerance:
+                validation["is_valid"] = False
+                validation["issues"].append(
+                    f"第{i+1}天热量偏差: {day_calories} vs 目标{target_calories}"
+                )
+        
+        logger.info(f"[HealthRules] 计划验证: {'通过' if validation['is_valid'] else '不通过'}")
+        return validation
+    except Exception as e:
+        logger.error(f"[HealthRules] 计划验证失败: {e}")
+        return {"error": str(e), "is_valid": False}
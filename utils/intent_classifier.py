@@ -0,0 +1,285 @@
+"""
+轻量意图分类（决定对话是否需要 RAG 知识检索）
+先用关键词做词法预判，命中明确的领域词或简短寒暄时直接给出结果；
+预判不确定时把消息编码成哈希字符n-gram向量，与各意图的质心比较余弦相似度。
+质心由示例句计算，按示例内容的指纹缓存到磁盘，纯CPU、单条消息耗时在毫秒以内
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from utils.keyword_matcher import KeywordMatcher
+
+
+# 各意图的示例句（不含明显关键词的说法也要覆盖，关键词路由正是漏掉了这些）
+DEFAULT_INTENT_EXAMPLES = {
+    'rag': [
+        '一个鸡蛋大概有多少大卡', '晚上吃水果会不会长胖', '怎样才能快速掉秤', '牛油果适合控糖的人吗',
+        '每天喝多少水比较合适', '孕妇可以喝咖啡吗', '米饭和面条哪个更容易胖', '肚子上的肉怎么才能减下去',
+        '尿酸高的人不能吃什么', '经常熬夜应该补充点什么', '早餐吃什么比较好', '喝牛奶会拉肚子怎么办',
+        '燕麦片真的能降胆固醇吗', '红薯可以代替主食吗', '一天吃几个鸡蛋合适', '体检说血脂偏高要注意什么',
+        '老人缺钙应该怎么补', '运动后吃什么恢复最快', '节食为什么会反弹', '外卖怎么点比较低卡',
+        '小孩挑食不爱吃蔬菜怎么办', '坚果每天吃多少合适', '喝酒对肝脏伤害大吗', '贫血的人适合吃哪些东西',
+        '低碳饮食有什么副作用', '晚饭不吃能瘦吗', '这个菜的升糖指数高吗', '怎么控制体重不反弹'
+    ],
+    'chitchat': [
+        '你好', '您好呀', '早上好', '晚安', '谢谢你', '多谢帮忙', '再见', '拜拜',
+        '你是谁', '你叫什么名字', '你能做什么', '你是机器人吗', '讲个笑话吧', '今天天气怎么样',
+        '哈哈哈', '好的我知道了', '嗯嗯', '没事了', '在吗', '你真厉害', '我心情不好想聊聊天',
+        '周末去哪里玩好', '给我唱首歌', '现在几点了', 'hello', 'thanks', 'bye'
+    ]
+}
+
+# 词法预判关键词：rag 为明确的营养健康领域词，chitchat 为寒暄用语
+DEFAULT_LEXICAL_KEYWORDS = {
+    'rag': [
+        '营养', '热量', '卡路里', '大卡', '蛋白质', '碳水', '脂肪', '维生素', '矿物质', '膳食纤维',
+        '减肥', '减脂', '增肌', '瘦身', '食谱', '饮食', '糖尿病', '高血压', '高血脂', '痛风',
+        'GI', '血糖', '胰岛素', '代谢', '胆固醇', '尿酸'
+    ],
+    'chitchat': [
+        '你好', '您好', '早上好', '晚上好', '晚安', '谢谢', '多谢', '再见', '拜拜', '在吗',
+        '你是谁', '哈哈', 'hello', 'thanks', 'bye'
+    ]
+}
+
+# 质心缓存格式版本（编码方式变化时递增，使旧缓存失效）
+CENTROID_CACHE_VERSION = 1
+
+
+@lru_cache(maxsize=65536)
+def _gram_bucket(gram: str, dim: int) -> int:
+    """n-gram 对应的向量下标（crc32 在进程间稳定，质心缓存才能复用）"""
+    return zlib.crc32(gram.encode('utf-8')) % dim
+
+
+class IntentClassifier:
+    """词法预判 + 哈希n-gram质心的意图分类器"""
+    
+    def __init__(
+        self,
+        examples: Optional[Dict[str, List[str]]] = None,
+        lexical_keywords: Optional[Dict[str, Iterable[str]]] = None,
+        retrieval_intents: Iterable[str] = ('rag',),
+        dim: int = 4096,
+        ngram_range: Tuple[int, int] = (1, 3),
+        min_score: float = 0.0,
+        chitchat_max_length: int = 8,
+        cache_path: Optional[str] = 'cache/intent_centroids.npz',
+        latency_budget_ms: float = 5.0
+    ):
+        """
+        初始化意图分类器
+        
+        Args:
+            examples: {意图: 示例句列表}，默认 DEFAULT_INTENT_EXAMPLES
+            lexical_keywords: 词法预判关键词 {'rag': [...], 'chitchat': [...]}，默认 DEFAULT_LEXICAL_KEYWORDS
+            retrieval_intents: 需要知识检索的意图
+            dim: 哈希向量维度
+            ngram_range: 字符n-gram的长度范围
+            min_score: 最高相似度不超过该值时视为无法判断（不检索）；质心已去掉整体均值，
+                0 表示消息至少要比示例的平均水平更接近某个意图
+            chitchat_max_length: 只有不超过该长度的消息才能按寒暄词直接判定为闲聊
+            cache_path: 质心缓存文件（相对路径相对项目根目录，None表示不缓存）
+            latency_budget_ms: 单条消息的耗时预算，超出时计入统计并告警
+        """
+        self.examples = examples or DEFAULT_INTENT_EXAMPLES
+        self.retrieval_intents = set(retrieval_intents)
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.min_score = min_score
+        self.chitchat_max_length = chitchat_max_length
+        self.latency_budget_ms = latency_budget_ms
+        
+        if cache_path and not os.path.isabs(cache_path):
+            cache_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), cache_path)
+        self.cache_path = cache_path
+        
+        self.lexical = KeywordMatcher(lexical_keywords or DEFAULT_LEXICAL_KEYWORDS).compile()
+        
+        self._lock = threading.Lock()
+        self._model = None
+        self.stats = {
+            'classified': 0,
+            'lexical': 0,
+            'embedding': 0,
+            'retrieval': 0,
+            'over_budget': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0
+        }
+    
+    def embed(self, text: str) -> np.ndarray:
+        """
+        把文本编码成L2归一化的哈希字符n-gram向量
+        
+        Args:
+            text: 文本
+            
+        Returns:
+            dim 维 float32 向量（空文本为全零）
+        """
+        text = ' '.join(text.lower().split())
+        low, high = self.ngram_range
+        buckets = [
+            _gram_bucket(text[start:start + size], self.dim)
+            for size in range(low, high + 1)
+            for start in range(len(text) - size + 1)
+        ]
+        vector = np.bincount(buckets, minlength=self.dim).astype(np.float32) if buckets else np.zeros(self.dim, np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def _fingerprint(self) -> str:
+        """示例句和编码参数的指纹（任何一项变化都需要重新计算质心）"""
+        raw = json.dumps(
+            {
+                'version': CENTROID_CACHE_VERSION,
+                'dim': self.dim,
+                'ngram_range': list(self.ngram_range),
+                'examples': {intent: list(texts) for intent, texts in self.examples.items()}
+            },
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def _compute_centroids(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        计算各意图的质心
+        
+        所有示例向量先减去整体均值，去掉各意图共有的字（如"的""吗"）的影响，再按意图取平均。
+        
+        Returns:
+            (意图列表, 整体均值向量, 归一化后的质心矩阵 [意图数, dim])
+        """
+        intents = [intent for intent, texts in self.examples.items() if texts]
+        vectors = {intent: np.stack([self.embed(text) for text in self.examples[intent]]) for intent in intents}
+        mean = np.concatenate(list(vectors.values())).mean(axis=0)
+        
+        centroids = np.stack([(vectors[intent] - mean).mean(axis=0) for intent in intents])
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return intents, mean.astype(np.float32), (centroids / norms).astype(np.float32)
+    
+    def _load_cache(self, fingerprint: str) -> Optional[Tuple[List[str], np.ndarray, np.ndarray]]:
+        """读取指纹一致的质心缓存（不存在、损坏或已过期时返回None）"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as cached:
+                if str(cached['fingerprint']) != fingerprint:
+                    return None
+                return [str(intent) for intent in cached['intents']], cached['mean'], cached['centroids']
+        except Exception as e:
+            logger.warning(f"意图质心缓存读取失败，重新计算: {e}")
+            return None
+    
+    def _save_cache(self, fingerprint: str, intents: List[str], mean: np.ndarray, centroids: np.ndarray):
+        """写入质心缓存（先写临时文件再替换，避免并发读到半个文件）"""
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp.npz"
+            np.savez(temp_path, fingerprint=fingerprint, intents=np.array(intents), mean=mean, centroids=centroids)
+            os.replace(temp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"意图质心缓存写入失败: {e}")
+    
+    def load(self) -> 'IntentClassifier':
+        """加载质心（优先读磁盘缓存，否则计算后写入缓存）"""
+        self._centroids()
+        return self
+    
+    def _centroids(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """质心模型（首次使用时加载）"""
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    fingerprint = self._fingerprint()
+                    model = self._load_cache(fingerprint)
+                    if model is None:
+                        model = self._compute_centroids()
+                        self._save_cache(fingerprint, *model)
+                        logger.info(f"意图质心已计算: {', '.join(model[0])}")
+                    self._model = model
+                model = self._model
+        return model
+    
+    def _lexical_intent(self, message: str) -> Optional[str]:
+        """词法预判：只命中领域词判为检索，只命中寒暄词的简短消息判为闲聊，其余不确定"""
+        matched = self.lexical.match(message)
+        if 'rag' in matched and 'chitchat' not in matched:
+            return 'rag'
+        if 'chitchat' in matched and 'rag' not in matched and len(message.strip()) <= self.chitchat_max_length:
+            return 'chitchat'
+        return None
+    
+    def classify(self, message: str) -> Dict[str, Any]:
+        """
+        判断消息的意图
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            {'intent': 意图（无法判断时为None）, 'use_rag': 是否需要检索,
+             'score': 相似度（词法预判时为None）, 'method': 'lexical' | 'embedding', 'elapsed_ms': 耗时}
+        """
+        start = time.perf_counter()
+        
+        intent = self._lexical_intent(message)
+        score = None
+        method = 'lexical'
+        if intent is None:
+            method = 'embedding'
+            intents, mean, centroids = self._centroids()
+            query = self.embed(message) - mean
+            norm = np.linalg.norm(query)
+            if norm:
+                scores = centroids @ (query / norm)
+                best = int(scores.argmax())
+                score = float(scores[best])
+                if score > self.min_score:
+                    intent = intents[best]
+        
+        use_rag = intent in self.retrieval_intents
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        with self._lock:
+            self.stats['classified'] += 1
+            self.stats[method] += 1
+            self.stats['retrieval'] += use_rag
+            self.stats['total_ms'] += elapsed_ms
+            self.stats['max_ms'] = max(self.stats['max_ms'], elapsed_ms)
+            over_budget = elapsed_ms > self.latency_budget_ms
+            if over_budget:
+                self.stats['over_budget'] += 1
+        if over_budget:
+            logger.warning(f"意图分类耗时 {elapsed_ms:.2f}ms 超出预算 {self.latency_budget_ms}ms")
+        
+        return {
+            'intent': intent,
+            'use_rag': use_rag,
+            'score': score,
+            'method': method,
+            'elapsed_ms': elapsed_ms
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['avg_ms'] = stats['total_ms'] / stats['classified'] if stats['classified'] else 0.0
+        return stats
@@ -0,0 +1,352 @@
+"""
+异步任务队列
+长耗时的多智能体工作流以任务（job）的形式提交到本地线程池执行，
+任务状态和每一步的进度持久化到SQLite，客户端通过轮询获取结果
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+DEFAULT_JOB_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'data',
+    'crewai_jobs.sqlite3'
+)
+
+
+class JobCancelled(Exception):
+    """任务已被取消（在步骤之间检查并抛出）"""
+    pass
+
+
+class JobStore:
+    """基于SQLite的任务存储"""
+    
+    def __init__(self, path: str = DEFAULT_JOB_DB_PATH):
+        """
+        初始化任务存储
+        
+        Args:
+            path: SQLite数据库文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '[]',
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+    
+    def create(self, request: Dict[str, Any]) -> str:
+        """创建任务，返回任务ID"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(request, ensure_ascii=False), time.time())
+            )
+        return job_id
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务，不存在返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, request, progress, result, error, cancel_requested, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        
+        return {
+            'job_id': row[0],
+            'status': row[1],
+            'request': json.loads(row[2]),
+            'progress': json.loads(row[3]),
+            'result': json.loads(row[4]) if row[4] else None,
+            'error': row[5],
+            'cancel_requested': bool(row[6]),
+            'created_at': row[7],
+            'started_at': row[8],
+            'finished_at': row[9]
+        }
+    
+    def mark_running(self, job_id: str) -> bool:
+        """将排队中的任务标记为运行中（已被取消时返回False）"""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ? AND cancel_requested = 0",
+                (JOB_RUNNING, time.time(), job_id, JOB_QUEUED)
+            ).rowcount > 0
+    
+    def finish(self, job_id: str, status: str, result: Any = None, error: str = None):
+        """记录任务结束状态"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id
+                )
+            )
+    
+    def append_progress(self, job_id: str, step: Dict[str, Any]):
+        """追加一条步骤进度"""
+        with self._lock:
+            row = self._conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row[0])
+            progress.append(step)
+            self._conn.execute(
+                "UPDATE jobs SET progress = ? WHERE id = ?",
+                (json.dumps(progress, ensure_ascii=False), job_id)
+            )
+    
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """
+        请求取消任务
+        
+        排队中的任务直接标记为已取消；运行中的任务设置取消标记，
+        由工作线程在下一个步骤边界停止。
+        
+        Returns:
+            取消后的任务状态，任务不存在返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            
+            status = row[0]
+            if status == JOB_QUEUED:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (JOB_CANCELLED, time.time(), job_id)
+                )
+                return JOB_CANCELLED
+            if status == JOB_RUNNING:
+                self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return status
+    
+    def is_cancel_requested(self, job_id: str) -> bool:
+        """任务是否已被请求取消"""
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+    
+    def recover_unfinished(self) -> List[str]:
+        """
+        处理上次进程退出时未完成的任务
+        
+        运行中的任务无法恢复执行状态，标记为失败；排队中的任务返回给调用方重新入队。
+        
+        Returns:
+            需要重新入队的任务ID列表
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ?",
+                (JOB_FAILED, '服务重启，任务中断', time.time(), JOB_RUNNING)
+            )
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def purge(self, older_than: float) -> int:
+        """删除早于指定时间结束的任务，返回删除数量"""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (older_than,)
+            ).rowcount
+    
+    def count_by_status(self) -> Dict[str, int]:
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class JobContext:
+    """传给任务处理函数的上下文：上报进度、检查取消"""
+    
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._started_at = time.monotonic()
+    
+    def check_cancelled(self):
+        """任务已被取消时抛出 JobCancelled"""
+        if self.store.is_cancel_requested(self.job_id):
+            raise JobCancelled(self.job_id)
+    
+    def report(self, step: str, **info):
+        """
+        上报一个步骤完成，并在步骤边界检查取消
+        
+        Args:
+            step: 步骤名称
+            **info: 附加信息（需可JSON序列化）
+        """
+        entry = {'step': step, 'elapsed': round(time.monotonic() - self._started_at, 3)}
+        entry.update(info)
+        self.store.append_progress(self.job_id, entry)
+        logger.info(f"[Job {self.job_id[:8]}] 步骤完成: {step}")
+        self.check_cancelled()
+
+
+class JobManager:
+    """任务管理器：持久化任务 + 本地线程池执行"""
+    
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any], JobContext], Any],
+        store: Optional[JobStore] = None,
+        max_workers: int = 4,
+        retention: float = 86400
+    ):
+        """
+        初始化任务管理器
+        
+        Args:
+            handler: 任务处理函数 (请求数据, JobContext) -> 可JSON序列化的结果
+            store: 任务存储（默认使用 data/crewai_jobs.sqlite3）
+            max_workers: 工作线程数
+            retention: 已结束任务的保留时间(秒)
+        """
+        self.handler = handler
+        self.store = store or JobStore()
+        self.max_workers = max_workers
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crewai-job')
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        
+        self.store.purge(time.time() - retention)
+        for job_id in self.store.recover_unfinished():
+            self._enqueue(job_id)
+    
+    def submit(self, request: Dict[str, Any]) -> str:
+        """
+        提交任务
+        
+        Args:
+            request: 请求数据
+            
+        Returns:
+            任务ID
+        """
+        job_id = self.store.create(request)
+        self._enqueue(job_id)
+        logger.info(f"📥 任务已提交: {job_id}")
+        return job_id
+    
+    def _enqueue(self, job_id: str):
+        """放入线程池"""
+        future = self._executor.submit(self._run, job_id)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+    
+    def _forget(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+    
+    def _run(self, job_id: str):
+        """工作线程：执行单个任务"""
+        if not self.store.mark_running(job_id):
+            # 排队期间已被取消
+            return
+        
+        job = self.store.get(job_id)
+        context = JobContext(self.store, job_id)
+        try:
+            result = self.handler(job['request'], context)
+            self.store.finish(job_id, JOB_SUCCEEDED, result=result)
+            logger.info(f"✅ 任务完成: {job_id}")
+        except JobCancelled:
+            self.store.finish(job_id, JOB_CANCELLED)
+            logger.info(f"⏹️ 任务已取消: {job_id}")
+        except Exception as e:
+            # 取消标记可能在最后一步被工作流内部吞掉后以其他异常形式抛出
+            status = JOB_CANCELLED if self.store.is_cancel_requested(job_id) else JOB_FAILED
+            self.store.finish(job_id, status, error=str(e))
+            logger.error(f"❌ 任务失败: {job_id} - {e}")
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务"""
+        return self.store.get(job_id)
+    
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        取消任务
+        
+        Returns:
+            取消后的任务状态，任务不存在返回None
+        """
+        status = self.store.request_cancel(job_id)
+        if status == JOB_CANCELLED:
+            with self._lock:
+                future = self._futures.get(job_id)
+            if future is not None:
+                future.cancel()
+        return status
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            pending = len(self._futures)
+        return {
+            'max_workers': self.max_workers,
+            'pending_in_pool': pending,
+            'jobs': self.store.count_by_status()
+        }
+    
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,189 @@
+"""
+多模式关键词匹配
+Aho-Corasick 自动机：所有关键词编译成一棵带失败指针的字典树，对消息只扫描一遍
+就能找出全部命中的关键词及其所属意图，耗时与消息长度成正比，不随关键词数量增长
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class KeywordMatcher:
+    """按意图分组的多关键词匹配器
+    
+    关键词可以随时追加，下一次匹配前自动重新编译；
+    同一个关键词可以属于多个意图。
+    """
+    
+    def __init__(self, keywords: Optional[Dict[str, Iterable[str]]] = None, ignore_case: bool = False):
+        """
+        初始化匹配器
+        
+        Args:
+            keywords: {意图: 关键词列表}
+            ignore_case: 是否忽略大小写（默认区分，与 str 的 in 判断一致）
+        """
+        self.ignore_case = ignore_case
+        self._keywords: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._compiled = None
+        
+        for intent, words in (keywords or {}).items():
+            self.add(intent, words)
+    
+    def add(self, intent: str, keywords: Iterable[str]):
+        """
+        为意图追加关键词
+        
+        Args:
+            intent: 意图名称
+            keywords: 关键词列表（空字符串会被忽略）
+        """
+        with self._lock:
+            words = self._keywords.setdefault(intent, set())
+            for keyword in keywords:
+                if keyword:
+                    words.add(keyword.lower() if self.ignore_case else keyword)
+            self._compiled = None
+    
+    @property
+    def intents(self) -> List[str]:
+        """全部意图"""
+        return list(self._keywords)
+    
+    def keyword_count(self) -> int:
+        """关键词总数（按意图分别计数）"""
+        return sum(len(words) for words in self._keywords.values())
+    
+    def compile(self) -> 'KeywordMatcher':
+        """立即编译自动机（否则在关键词变化后的首次匹配时编译）"""
+        self._automaton()
+        return self
+    
+    def _automaton(self):
+        """编译好的自动机（关键词变化后首次使用时重新编译）"""
+        compiled = self._compiled
+        if compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = self._build()
+                compiled = self._compiled
+        return compiled
+    
+    def _build(self):
+        """
+        构建自动机
+        
+        Returns:
+            (转移表, 失败指针, 输出表)；输出表中每个状态对应
+            ((关键词, 关键词长度, 所属意图), ...)，已合并失败链上的输出
+        """
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[str, int, Tuple[str, ...]]]] = [[]]
+        
+        owners: Dict[str, List[str]] = {}
+        for intent, words in self._keywords.items():
+            for keyword in words:
+                owners.setdefault(keyword, []).append(intent)
+        
+        for keyword, intents in owners.items():
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append((keyword, len(keyword), tuple(intents)))
+        
+        # 按层次遍历计算失败指针，并把失败状态的输出并入当前状态
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(char, 0)
+                outputs[child].extend(outputs[fail[child]])
+        
+        return goto, fail, [tuple(output) for output in outputs]
+    
+    def _scan(self, text: str):
+        """扫描文本，逐个产出 (结束位置, 状态输出)"""
+        goto, fail, outputs = self._automaton()
+        root = goto[0]
+        if self.ignore_case:
+            text = text.lower()
+        
+        state = 0
+        for position, char in enumerate(text):
+            if state == 0:
+                # 绝大多数字符不是任何关键词的开头，直接跳过
+                state = root.get(char, 0)
+            else:
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+            if outputs[state]:
+                yield position, outputs[state]
+    
+    def find(self, text: str) -> List[Tuple[int, str]]:
+        """
+        找出全部命中（包括重叠的命中）
+        
+        Args:
+            text: 待匹配文本
+            
+        Returns:
+            [(起始位置, 关键词), ...]，按结束位置排序
+        """
+        return [
+            (end - length + 1, keyword)
+            for end, output in self._scan(text)
+            for keyword, length, _ in output
+        ]
+    
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """
+        一次扫描得到全部命中的意图和关键词
+        
+        Args:
+            text: 待匹配文本
+            
+        Returns:
+            {意图: [命中的关键词（去重，按出现顺序）]}，意图按首次命中的顺序排列
+        """
+        matched: Dict[str, List[str]] = {}
+        for _, output in self._scan(text):
+            for keyword, _, intents in output:
+                for intent in intents:
+                    words = matched.setdefault(intent, [])
+                    if keyword not in words:
+                        words.append(keyword)
+        return matched
+    
+    def matches_any(self, text: str, intents: Optional[Iterable[str]] = None) -> bool:
+        """
+        是否命中任意关键词（命中即停止扫描）
+        
+        Args:
+            text: 待匹配文本
+            intents: 只关心的意图（None表示全部）
+            
+        Returns:
+            是否命中
+        """
+        wanted = set(intents) if intents is not None else None
+        for _, output in self._scan(text):
+            if wanted is None:
+                return True
+            for _, _, owner_intents in output:
+                if wanted.intersection(owner_intents):
+                    return True
+        return False
@@ -0,0 +1,394 @@
+"""
+LLM响应缓存
+两级缓存：进程内LRU + 磁盘SQLite，支持TTL过期、容量淘汰和命中率统计
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+
+def make_prompt_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """
+    根据(model, messages, temperature, max_tokens)生成缓存键
+    
+    消息内容会做空白归一化（合并连续空白、去掉首尾空白），
+    避免提示词模板中缩进、换行差异导致缓存失效。
+    
+    Args:
+        model: 模型名称
+        messages: 消息列表
+        temperature: 温度参数
+        max_tokens: 最大输出token数
+        
+    Returns:
+        sha256十六进制摘要
+    """
+    normalized = [
+        {
+            'role': message.get('role', ''),
+            'content': ' '.join(str(message.get('content', '')).split())
+        }
+        for message in messages
+    ]
+    raw = json.dumps(
+        {
+            'model': model,
+            'messages': normalized,
+            'temperature': round(float(temperature), 4),
+            'max_tokens': int(max_tokens)
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """线程安全的进程内LRU缓存（带TTL）"""
+    
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        """
+        初始化LRU缓存
+        
+        Args:
+            max_entries: 最大条目数，超过后淘汰最久未使用的条目
+            ttl: 过期时间(秒)，None表示永不过期
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+    
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats['misses'] += 1
+                return None
+            
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """写入缓存"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats['evictions'] += 1
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存条目"""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._data)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class SQLiteCache:
+    """基于SQLite的磁盘缓存（带TTL和容量淘汰）"""
+    
+    # 每写入多少次检查一次容量
+    PRUNE_INTERVAL = 100
+    
+    def __init__(self, path: str, max_entries: int = 100000, ttl: Optional[float] = None):
+        """
+        初始化磁盘缓存
+        
+        Args:
+            path: SQLite数据库文件路径
+            max_entries: 最大条目数，超过后按最近访问时间淘汰
+            ttl: 过期时间(秒)，None表示永不过期
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+    
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self.stats['hits'] += 1
+        
+        return json.loads(value)
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """写入缓存"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, now)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._prune(now)
+    
+    def _prune(self, now: float):
+        """清理过期条目并按容量淘汰（调用方需持有锁）"""
+        expired = self._conn.execute(
+            "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        self.stats['expirations'] += max(expired, 0)
+        
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.stats['evictions'] += overflow
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存条目"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount > 0
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['size'] = len(self)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+    
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """两级LLM响应缓存
+    
+    读取顺序：内存LRU -> 磁盘SQLite（命中后回填内存）
+    写入时同时写两级。
+    
+    统计中 misses 只计两级都未命中的查询；内存未命中、由磁盘命中的查询计入
+    memory_misses 和 disk_hits，不计入 misses。
+    """
+    
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        """
+        初始化两级缓存
+        
+        Args:
+            memory: 进程内LRU缓存
+            disk: 磁盘缓存（可选）
+        """
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.stats = {
+            'lookups': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0
+        }
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存"""
+        value = self.memory.get(key)
+        tier = 'memory_hits'
+        
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"LLM磁盘缓存读取失败: {e}")
+                value = None
+            if value is not None:
+                tier = 'disk_hits'
+                self.memory.set(key, value)
+        
+        with self._lock:
+            self.stats['lookups'] += 1
+            self.stats[tier if value is not None else 'misses'] += 1
+        
+        return value
+    
+    def set(self, key: str, value: str):
+        """写入缓存"""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except Exception as e:
+                logger.warning(f"LLM磁盘缓存写入失败: {e}")
+    
+    def delete(self, key: str):
+        """删除缓存条目"""
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+    
+    def clear(self):
+        """清空两级缓存"""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取命中率等统计信息
+        
+        Returns:
+            hits/misses/hit_rate 为两级合计；memory_*、disk_* 为各级的命中和未命中次数；
+            memory、disk 为各级的容量、淘汰和过期统计
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['memory_misses'] = stats['lookups'] - stats['memory_hits']
+        stats['disk_misses'] = stats['misses'] if self.disk is not None else 0
+        stats['memory'] = self._tier_stats(self.memory)
+        stats['disk'] = self._tier_stats(self.disk) if self.disk is not None else None
+        return stats
+    
+    @staticmethod
+    def _tier_stats(tier) -> Dict[str, Any]:
+        """单级缓存的容量、淘汰和过期统计（命中次数以两级缓存的统计为准）"""
+        stats = tier.get_stats()
+        return {name: stats[name] for name in ('size', 'evictions', 'expirations')}
+
+
+def create_llm_cache(cache_config: Dict[str, Any]) -> Optional[LLMResponseCache]:
+    """
+    根据配置创建LLM响应缓存
+    
+    Args:
+        cache_config: glm4_config.yaml 中的 cache 配置段
+        
+    Returns:
+        LLMResponseCache实例，未启用时返回None
+    """
+    if not cache_config.get('enabled', False):
+        return None
+    
+    ttl = cache_config.get('ttl', 86400)
+    memory = LRUCache(
+        max_entries=cache_config.get('memory_max_entries', 1024),
+        ttl=ttl
+    )
+    
+    disk = None
+    if cache_config.get('disk_enabled', True):
+        disk_path = cache_config.get('disk_path', 'cache/llm_cache.sqlite3')
+        if not os.path.isabs(disk_path):
+            disk_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), disk_path)
+        try:
+            disk = SQLiteCache(
+                disk_path,
+                max_entries=cache_config.get('disk_max_entries', 100000),
+                ttl=ttl
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ LLM磁盘缓存初始化失败，仅使用内存缓存: {e}")
+    
+    logger.info(f"✅ LLM响应缓存已启用 (内存: {memory.max_entries}条, 磁盘: {'启用' if disk is not None else '禁用'})")
+    return LLMResponseCache(memory, disk)
@@ -0,0 +1,151 @@
+"""
+LLM客户端注册表
+进程内按配置文件共享LLM客户端：配置只解析一次，所有智能体共用一个连接池，
+配置文件修改后自动热更新
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type
+from loguru import logger
+
+
+DEFAULT_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'config',
+    'glm4_config.yaml'
+)
+
+
+class _Entry:
+    """注册表中的一个客户端"""
+    
+    def __init__(self, client: Any, mtime: float):
+        self.client = client
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+
+
+class LLMClientRegistry:
+    """LLM客户端注册表
+    
+    以 (配置文件绝对路径, 客户端类型) 为键缓存客户端实例。
+    每次获取时（最多每 reload_interval 秒一次）检查配置文件修改时间，
+    变化则重新解析并调用 client.reload(config) 原地更新，
+    已持有客户端引用的智能体无需重建。
+    """
+    
+    def __init__(self, reload_interval: float = 2.0):
+        """
+        初始化注册表
+        
+        Args:
+            reload_interval: 检查配置文件变化的最小间隔(秒)，0表示每次都检查，None表示关闭热更新
+        """
+        self.reload_interval = reload_interval
+        self._entries: Dict[Tuple[str, type], _Entry] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'config_loads': 0,
+            'clients_created': 0,
+            'reloads': 0
+        }
+    
+    @staticmethod
+    def _load_config(config_path: str) -> Dict[str, Any]:
+        """解析YAML配置文件"""
+        import yaml
+        
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    
+    def get(self, config_path: Optional[str], client_class: Type) -> Any:
+        """
+        获取共享的客户端实例
+        
+        Args:
+            config_path: 配置文件路径（None使用默认配置）
+            client_class: 客户端类型（如 GLM4Client、AsyncGLM4Client）
+            
+        Returns:
+            客户端实例
+        """
+        path = os.path.abspath(config_path or DEFAULT_CONFIG_PATH)
+        key = (path, client_class)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is None:
+                mtime = os.path.getmtime(path)
+                config = self._load_config(path)
+                self.stats['config_loads'] += 1
+                
+                client = client_class(config)
+                self.stats['clients_created'] += 1
+                self._entries[key] = _Entry(client, mtime)
+                return client
+            
+            if self._should_check(entry):
+                self._reload_if_changed(path, entry)
+            
+            return entry.client
+    
+    def _should_check(self, entry: _Entry) -> bool:
+        """是否到了检查配置文件变化的时间"""
+        if self.reload_interval is None:
+            return False
+        return time.monotonic() - entry.checked_at >= self.reload_interval
+    
+    def _reload_if_changed(self, path: str, entry: _Entry):
+        """配置文件有变化时热更新客户端（调用方需持有锁）"""
+        entry.checked_at = time.monotonic()
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime == entry.mtime:
+                return
+            
+            config = self._load_config(path)
+            self.stats['config_loads'] += 1
+            entry.client.reload(config)
+            entry.mtime = mtime
+            self.stats['reloads'] += 1
+            logger.info(f"🔄 检测到配置文件变化，已热更新LLM客户端: {path}")
+        except Exception as e:
+            # 配置文件写到一半或格式错误时保留旧配置，下次检查再试
+            logger.error(f"LLM配置热更新失败，继续使用旧配置: {e}")
+    
+    def reload(self, config_path: Optional[str] = None):
+        """立即重新加载配置（忽略检查间隔）"""
+        path = os.path.abspath(config_path or DEFAULT_CONFIG_PATH)
+        with self._lock:
+            for (entry_path, _), entry in self._entries.items():
+                if entry_path == path:
+                    entry.mtime = None
+                    self._reload_if_changed(path, entry)
+    
+    def clients(self) -> List[Any]:
+        """已创建的客户端实例（不会触发创建）"""
+        with self._lock:
+            return [entry.client for entry in self._entries.values()]
+    
+    def clear(self):
+        """清空注册表（之后获取会创建新的客户端）"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['clients'] = len(self._entries)
+        return stats
+
+
+_registry = LLMClientRegistry()
+
+
+def get_client_registry() -> LLMClientRegistry:
+    """获取进程级LLM客户端注册表"""
+    return _registry
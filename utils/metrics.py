@@ -0,0 +1,285 @@
+"""
+智能体运行指标
+按智能体统计请求数、成功/失败数、在途请求数和延迟分布（HDR风格的对数-线性直方图），
+支持 p50/p90/p99/max 等分位数，并可以导出为 Prometheus 文本格式
+
+并发 execute 时每个线程只写自己的分片，记录路径上没有锁；读取时合并所有分片
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# 直方图精度：每个2的幂区间再均分为16个子桶，相对误差不超过 1/16
+SUB_BUCKET_BITS = 4
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+# 可记录的最大延迟约 2^32 微秒（约71分钟），更大的值计入最后一个桶
+MAX_VALUE_BITS = 32
+BUCKET_COUNT = SUB_BUCKET_COUNT * (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1)
+
+# 默认输出的分位数
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _bucket_index(micros: int) -> int:
+    """微秒值对应的桶序号"""
+    if micros < SUB_BUCKET_COUNT:
+        return max(micros, 0)
+    shift = micros.bit_length() - 1 - SUB_BUCKET_BITS
+    index = SUB_BUCKET_COUNT * (shift + 1) + (micros >> shift) - SUB_BUCKET_COUNT
+    return min(index, BUCKET_COUNT - 1)
+
+
+def _bucket_upper(index: int) -> int:
+    """桶内的最大微秒值（分位数按桶上界报告，与HDR Histogram一致）"""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    sub_bucket = SUB_BUCKET_COUNT + index % SUB_BUCKET_COUNT
+    return ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """延迟直方图（单线程写入，合并后读取）"""
+    
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds: float):
+        """记录一次耗时(秒)"""
+        self.counts[_bucket_index(int(seconds * 1_000_000))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def merge(self, other: 'LatencyHistogram'):
+        """合并另一个直方图"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+    
+    def quantile(self, q: float) -> float:
+        """
+        计算分位数
+        
+        Args:
+            q: 0~1之间的分位
+            
+        Returns:
+            耗时(秒)，没有数据时返回0
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # 桶上界可能略大于实际最大值
+                return min(_bucket_upper(index) / 1_000_000, self.max)
+        return self.max
+    
+    def summary(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, float]:
+        """分位数、平均值和最大值"""
+        summary = {f'p{int(q * 100)}': round(self.quantile(q), 6) for q in quantiles}
+        summary['max'] = round(self.max, 6)
+        summary['mean'] = round(self.total / self.count, 6) if self.count else 0.0
+        return summary
+
+
+class _Shard:
+    """单个线程的计数分片"""
+    
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.thread = threading.current_thread()
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.latency = LatencyHistogram()
+    
+    def merge(self, other: '_Shard'):
+        """合并另一个分片"""
+        self.requests += other.requests
+        self.successes += other.successes
+        self.failures += other.failures
+        self.in_flight += other.in_flight
+        self.latency.merge(other.latency)
+
+
+class AgentMetrics:
+    """单个智能体的运行指标
+    
+    每个线程第一次记录时注册一个分片，之后只修改自己的分片；
+    注册时把已结束线程的分片合并进归档分片，线程频繁创建销毁时分片数不会增长。
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._shards: List[_Shard] = []
+        self._retired = _Shard(0)
+        self._last_failed = False
+    
+    def _shard(self) -> _Shard:
+        """当前线程的分片"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is not None and shard.generation == self._generation:
+            return shard
+        
+        with self._lock:
+            shard = _Shard(self._generation)
+            alive = []
+            for existing in self._shards:
+                if existing.thread.is_alive():
+                    alive.append(existing)
+                else:
+                    self._retired.merge(existing)
+            alive.append(shard)
+            self._shards = alive
+        
+        self._local.shard = shard
+        return shard
+    
+    def begin(self) -> _Shard:
+        """
+        记录请求开始
+        
+        Returns:
+            当前线程的分片，请求结束时传给 end
+        """
+        shard = self._shard()
+        shard.requests += 1
+        shard.in_flight += 1
+        return shard
+    
+    def end(self, shard: _Shard, elapsed: float, success: bool):
+        """
+        记录请求结束
+        
+        Args:
+            shard: begin 返回的分片
+            elapsed: 耗时(秒)
+            success: 是否成功
+        """
+        shard.in_flight -= 1
+        if success:
+            shard.successes += 1
+        else:
+            shard.failures += 1
+        shard.latency.record(elapsed)
+        self._last_failed = not success
+    
+    @property
+    def last_failed(self) -> bool:
+        """最近一次请求是否失败"""
+        return self._last_failed
+    
+    def snapshot(self) -> Tuple[_Shard, LatencyHistogram]:
+        """合并所有分片，返回 (合计分片, 合并后的直方图)"""
+        with self._lock:
+            shards = list(self._shards)
+            total = _Shard(self._generation)
+            total.merge(self._retired)
+        
+        for shard in shards:
+            total.merge(shard)
+        total.in_flight = max(total.in_flight, 0)
+        return total, total.latency
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        
+        Returns:
+            计数、总耗时、平均耗时和延迟分位数（秒）
+        """
+        total, latency = self.snapshot()
+        return {
+            'total_requests': total.requests,
+            'successful_requests': total.successes,
+            'failed_requests': total.failures,
+            'in_flight': total.in_flight,
+            'total_time': round(latency.total, 6),
+            'average_time': round(latency.total / latency.count, 6) if latency.count else 0.0,
+            'latency': latency.summary()
+        }
+    
+    def reset(self):
+        """重置统计（正在执行的请求不再计入）"""
+        with self._lock:
+            self._generation += 1
+            self._shards = []
+            self._retired = _Shard(self._generation)
+            self._last_failed = False
+
+
+def _escape_label(value: str) -> str:
+    """转义Prometheus标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(
+    metrics: Iterable[AgentMetrics],
+    gauges: Optional[Dict[str, float]] = None,
+    counters: Optional[Dict[str, float]] = None,
+    prefix: str = 'crewai'
+) -> str:
+    """
+    导出为 Prometheus 文本格式（0.0.4）
+    
+    延迟以 summary 类型导出分位数，另外单独导出最大值
+    
+    Args:
+        metrics: 各智能体的指标
+        gauges: 额外的服务级瞬时值 {名称: 值}
+        counters: 额外的服务级累计值 {名称: 值}，名称应以 _total 结尾
+        prefix: 指标名前缀
+        
+    Returns:
+        文本格式的指标
+    """
+    snapshots = [(m.name, *m.snapshot()) for m in metrics]
+    lines = []
+    
+    def family(name: str, metric_type: str, help_text: str):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+    
+    family('agent_requests_total', 'counter', 'Agent requests by outcome')
+    for name, total, _ in snapshots:
+        agent = _escape_label(name)
+        lines.append(f'{prefix}_agent_requests_total{{agent="{agent}",outcome="success"}} {total.successes}')
+        lines.append(f'{prefix}_agent_requests_total{{agent="{agent}",outcome="failure"}} {total.failures}')
+    
+    family('agent_in_flight', 'gauge', 'Agent requests currently executing')
+    for name, total, _ in snapshots:
+        lines.append(f'{prefix}_agent_in_flight{{agent="{_escape_label(name)}"}} {total.in_flight}')
+    
+    family('agent_latency_seconds', 'summary', 'Agent execute latency')
+    for name, _, latency in snapshots:
+        agent = _escape_label(name)
+        for q in DEFAULT_QUANTILES:
+            lines.append(f'{prefix}_agent_latency_seconds{{agent="{agent}",quantile="{q}"}} {latency.quantile(q):.6f}')
+        lines.append(f'{prefix}_agent_latency_seconds_sum{{agent="{agent}"}} {latency.total:.6f}')
+        lines.append(f'{prefix}_agent_latency_seconds_count{{agent="{agent}"}} {latency.count}')
+    
+    family('agent_latency_max_seconds', 'gauge', 'Maximum agent execute latency')
+    for name, _, latency in snapshots:
+        lines.append(f'{prefix}_agent_latency_max_seconds{{agent="{_escape_label(name)}"}} {latency.max:.6f}')
+    
+    for metric_type, values in (('gauge', gauges), ('counter', counters)):
+        for name, value in (values or {}).items():
+            family(name, metric_type, name.replace('_', ' '))
+            lines.append(f"{prefix}_{name} {value}")
+    
+    return '\n'.join(lines) + '\n'
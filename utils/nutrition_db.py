@@ -0,0 +1,370 @@
+"""
+本地营养数据库
+列式存储的食物营养表，由CSV编译成单个二进制文件，加载时只做内存映射（mmap），
+各列直接以 numpy 数组的形式引用文件内容，几万条记录也能在毫秒内打开。
+食物名和别名按字节序排列，精确查找走二分；模糊查找使用预先编译进文件的字符bigram倒排索引
+
+CSV列: name, aliases(用|分隔), calories, protein, carbohydrate, fat, fiber, servingSize, foodType, ingredients
+"""
+
+import bisect
+import csv
+import json
+import mmap
+import os
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+MAGIC = b'NUTRDB01'
+
+# 数值列（每份的含量，与 FoodRecognitionAgent 的返回字段一致）
+NUMERIC_COLUMNS = ('calories', 'protein', 'carbohydrate', 'fat', 'fiber')
+
+# 字符串列
+STRING_COLUMNS = ('name', 'servingSize', 'foodType', 'ingredients')
+
+# bigram 首尾填充字符，使单字食物名（如"虾"）也有可索引的bigram
+_BEGIN = '\x02'
+_END = '\x03'
+
+# 数组在文件中的对齐字节数
+_ALIGN = 8
+
+DEFAULT_SOURCE_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'nutrition_foods.csv')
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'nutrition_db.bin')
+
+
+def normalize_name(name: str) -> str:
+    """食物名归一化：全角转半角、转小写、去掉空白"""
+    return ''.join(unicodedata.normalize('NFKC', name).lower().split())
+
+
+def _bigram_keys(text: str) -> np.ndarray:
+    """文本（已归一化）的去重bigram，每个bigram编码成 uint64 (前一字符码位<<21 | 后一字符码位)"""
+    padded = _BEGIN + text + _END
+    codes = np.fromiter(map(ord, padded), dtype=np.uint64, count=len(padded))
+    return np.unique((codes[:-1] << np.uint64(21)) | codes[1:])
+
+
+def _string_column(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """字符串列编码成 (偏移数组[N+1], UTF-8 字节数组)"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def build_nutrition_db(records: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    把食物记录编译成数据库文件
+    
+    Args:
+        records: 食物记录，字段同CSV列（aliases 可以是列表或用|分隔的字符串）
+        path: 输出文件路径
+        
+    Returns:
+        写入的食物数
+    """
+    rows: List[Dict[str, Any]] = []
+    entries: Dict[str, int] = {}
+    for record in records:
+        name = str(record.get('name') or '').strip()
+        if not name:
+            continue
+        aliases = record.get('aliases') or []
+        if isinstance(aliases, str):
+            aliases = aliases.split('|')
+        
+        row = len(rows)
+        for text in [name, *aliases]:
+            key = normalize_name(str(text))
+            if key and key not in entries:
+                # 同名/同别名以先出现的记录为准
+                entries[key] = row
+        rows.append(record)
+    
+    arrays: Dict[str, np.ndarray] = {}
+    for column in NUMERIC_COLUMNS:
+        arrays[column] = np.array([float(row.get(column) or 0) for row in rows], dtype=np.float32)
+    for column in STRING_COLUMNS:
+        offsets, data = _string_column([str(row.get(column) or '').strip() for row in rows])
+        arrays[f'{column}.offsets'], arrays[f'{column}.data'] = offsets, data
+    
+    # 名称和别名按 UTF-8 字节序排列，精确查找时二分
+    keys = sorted(entries, key=lambda key: key.encode('utf-8'))
+    arrays['entry.offsets'], arrays['entry.data'] = _string_column(keys)
+    arrays['entry.row'] = np.array([entries[key] for key in keys], dtype=np.int32)
+    
+    # bigram 倒排索引: 每个bigram对应的条目下标
+    grams = [_bigram_keys(key) for key in keys]
+    arrays['entry.grams'] = np.array([len(gram) for gram in grams], dtype=np.int32)
+    if grams:
+        gram_keys = np.concatenate(grams)
+        gram_entries = np.repeat(np.arange(len(keys), dtype=np.int32), arrays['entry.grams'])
+    else:
+        gram_keys = np.zeros(0, dtype=np.uint64)
+        gram_entries = np.zeros(0, dtype=np.int32)
+    order = np.argsort(gram_keys, kind='stable')
+    unique_keys, starts = np.unique(gram_keys[order], return_index=True)
+    arrays['gram.keys'] = unique_keys.astype(np.uint64)
+    arrays['gram.offsets'] = np.append(starts, len(order)).astype(np.int64)
+    arrays['gram.postings'] = gram_entries[order]
+    
+    # 文件布局: MAGIC | 头部长度(uint32) | 头部JSON | 对齐后的各数组
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, position, int(array.size)]
+        position += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps(
+        {'rows': len(rows), 'entries': len(keys), 'arrays': layout},
+        ensure_ascii=False
+    ).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 4 + len(header)) // _ALIGN) * _ALIGN
+    
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, 'little'))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][1])
+            f.write(array.tobytes())
+        f.truncate(data_start + position)
+    os.replace(temp_path, path)
+    return len(rows)
+
+
+def read_food_csv(csv_path: str) -> List[Dict[str, Any]]:
+    """读取食物CSV（UTF-8，可带BOM）"""
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+class _EntryKeys:
+    """按下标读取条目名称字节串（供 bisect 二分，不需要预先解码全部名称）"""
+    
+    def __init__(self, db: 'NutritionDB'):
+        self._db = db
+    
+    def __len__(self) -> int:
+        return self._db.entry_count
+    
+    def __getitem__(self, index: int) -> bytes:
+        return self._db._bytes('entry', index)
+
+
+class NutritionDB:
+    """内存映射的营养数据库（只读，可在多线程间共享）"""
+    
+    def __init__(self, path: str):
+        """
+        打开数据库文件
+        
+        Args:
+            path: build_nutrition_db 生成的文件
+            
+        Raises:
+            ValueError: 文件格式不正确
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"不是营养数据库文件: {path}")
+        header_length = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 4], 'little')
+        header_end = len(MAGIC) + 4 + header_length
+        header = json.loads(self._mmap[len(MAGIC) + 4:header_end].decode('utf-8'))
+        data_start = -(-header_end // _ALIGN) * _ALIGN
+        
+        self.row_count = header['rows']
+        self.entry_count = header['entries']
+        self._data_offsets: Dict[str, int] = {}
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, (dtype, offset, count) in header['arrays'].items():
+            self._arrays[name] = np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+            self._data_offsets[name] = data_start + offset
+        
+        self._entry_keys = _EntryKeys(self)
+    
+    def __len__(self) -> int:
+        return self.row_count
+    
+    def column(self, name: str) -> np.ndarray:
+        """数值列（只读 numpy 数组，直接引用文件内容）"""
+        return self._arrays[name]
+    
+    def _bytes(self, column: str, index: int) -> bytes:
+        """字符串列第 index 个值的 UTF-8 字节串"""
+        offsets = self._arrays[f'{column}.offsets']
+        base = self._data_offsets[f'{column}.data']
+        return self._mmap[base + int(offsets[index]):base + int(offsets[index + 1])]
+    
+    def _string(self, column: str, index: int) -> str:
+        return self._bytes(column, index).decode('utf-8')
+    
+    def record(self, row: int) -> Dict[str, Any]:
+        """
+        读取一条食物记录
+        
+        Args:
+            row: 行号
+            
+        Returns:
+            {'foodName', 'calories', 'protein', 'carbohydrate', 'fat', 'fiber', 'servingSize', 'foodType', 'ingredients'}
+        """
+        record = {'foodName': self._string('name', row)}
+        for column in NUMERIC_COLUMNS:
+            record[column] = round(float(self._arrays[column][row]), 1)
+        for column in STRING_COLUMNS[1:]:
+            record[column] = self._string(column, row)
+        return record
+    
+    def find_exact(self, name: str) -> Optional[int]:
+        """
+        按名称或别名精确查找（归一化后比较）
+        
+        Args:
+            name: 食物名
+            
+        Returns:
+            行号，未找到时为None
+        """
+        key = normalize_name(name).encode('utf-8')
+        index = bisect.bisect_left(self._entry_keys, key)
+        if index < self.entry_count and self._entry_keys[index] == key:
+            return int(self._arrays['entry.row'][index])
+        return None
+    
+    def search(self, name: str, limit: int = 5, min_score: float = 0.5) -> List[Tuple[int, float, str]]:
+        """
+        模糊查找：按bigram的 Dice 系数给名称和别名打分
+        
+        Args:
+            name: 食物名
+            limit: 最多返回的食物数
+            min_score: 最低分数（0~1，1为完全相同）
+            
+        Returns:
+            [(行号, 分数, 命中的名称或别名), ...]，按分数从高到低，同一食物只出现一次
+        """
+        query = normalize_name(name)
+        if not query or not self.entry_count:
+            return []
+        
+        query_grams = _bigram_keys(query)
+        gram_keys = self._arrays['gram.keys']
+        positions = np.searchsorted(gram_keys, query_grams)
+        found = positions < len(gram_keys)
+        found[found] = gram_keys[positions[found]] == query_grams[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+        
+        offsets = self._arrays['gram.offsets']
+        postings = self._arrays['gram.postings']
+        candidates = np.concatenate([postings[offsets[position]:offsets[position + 1]] for position in positions])
+        entries, shared = np.unique(candidates, return_counts=True)
+        scores = 2.0 * shared / (len(query_grams) + self._arrays['entry.grams'][entries])
+        
+        keep = scores >= min_score
+        entries, scores = entries[keep], scores[keep]
+        order = np.argsort(-scores, kind='stable')
+        
+        results = []
+        seen = set()
+        entry_rows = self._arrays['entry.row']
+        for index in order:
+            row = int(entry_rows[entries[index]])
+            if row in seen:
+                continue
+            seen.add(row)
+            results.append((row, round(float(scores[index]), 4), self._string('entry', int(entries[index]))))
+            if len(results) >= limit:
+                break
+        return results
+    
+    def lookup(self, name: str, min_score: float = 0.5) -> Optional[Dict[str, Any]]:
+        """
+        查找食物：先精确匹配名称/别名，再取模糊匹配得分最高的一条
+        
+        Args:
+            name: 食物名
+            min_score: 模糊匹配的最低分数
+            
+        Returns:
+            食物记录（附加 'matchScore' 和 'matchedName'），未找到时为None
+        """
+        row = self.find_exact(name)
+        if row is not None:
+            return dict(self.record(row), matchScore=1.0, matchedName=normalize_name(name))
+        
+        matches = self.search(name, limit=1, min_score=min_score)
+        if not matches:
+            return None
+        row, score, matched = matches[0]
+        return dict(self.record(row), matchScore=score, matchedName=matched)
+    
+    def close(self):
+        """关闭内存映射"""
+        self._arrays.clear()
+        self._mmap.close()
+
+
+_databases: Dict[str, NutritionDB] = {}
+_databases_lock = threading.Lock()
+
+
+def load_nutrition_db(path: str = None, source_csv: str = None) -> NutritionDB:
+    """
+    打开营养数据库（同一文件在进程内只打开一次）
+    
+    数据库文件不存在或比源CSV旧时先从CSV重新编译。
+    
+    Args:
+        path: 数据库文件（默认 cache/nutrition_db.bin）
+        source_csv: 源CSV（默认 config/nutrition_foods.csv，None且文件已存在时不检查）
+        
+    Returns:
+        NutritionDB 实例
+    """
+    path = os.path.abspath(path or DEFAULT_DB_PATH)
+    source_csv = source_csv or (DEFAULT_SOURCE_CSV if path == os.path.abspath(DEFAULT_DB_PATH) else None)
+    
+    with _databases_lock:
+        db = _databases.get(path)
+        if db is not None:
+            return db
+        
+        stale = not os.path.exists(path) or (
+            source_csv is not None and os.path.exists(source_csv)
+            and os.path.getmtime(source_csv) > os.path.getmtime(path)
+        )
+        if stale:
+            if source_csv is None or not os.path.exists(source_csv):
+                raise FileNotFoundError(f"营养数据库不存在且没有可用的源CSV: {path}")
+            count = build_nutrition_db(read_food_csv(source_csv), path)
+            logger.info(f"营养数据库已编译: {count} 种食物 -> {path}")
+        
+        db = NutritionDB(path)
+        _databases[path] = db
+        return db
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='把食物营养CSV编译成本地营养数据库')
+    parser.add_argument('csv', help='源CSV文件')
+    parser.add_argument('output', nargs='?', default=DEFAULT_DB_PATH, help='输出文件（默认 cache/nutrition_db.bin）')
+    args = parser.parse_args()
+    
+    print(f"{build_nutrition_db(read_food_csv(args.csv), args.output)} 种食物 -> {args.output}")
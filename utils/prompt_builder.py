@@ -0,0 +1,303 @@
+"""
+按token预算组装对话提示词
+系统提示、历史摘要、最近若干条对话和当前消息按预算装入；放不下的旧对话增量合并进
+按会话缓存的滚动摘要（只处理新移出窗口的消息，不会每轮重新总结全部历史），
+会话再长，发给LLM的请求体大小也基本不变
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from utils.rate_limiter import estimate_tokens
+
+
+# 摘要函数: (已有摘要, 新移出窗口的消息, 摘要token上限) -> 新摘要
+Summarizer = Callable[[str, List[Dict[str, str]], int], str]
+
+SUMMARY_PREFIX = "以下是与用户之前对话的摘要，回答时可以参考：\n"
+
+# 规则摘要中每条消息保留的token数
+RULE_SNIPPET_TOKENS = 40
+
+
+@lru_cache(maxsize=8192)
+def _text_tokens(text: str) -> int:
+    """文本的估算token数（历史消息每轮都要重新计算，按内容缓存）"""
+    return estimate_tokens(text)
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """单条消息的估算token数（含格式开销，与 estimate_tokens 一致）"""
+    return _text_tokens(str(message.get('content', ''))) + 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    按估算token数截断文本（保留开头，截断时末尾加省略号）
+    
+    Args:
+        text: 原文本
+        max_tokens: token上限
+        
+    Returns:
+        不超过上限的文本
+    """
+    if _text_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 1:
+        return ''
+    
+    # 估算token数随前缀长度单调增加，二分查找最长的前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens - 1:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + '…'
+
+
+def rule_summarize(previous: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    规则摘要：每条消息保留开头一小段，超出上限时丢弃最早的内容
+    
+    Args:
+        previous: 已有摘要
+        messages: 需要并入摘要的消息
+        max_tokens: 摘要token上限
+        
+    Returns:
+        新摘要
+    """
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        role = '用户' if message.get('role') == 'user' else '助手'
+        content = ' '.join(str(message.get('content', '')).split())
+        lines.append(f"{role}: {truncate_to_tokens(content, RULE_SNIPPET_TOKENS)}")
+    
+    # 每行的token数分别估算，从最早的行开始丢弃直到满足上限
+    sizes = [_text_tokens(line) + 1 for line in lines]
+    total = sum(sizes)
+    start = 0
+    while total > max_tokens and start < len(lines) - 1:
+        total -= sizes[start]
+        start += 1
+    
+    return truncate_to_tokens('\n'.join(lines[start:]), max_tokens)
+
+
+class _SessionSummary:
+    """单个会话的滚动摘要"""
+    
+    __slots__ = ('text', 'covered', 'dropped', 'refreshing')
+    
+    def __init__(self):
+        self.text = ''
+        # 已并入摘要的历史消息数（从会话开始计，含已从历史头部删除的消息）
+        self.covered = 0
+        # 调用方从历史头部删除的消息数（历史列表中的下标 = 会话中的序号 - dropped）
+        self.dropped = 0
+        self.refreshing = False
+
+
+class PromptBuilder:
+    """按token预算组装对话提示词
+    
+    最近的对话原样保留，从新到旧装入预算；更早的对话由摘要函数合并进会话的滚动摘要。
+    默认使用规则摘要（不调用LLM）；传入LLM摘要函数时在后台线程中更新，
+    更新完成前先用规则摘要补上新移出窗口的消息，当前请求不需要等待。
+    """
+    
+    def __init__(
+        self,
+        max_prompt_tokens: int = 3000,
+        summary_max_tokens: int = 300,
+        max_recent_messages: Optional[int] = None,
+        summary_batch: int = 4,
+        summarizer: Optional[Summarizer] = None,
+        max_sessions: int = 1024
+    ):
+        """
+        初始化提示词构建器
+        
+        Args:
+            max_prompt_tokens: 整个提示词（系统提示+摘要+历史+当前消息）的token预算
+            summary_max_tokens: 摘要的token上限
+            max_recent_messages: 原样保留的历史消息数上限（None表示只受预算限制）
+            summary_batch: 移出窗口的消息攒够多少条再调用摘要函数
+            summarizer: 摘要函数，默认使用 rule_summarize
+            max_sessions: 缓存摘要的会话数上限（按最近使用淘汰）
+        """
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.max_recent_messages = max_recent_messages
+        self.summary_batch = max(1, summary_batch)
+        self.summarizer = summarizer
+        self.max_sessions = max_sessions
+        
+        self._summaries: "OrderedDict[Any, _SessionSummary]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {
+            'builds': 0,
+            'summary_updates': 0,
+            'summary_failures': 0
+        }
+    
+    def build(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, str]],
+        user_message: str,
+        session_id: Any = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        组装消息列表
+        
+        Args:
+            system_prompt: 系统提示词
+            history: 会话的历史（只追加；从头部删除旧消息时需调用 drop）
+            user_message: 当前用户消息
+            session_id: 会话ID（None表示不缓存摘要）
+            
+        Returns:
+            (消息列表, 统计信息 {'prompt_tokens', 'history_messages', 'summarized_messages', 'summary_tokens'})
+        """
+        system = {"role": "system", "content": system_prompt}
+        current = {"role": "user", "content": user_message}
+        available = self.max_prompt_tokens - message_tokens(system) - message_tokens(current)
+        
+        # 全部历史放得下就不需要摘要，否则先为摘要预留预算再选窗口
+        start = self._window_start(history, available)
+        if start > 0:
+            start = max(start, self._window_start(history, available - self.summary_max_tokens - 4))
+        
+        summary = self._summary_for(session_id, history[:start])
+        
+        messages = [system]
+        if summary:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+        messages.extend(history[start:])
+        messages.append(current)
+        
+        with self._lock:
+            self.stats['builds'] += 1
+        
+        return messages, {
+            'prompt_tokens': sum(message_tokens(message) for message in messages),
+            'history_messages': len(history) - start,
+            'summarized_messages': start,
+            'summary_tokens': _text_tokens(summary) if summary else 0
+        }
+    
+    def _window_start(self, history: List[Dict[str, str]], budget: int) -> int:
+        """从新到旧装入预算，返回原样保留的第一条历史消息的下标"""
+        limit = len(history) if self.max_recent_messages is None else min(len(history), self.max_recent_messages)
+        used = 0
+        start = len(history)
+        while len(history) - start < limit:
+            size = message_tokens(history[start - 1])
+            if used + size > budget:
+                break
+            used += size
+            start -= 1
+        
+        # 窗口不以助手消息开头，避免出现没有提问的回答
+        while start < len(history) and history[start].get('role') == 'assistant':
+            start += 1
+        return start
+    
+    def _summary_for(self, session_id: Any, evicted: List[Dict[str, str]]) -> str:
+        """移出窗口的消息对应的摘要（增量更新会话缓存）"""
+        if not evicted:
+            return ''
+        if session_id is None:
+            return rule_summarize('', evicted, self.summary_max_tokens)
+        
+        with self._lock:
+            entry = self._summaries.get(session_id)
+            if entry is None or entry.covered - entry.dropped > len(evicted):
+                # 新会话，或历史被清空后重新开始
+                entry = _SessionSummary()
+                self._summaries[session_id] = entry
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+            text, offset = entry.text, entry.dropped
+            covered = max(entry.covered - offset, 0)
+        
+        pending = evicted[covered:]
+        if not pending:
+            return text
+        if len(pending) < self.summary_batch and text:
+            # 攒够一批再更新缓存，这几条先用规则摘要补上
+            return rule_summarize(text, pending, self.summary_max_tokens)
+        
+        if self.summarizer is not None:
+            self._refresh_in_background(session_id, entry, text, pending, offset + len(evicted))
+            return rule_summarize(text, pending, self.summary_max_tokens)
+        
+        new_text = rule_summarize(text, pending, self.summary_max_tokens)
+        self._store(entry, new_text, offset + len(evicted))
+        return new_text
+    
+    def _summarize(self, previous: str, messages: List[Dict[str, str]]) -> str:
+        """调用摘要函数，失败时使用规则摘要"""
+        try:
+            return truncate_to_tokens(self.summarizer(previous, messages, self.summary_max_tokens), self.summary_max_tokens)
+        except Exception as e:
+            with self._lock:
+                self.stats['summary_failures'] += 1
+            logger.warning(f"对话摘要生成失败，使用规则摘要: {e}")
+            return rule_summarize(previous, messages, self.summary_max_tokens)
+    
+    def _store(self, entry: _SessionSummary, text: str, covered: int):
+        """写回摘要（只接受覆盖更多消息的结果）"""
+        with self._lock:
+            if covered >= entry.covered:
+                entry.text = text
+                entry.covered = covered
+            self.stats['summary_updates'] += 1
+    
+    def _refresh_in_background(self, session_id: Any, entry: _SessionSummary, text: str, pending: List[Dict[str, str]], covered: int):
+        """在后台线程中用摘要函数更新会话摘要（同一会话同时只有一个更新）"""
+        with self._lock:
+            if entry.refreshing:
+                return
+            entry.refreshing = True
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prompt-summary')
+        
+        def refresh():
+            try:
+                self._store(entry, self._summarize(text, pending), covered)
+            finally:
+                entry.refreshing = False
+        
+        self._executor.submit(refresh)
+    
+    def drop(self, session_id: Any, count: int):
+        """
+        调用方从会话历史头部删除了 count 条消息（限制历史长度时调用）
+        
+        删除前还没有并入摘要的消息不会再被总结。
+        """
+        with self._lock:
+            entry = self._summaries.get(session_id)
+            if entry is not None:
+                entry.dropped += count
+    
+    def forget(self, session_id: Any):
+        """删除会话的摘要缓存"""
+        with self._lock:
+            self._summaries.pop(session_id, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            return dict(self.stats, sessions=len(self._summaries))
@@ -0,0 +1,428 @@
+"""
+客户端限流
+令牌桶（每秒请求数 + 每分钟token数）+ AIMD自适应并发控制，
+在请求发出前主动限流，避免触发上游429后的重试风暴
+"""
+
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, Dict, List, Optional, Union
+from loguru import logger
+
+from utils.deadline import DeadlineExceeded, check_deadline, remaining_time
+
+
+_CJK_PATTERN = re.compile(r'[\u3400-\u9fff\uf900-\ufaff\u3000-\u303f\uff00-\uffef]')
+
+
+def estimate_tokens(content: Union[str, List[Dict[str, str]]]) -> int:
+    """
+    粗略估算token数
+    
+    中文字符（含全角标点）按1个token计，其余字符按4个字符1个token计，
+    每条消息额外计4个token的格式开销。
+    
+    Args:
+        content: 文本或消息列表
+        
+    Returns:
+        估算的token数
+    """
+    if isinstance(content, str):
+        cjk = len(_CJK_PATTERN.findall(content))
+        return cjk + (len(content) - cjk + 3) // 4
+    
+    return sum(estimate_tokens(str(message.get('content', ''))) + 4 for message in content)
+
+
+class TokenBucket:
+    """线程安全的令牌桶
+    
+    采用预约方式：acquire 立即扣减令牌（允许为负），并返回需要等待的时间，
+    保证并发调用方按到达顺序排队，不会相互饿死。
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发量）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """补充令牌（调用方需持有锁）"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    def reserve(self, amount: float = 1) -> float:
+        """
+        预约令牌
+        
+        Args:
+            amount: 需要的令牌数
+            
+        Returns:
+            需要等待的秒数（0表示可立即执行）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def consume(self, amount: float):
+        """事后补扣令牌（例如按实际token用量修正预估值，amount可为负）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+    
+    def _reserve_within(self, amount: float, timeout: Optional[float]) -> Optional[float]:
+        """预约令牌；需要等待的时间超过 timeout 时撤销预约并返回None"""
+        wait = self.reserve(amount)
+        if timeout is not None and wait > timeout:
+            self.consume(-amount)
+            return None
+        return wait
+    
+    def acquire(self, amount: float = 1, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        阻塞直到获得令牌
+        
+        Args:
+            amount: 需要的令牌数
+            timeout: 最长等待时间(秒)，None表示一直等待
+            
+        Returns:
+            实际等待的秒数；需要等待的时间超过 timeout 时不等待、不扣减令牌，返回None
+        """
+        wait = self._reserve_within(amount, timeout)
+        if wait:
+            time.sleep(wait)
+        return wait
+    
+    async def aacquire(self, amount: float = 1, timeout: Optional[float] = None) -> Optional[float]:
+        """异步等待直到获得令牌（参数和返回值同 acquire）"""
+        wait = self._reserve_within(amount, timeout)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+    
+    @property
+    def available(self) -> float:
+        """当前可用令牌数"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发限制
+    
+    - 成功：并发上限加性增长（每轮约 +1）
+    - 被限流（429）：并发上限乘性下降
+    
+    同步调用方在 threading.Condition 上等待；异步调用方按到达顺序排队等待各自的 Future，
+    release() 在释放槽位时直接把槽位转交给队首的异步等待方（可以在任意线程中调用）。
+    """
+    
+    def __init__(
+        self,
+        initial: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        decrease_factor: float = 0.5
+    ):
+        """
+        初始化自适应并发限制
+        
+        Args:
+            initial: 初始并发上限
+            min_limit: 最小并发上限
+            max_limit: 最大并发上限
+            decrease_factor: 被限流时的下降系数
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        # 异步等待方: (事件循环, Future)，先到先得
+        self._async_waiters: deque = deque()
+        self.stats = {
+            'throttled': 0,
+            'increases': 0,
+            'decreases': 0
+        }
+    
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self._limit)
+    
+    @property
+    def in_flight(self) -> int:
+        """当前在途请求数"""
+        return self._in_flight
+    
+    def try_acquire(self) -> bool:
+        """尝试占用一个并发槽位（不阻塞）"""
+        with self._condition:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            return False
+    
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """阻塞直到占用一个并发槽位"""
+        with self._condition:
+            ok = self._condition.wait_for(lambda: self._in_flight < int(self._limit), timeout)
+            if ok:
+                self._in_flight += 1
+            return ok
+    
+    async def aacquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        异步等待直到占用一个并发槽位（不轮询，由 release 唤醒）
+        
+        Args:
+            timeout: 最长等待时间(秒)，None表示一直等待
+            
+        Returns:
+            是否占用成功（超时返回False）
+        """
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if not self._async_waiters and self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            waiter = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+        
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._discard_waiter(loop, waiter)
+            return False
+        except asyncio.CancelledError:
+            self._discard_waiter(loop, waiter)
+            raise
+    
+    def _discard_waiter(self, loop, waiter):
+        """移除已放弃等待的异步调用方（槽位若已转交，由 _grant 归还）"""
+        with self._condition:
+            try:
+                self._async_waiters.remove((loop, waiter))
+            except ValueError:
+                pass
+    
+    def _wake_async_waiters(self):
+        """把空闲槽位按到达顺序转交给异步等待方（调用方需持有锁）"""
+        while self._async_waiters and self._in_flight < int(self._limit):
+            loop, waiter = self._async_waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, waiter)
+            except RuntimeError:
+                # 事件循环已关闭
+                self._in_flight -= 1
+    
+    def _grant(self, waiter):
+        """在等待方的事件循环中完成转交；等待方已超时或取消时归还槽位"""
+        if waiter.done():
+            with self._condition:
+                self._in_flight = max(0, self._in_flight - 1)
+                self._wake_async_waiters()
+                self._condition.notify_all()
+        else:
+            waiter.set_result(True)
+    
+    def release(self, throttled: bool = False, success: bool = True):
+        """
+        释放并发槽位并根据结果调整上限
+        
+        Args:
+            throttled: 请求是否被上游限流（429）
+            success: 请求是否成功
+        """
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            
+            if throttled:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self.stats['throttled'] += 1
+                self.stats['decreases'] += 1
+                logger.warning(f"GLM API被限流，并发上限下调至 {int(self._limit)}")
+            elif success and self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                self.stats['increases'] += 1
+            
+            self._wake_async_waiters()
+            self._condition.notify_all()
+
+
+class RateLimiter:
+    """GLM API客户端限流器
+    
+    组合每秒请求数令牌桶、每分钟token数令牌桶和AIMD并发控制，
+    可在多个智能体（多个GLM4Client实例）之间共享。
+    """
+    
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化限流器
+        
+        Args:
+            config: glm4_config.yaml 中的 rate_limit 配置段
+        """
+        self.config = dict(config)
+        rps = config.get('requests_per_second', 10)
+        tpm = config.get('tokens_per_minute', 300000)
+        concurrency = config.get('concurrency', {})
+        
+        self.request_bucket = TokenBucket(rate=rps, capacity=config.get('burst', rps * 2))
+        self.token_bucket = TokenBucket(rate=tpm / 60.0, capacity=tpm)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=concurrency.get('initial', 16),
+            min_limit=concurrency.get('min', 1),
+            max_limit=concurrency.get('max', 64),
+            decrease_factor=concurrency.get('decrease_factor', 0.5)
+        )
+        
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'waited_requests': 0,
+            'total_wait_time': 0.0,
+            'deadline_exceeded': 0
+        }
+    
+    def _record_wait(self, wait: float):
+        """记录限流等待时间"""
+        with self._lock:
+            self.stats['requests'] += 1
+            if wait > 0.001:
+                self.stats['waited_requests'] += 1
+                self.stats['total_wait_time'] += wait
+    
+    @contextmanager
+    def limit(self, estimated_tokens: int):
+        """
+        同步限流上下文
+        
+        用法:
+            with limiter.limit(tokens) as permit:
+                ...
+                permit['throttled'] = True  # 收到429时标记
+                permit['actual_tokens'] = n  # 按实际用量修正
+                
+        每一步等待都不超过当前请求的剩余时限，时限内等不到配额时撤销已预约的令牌，
+        抛出 DeadlineExceeded。
+        """
+        check_deadline('rate_limit')
+        start = time.monotonic()
+        if self.request_bucket.acquire(1, remaining_time()) is None:
+            self._give_up(start)
+        if self.token_bucket.acquire(estimated_tokens, remaining_time()) is None:
+            self._give_up(start, requests=1)
+        if not self.concurrency.acquire(remaining_time()):
+            self._give_up(start, requests=1, tokens=estimated_tokens)
+        self._record_wait(time.monotonic() - start)
+        
+        permit = {'throttled': False, 'success': False, 'actual_tokens': None}
+        try:
+            yield permit
+        finally:
+            self._settle(permit, estimated_tokens)
+    
+    @asynccontextmanager
+    async def alimit(self, estimated_tokens: int):
+        """异步限流上下文（用法和时限处理同 limit）"""
+        check_deadline('rate_limit')
+        start = time.monotonic()
+        if await self.request_bucket.aacquire(1, remaining_time()) is None:
+            self._give_up(start)
+        if await self.token_bucket.aacquire(estimated_tokens, remaining_time()) is None:
+            self._give_up(start, requests=1)
+        if not await self.concurrency.aacquire(remaining_time()):
+            self._give_up(start, requests=1, tokens=estimated_tokens)
+        self._record_wait(time.monotonic() - start)
+        
+        permit = {'throttled': False, 'success': False, 'actual_tokens': None}
+        try:
+            yield permit
+        finally:
+            self._settle(permit, estimated_tokens)
+    
+    def _give_up(self, start: float, requests: int = 0, tokens: int = 0):
+        """时限内等不到配额：归还已预约的令牌并抛出 DeadlineExceeded"""
+        if requests:
+            self.request_bucket.consume(-requests)
+        if tokens:
+            self.token_bucket.consume(-tokens)
+        with self._lock:
+            self.stats['deadline_exceeded'] += 1
+        raise DeadlineExceeded(f"限流等待超出请求时限（已等待 {time.monotonic() - start:.2f}秒）")
+    
+    def _settle(self, permit: Dict[str, Any], estimated_tokens: int):
+        """请求结束：修正token用量并调整并发上限"""
+        if permit['actual_tokens'] is not None:
+            self.token_bucket.consume(permit['actual_tokens'] - estimated_tokens)
+        self.concurrency.release(throttled=permit['throttled'], success=permit['success'])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['total_wait_time'] = round(stats['total_wait_time'], 3)
+        stats['concurrency_limit'] = self.concurrency.limit
+        stats['in_flight'] = self.concurrency.in_flight
+        stats['throttled'] = self.concurrency.stats['throttled']
+        stats['available_tokens'] = int(self.token_bucket.available)
+        return stats
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, config: Dict[str, Any]) -> Optional[RateLimiter]:
+    """
+    获取共享的限流器（同名限流器在进程内只创建一次，配置变化时重建）
+    
+    Args:
+        name: 限流器名称（通常为API地址，同一上游共享一个配额）
+        config: rate_limit 配置段
+        
+    Returns:
+        RateLimiter实例，未启用时返回None
+    """
+    if not config.get('enabled', False):
+        return None
+    
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None or limiter.config != config:
+            limiter = RateLimiter(config)
+            _limiters[name] = limiter
+            logger.info(
+                f"✅ GLM限流器已启用: {config.get('requests_per_second', 10)} req/s, "
+                f"{config.get('tokens_per_minute', 300000)} tokens/min"
+            )
+        return limiter
@@ -0,0 +1,133 @@
+"""
+接口结果缓存
+相同的减脂上下文（体重、天数、热量、偏好、限制）生成的计划相同，
+按规范化后的工作流输入缓存整个 /crewai/process 的响应，重复请求直接返回
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+
+from utils.llm_cache import LRUCache
+
+
+def canonicalize(value: Any) -> Any:
+    """
+    规范化请求数据，使语义相同的输入得到相同的结果
+    
+    - 字典按键排序
+    - 字符串列表（偏好、限制等）与顺序无关：去重后排序
+    - 数字统一为保留4位小数的浮点数（75 与 75.0 相同）
+    - 字符串合并连续空白、去掉首尾空白
+    
+    Args:
+        value: 任意可JSON序列化的数据
+        
+    Returns:
+        规范化后的数据
+    """
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        items = [canonicalize(item) for item in value]
+        if all(isinstance(item, str) for item in items):
+            return sorted(set(items))
+        return items
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 4)
+    if isinstance(value, str):
+        return ' '.join(value.split())
+    return value
+
+
+def make_result_key(payload: Dict[str, Any]) -> str:
+    """
+    根据规范化后的请求数据生成缓存键
+    
+    Args:
+        payload: 决定响应内容的请求数据
+        
+    Returns:
+        sha256十六进制摘要
+    """
+    raw = json.dumps(canonicalize(payload), ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """接口结果缓存（进程内LRU + TTL）"""
+    
+    def __init__(self, max_entries: int = 512, ttl: Optional[float] = 3600):
+        """
+        初始化结果缓存
+        
+        Args:
+            max_entries: 最大条目数
+            ttl: 过期时间(秒)，None表示永不过期
+        """
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.stats = {
+            'stores': 0,
+            'bypasses': 0,
+            'invalidations': 0
+        }
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        读取缓存
+        
+        Returns:
+            (缓存值, 已缓存秒数)，未命中返回None
+        """
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        value, stored_at = item
+        return value, time.time() - stored_at
+    
+    def set(self, key: str, value: Any):
+        """写入缓存"""
+        self._cache.set(key, (value, time.time()))
+        with self._lock:
+            self.stats['stores'] += 1
+    
+    def record_bypass(self):
+        """记录一次跳过缓存的请求（Cache-Control: no-cache）"""
+        with self._lock:
+            self.stats['bypasses'] += 1
+    
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """
+        使缓存失效
+        
+        Args:
+            key: 缓存键，None表示清空全部
+            
+        Returns:
+            删除的条目数
+        """
+        if key is None:
+            removed = len(self._cache)
+            self._cache.clear()
+        else:
+            removed = 1 if self._cache.delete(key) else 0
+        
+        with self._lock:
+            self.stats['invalidations'] += removed
+        logger.info(f"🧹 结果缓存失效: {removed} 条")
+        return removed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        stats = self._cache.get_stats()
+        with self._lock:
+            stats.update(self.stats)
+        stats['max_entries'] = self._cache.max_entries
+        stats['ttl'] = self._cache.ttl
+        return stats
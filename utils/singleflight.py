@@ -0,0 +1,181 @@
+"""
+请求合并（single-flight）
+相同键的并发调用只执行一次，所有调用方共享同一个结果
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from utils.deadline import DeadlineExceeded, remaining_time
+
+
+class _Call:
+    """一次正在进行中的调用"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """线程安全的请求合并器
+    
+    第一个到达的调用方（leader）真正执行函数，
+    执行期间到达的相同键调用方阻塞等待并复用leader的结果或异常；
+    等待不超过调用方自己的请求时限，超时的调用方抛出 DeadlineExceeded，leader 继续执行。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.stats = {
+            'calls': 0,       # 总调用次数
+            'executions': 0,  # 实际执行次数
+            'saved': 0,       # 复用进行中结果的次数（即节省的上游调用）
+            'deadline_exceeded': 0  # 等待结果时超出请求时限的次数
+        }
+    
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        执行函数，相同键的并发调用合并为一次
+        
+        Args:
+            key: 合并键
+            fn: 无参函数
+            
+        Returns:
+            函数返回值（可能来自其他线程的执行）
+            
+        Raises:
+            DeadlineExceeded: 等待其他线程的执行结果时请求时限用完
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['saved'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['executions'] += 1
+                leader = True
+        
+        if not leader:
+            if not call.event.wait(remaining_time()):
+                with self._lock:
+                    self.stats['deadline_exceeded'] += 1
+                raise DeadlineExceeded(f"等待合并请求的结果超出请求时限: {key[:16]}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+    
+    def in_flight(self) -> int:
+        """当前进行中的调用数"""
+        with self._lock:
+            return len(self._calls)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls)
+        stats['saved_rate'] = round(stats['saved'] / stats['calls'], 4) if stats['calls'] else 0.0
+        return stats
+
+
+class AsyncSingleFlight:
+    """协程版请求合并器
+    
+    同一事件循环内相同键的并发调用只执行一次；不同事件循环之间不合并（各自执行）。
+    与 SingleFlight 一样，等待方最多等到自己的请求时限。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self.stats = {
+            'calls': 0,
+            'executions': 0,
+            'saved': 0,
+            'deadline_exceeded': 0
+        }
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行协程函数，相同键的并发调用合并为一次
+        
+        Args:
+            key: 合并键
+            fn: 无参协程函数
+            
+        Returns:
+            协程返回值（可能来自其他调用方的执行）
+            
+        Raises:
+            DeadlineExceeded: 等待其他调用方的执行结果时请求时限用完
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.stats['calls'] += 1
+            future = self._calls.get((loop, key))
+            if future is not None:
+                self.stats['saved'] += 1
+                leader = False
+            else:
+                future = loop.create_future()
+                self._calls[(loop, key)] = future
+                self.stats['executions'] += 1
+                leader = True
+        
+        if not leader:
+            try:
+                # shield: 等待方超时或被取消不影响leader
+                return await asyncio.wait_for(asyncio.shield(future), remaining_time())
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self.stats['deadline_exceeded'] += 1
+                raise DeadlineExceeded(f"等待合并请求的结果超出请求时限: {key[:16]}")
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # leader 被取消，由当前调用方自己执行
+                return await fn()
+        
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待方时避免事件循环报告 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop((loop, key), None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls)
+        stats['saved_rate'] = round(stats['saved'] / stats['calls'], 4) if stats['calls'] else 0.0
+        return stats
@@ -0,0 +1,465 @@
+"""
+请求链路追踪
+轻量级的span追踪：当前span保存在contextvars中，嵌套调用自动建立父子关系；
+覆盖智能体执行、业务工具、LLM调用和知识库检索。
+trace结束后导出到 JSON Lines 文件或 OTLP/HTTP(JSON) 接收端，也可以汇总后随接口响应返回
+
+用法:
+    with start_trace('crewai.process', user_id=1001) as root:
+        with span('llm.chat', kind='llm', model='glm-4-flash'):
+            ...
+    summary = root.trace.summary()
+"""
+
+import contextvars
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from loguru import logger
+
+
+# span类型
+SPAN_INTERNAL = 'internal'
+SPAN_AGENT = 'agent'
+SPAN_TOOL = 'tool'
+SPAN_LLM = 'llm'
+SPAN_RETRIEVAL = 'retrieval'
+SPAN_RULE = 'rule'
+
+# 响应中的trace汇总最多列出的span数量
+SUMMARY_MAX_SPANS = 50
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('crewai_current_span', default=None)
+
+
+class Trace:
+    """一次请求的全部span"""
+    
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List['Span'] = []
+        self.root: Optional['Span'] = None
+        self.finished = False
+        self._lock = threading.Lock()
+    
+    def add(self, span: 'Span'):
+        """登记span"""
+        with self._lock:
+            if self.root is None:
+                self.root = span
+            self.spans.append(span)
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        汇总trace，用于随响应返回
+        
+        Returns:
+            {trace_id, duration_ms, span_count, by_kind, slowest, spans}
+            by_kind 按类型累计耗时（不同类型的span互相嵌套，累计值之和可能大于总耗时）
+        """
+        with self._lock:
+            spans = [span for span in self.spans if span.duration is not None]
+        
+        by_kind: Dict[str, Dict[str, Any]] = {}
+        for span in spans:
+            if span is self.root:
+                continue
+            stats = by_kind.setdefault(span.kind, {'count': 0, 'duration_ms': 0.0, 'errors': 0})
+            stats['count'] += 1
+            stats['duration_ms'] += span.duration * 1000
+            stats['errors'] += span.status == 'error'
+        for stats in by_kind.values():
+            stats['duration_ms'] = round(stats['duration_ms'], 2)
+        
+        children = sorted((span for span in spans if span is not self.root), key=lambda s: s.duration, reverse=True)
+        ordered = sorted(spans, key=lambda s: s.start_time)
+        
+        return {
+            'trace_id': self.trace_id,
+            'duration_ms': round(self.root.duration * 1000, 2) if self.root and self.root.duration is not None else None,
+            'span_count': len(spans),
+            'by_kind': by_kind,
+            'slowest': [span.brief() for span in children[:5]],
+            'spans': [span.brief() for span in ordered[:SUMMARY_MAX_SPANS]]
+        }
+
+
+class Span:
+    """一个计时区间"""
+    
+    def __init__(self, name: str, kind: str, trace: Trace, parent: Optional['Span'], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace = trace
+        self.trace_id = trace.trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        trace.add(self)
+    
+    def set_attribute(self, key: str, value: Any):
+        """设置属性"""
+        self.attributes[key] = value
+    
+    def record_error(self, error: Any):
+        """标记为失败"""
+        self.status = 'error'
+        self.error = str(error)
+    
+    def end(self):
+        """结束计时（重复调用无效果）"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        _tracer.on_end(self)
+    
+    def brief(self) -> Dict[str, Any]:
+        """响应汇总中的简要信息"""
+        brief = {
+            'name': self.name,
+            'kind': self.kind,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_offset_ms': round((self.start_time - self.trace.root.start_time) * 1000, 2) if self.trace.root else 0.0,
+            'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None,
+            'status': self.status
+        }
+        if self.error:
+            brief['error'] = self.error
+        return brief
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """完整信息（JSON Lines导出格式）"""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_time': self.start_time,
+            'duration': self.duration,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """未开启trace时使用的空span"""
+    
+    trace = None
+    trace_id = None
+    span_id = None
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def record_error(self, error: Any):
+        pass
+    
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonLinesExporter:
+    """把span逐行写入本地JSON Lines文件"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def export(self, spans: List[Span]):
+        lines = ''.join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n' for span in spans)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+    
+    def shutdown(self):
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """转换为OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OTLPHttpExporter:
+    """
+    以 OTLP/HTTP JSON 格式发送到接收端（OpenTelemetry Collector 或兼容的替代服务）
+    
+    span放入队列，由后台线程批量发送，不阻塞请求；队列满或发送失败时丢弃
+    """
+    
+    def __init__(
+        self,
+        endpoint: str = 'http://localhost:4318/v1/traces',
+        service_name: str = 'crewai-health',
+        max_queue: int = 10000,
+        batch_size: int = 512,
+        timeout: float = 5.0
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: 'queue.Queue[Optional[Span]]' = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._worker, name='otlp-exporter', daemon=True)
+        self._thread.start()
+    
+    def export(self, spans: List[Span]):
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+    
+    def _worker(self):
+        import requests
+        
+        session = requests.Session()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = None in batch
+            batch = [span for span in batch if span is not None]
+            if batch:
+                try:
+                    session.post(self.endpoint, json=self._encode(batch), timeout=self.timeout)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.warning(f"OTLP导出失败，丢弃 {len(batch)} 个span: {e}")
+            if stop:
+                return
+    
+    def _encode(self, spans: List[Span]) -> Dict[str, Any]:
+        """编码为 ExportTraceServiceRequest"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+                'scopeSpans': [{
+                    'scope': {'name': 'utils.tracing'},
+                    'spans': [{
+                        'traceId': span.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_id or '',
+                        'name': span.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(int(span.start_time * 1e9)),
+                        'endTimeUnixNano': str(int((span.start_time + (span.duration or 0.0)) * 1e9)),
+                        'attributes': [
+                            {'key': key, 'value': _otlp_value(value)}
+                            for key, value in dict(span.attributes, **{'span.kind': span.kind}).items()
+                        ],
+                        'status': {'code': 2, 'message': span.error} if span.status == 'error' else {'code': 1}
+                    } for span in spans]
+                }]
+            }]
+        }
+    
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=self.timeout)
+
+
+class _Tracer:
+    """导出管理：trace的根span结束时导出整条trace，之后才结束的span单独导出"""
+    
+    def __init__(self):
+        self.exporters: List[Any] = []
+    
+    def on_end(self, span: Span):
+        trace = span.trace
+        if span is trace.root:
+            trace.finished = True
+            self._export(list(trace.spans))
+        elif trace.finished:
+            self._export([span])
+    
+    def _export(self, spans: List[Span]):
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans)
+            except Exception as e:
+                logger.warning(f"trace导出失败 ({type(exporter).__name__}): {e}")
+
+
+_tracer = _Tracer()
+
+
+def configure_tracing(jsonl_path: Optional[str] = None, otlp_endpoint: Optional[str] = None):
+    """
+    配置trace导出（重复调用会替换之前的配置）
+    
+    Args:
+        jsonl_path: JSON Lines文件路径，None表示不写文件
+        otlp_endpoint: OTLP/HTTP接收地址（如 http://localhost:4318/v1/traces），None表示不发送
+    """
+    for exporter in _tracer.exporters:
+        exporter.shutdown()
+    
+    exporters = []
+    if jsonl_path:
+        exporters.append(JsonLinesExporter(jsonl_path))
+    if otlp_endpoint:
+        exporters.append(OTLPHttpExporter(otlp_endpoint))
+    _tracer.exporters = exporters
+    
+    if exporters:
+        logger.info(f"🔍 链路追踪导出: {[type(e).__name__ for e in exporters]}")
+
+
+def get_current_span() -> Optional[Span]:
+    """当前span（不在trace中时返回None）"""
+    return _current_span.get()
+
+
+def start_span(name: str, kind: str = SPAN_INTERNAL, **attributes) -> Any:
+    """
+    创建一个不成为当前span的子span，需要手动调用 end()
+    
+    用于生成器等跨越多次调用的区间（在生成器中切换contextvars会泄漏到调用方）。
+    不在trace中时返回空span。
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, kind, parent.trace, parent, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = SPAN_INTERNAL, **attributes) -> Iterator[Any]:
+    """
+    在当前trace中创建子span
+    
+    不在trace中时：配置了导出器则新开一条trace（如命令行或后台任务直接调用智能体），否则不记录
+    
+    Args:
+        name: span名称
+        kind: span类型
+        **attributes: 属性
+    """
+    parent = _current_span.get()
+    if parent is None and not _tracer.exporters:
+        yield NOOP_SPAN
+        return
+    
+    current = Span(name, kind, parent.trace if parent is not None else Trace(), parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Span]:
+    """
+    开始一条新的trace（无论是否配置导出器都会记录，可以汇总后随响应返回）
+    
+    Args:
+        name: 根span名称
+        **attributes: 属性
+    """
+    root = Span(name, SPAN_INTERNAL, Trace(), None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+
+
+def traced(name: Optional[str] = None, kind: str = SPAN_INTERNAL) -> Callable:
+    """函数装饰器：每次调用记录一个span"""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+        
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return fn(*args, **kwargs)
+        
+        return wrapper
+    
+    return decorator
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    捕获当前上下文，使 fn 在线程池中执行时仍属于当前trace
+    
+    executor.submit(propagate(fn), ...) 或 loop.run_in_executor(None, propagate(fn))
+    """
+    context = contextvars.copy_context()
+    
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # 同一个Context不能同时在多个线程中进入，每次调用使用副本
+        return context.copy().run(fn, *args, **kwargs)
+    
+    return wrapper
+
+
+def instrument_methods(obj: Any, method_names: Iterable[str], kind: str = SPAN_INTERNAL, prefix: Optional[str] = None) -> List[str]:
+    """
+    给第三方对象的方法加上span（只替换该实例上的绑定方法，不修改类）
+    
+    Args:
+        obj: 对象
+        method_names: 方法名，不存在的忽略
+        kind: span类型
+        prefix: span名称前缀，默认为类名
+        
+    Returns:
+        实际加上span的方法名
+    """
+    if obj is None:
+        return []
+    
+    prefix = prefix or type(obj).__name__
+    instrumented = []
+    for method_name in method_names:
+        method = getattr(obj, method_name, None)
+        if not callable(method) or getattr(method, '__traced__', False):
+            continue
+        wrapper = traced(f'{prefix}.{method_name}', kind)(method)
+        wrapper.__traced__ = True
+        setattr(obj, method_name, wrapper)
+        instrumented.append(method_name)
+    return instrumented
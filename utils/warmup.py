@@ -0,0 +1,177 @@
+"""
+服务预热
+服务启动时在后台线程中并行初始化各个组件（智能体、embedder、Crew等），
+组件之间可以声明依赖，就绪状态供 /crewai/ready 查询
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+from loguru import logger
+
+
+# 组件状态
+WARM_PENDING = 'pending'
+WARM_RUNNING = 'warming'
+WARM_READY = 'ready'
+WARM_FAILED = 'failed'
+WARM_SKIPPED = 'skipped'
+
+# 视为完成预热的状态（可选依赖未安装时为 skipped）
+WARM_DONE_STATES = (WARM_READY, WARM_SKIPPED)
+
+
+class ComponentSkipped(Exception):
+    """组件不可用且可以跳过（如可选依赖未安装）"""
+    pass
+
+
+class _Component:
+    """一个待预热的组件"""
+    
+    def __init__(self, name: str, fn: Callable[[], Any], depends_on: Sequence[str], required: bool):
+        self.name = name
+        self.fn = fn
+        self.depends_on = list(depends_on)
+        self.required = required
+        self.state = WARM_PENDING
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.details: Any = None
+        self.done = threading.Event()
+
+
+class WarmupManager:
+    """组件预热管理器
+    
+    每个组件一个后台线程，依赖全部完成后开始初始化，
+    互不依赖的组件（如各个智能体和embedder）同时加载。
+    """
+    
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+        self._lock = threading.Lock()
+        self._started_at: Optional[float] = None
+    
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        depends_on: Sequence[str] = (),
+        required: bool = True
+    ):
+        """
+        注册组件
+        
+        Args:
+            name: 组件名称
+            fn: 初始化函数，返回值（可JSON序列化时）作为组件详情展示；
+                抛出 ComponentSkipped 表示跳过
+            depends_on: 依赖的组件名称
+            required: 是否为就绪的必要条件
+        """
+        with self._lock:
+            if self._started_at is not None:
+                raise RuntimeError("预热已开始，不能再注册组件")
+            for dependency in depends_on:
+                if dependency not in self._components:
+                    raise ValueError(f"组件 {name} 依赖未注册的组件: {dependency}")
+            self._components[name] = _Component(name, fn, depends_on, required)
+    
+    def start(self) -> 'WarmupManager':
+        """在后台开始预热（重复调用无效果）"""
+        with self._lock:
+            if self._started_at is not None:
+                return self
+            self._started_at = time.perf_counter()
+        
+        logger.info(f"🔥 开始后台预热: {list(self._components)}")
+        for component in self._components.values():
+            threading.Thread(
+                target=self._run,
+                args=(component,),
+                name=f"warmup-{component.name}",
+                daemon=True
+            ).start()
+        return self
+    
+    def _run(self, component: _Component):
+        """预热线程：等待依赖完成后初始化组件"""
+        try:
+            for dependency in component.depends_on:
+                self._components[dependency].done.wait()
+                if self._components[dependency].state not in WARM_DONE_STATES:
+                    raise RuntimeError(f"依赖组件未就绪: {dependency}")
+            
+            component.state = WARM_RUNNING
+            component.started_at = time.perf_counter() - self._started_at
+            start = time.perf_counter()
+            try:
+                component.details = component.fn()
+                component.state = WARM_READY
+            except ComponentSkipped as e:
+                component.state = WARM_SKIPPED
+                component.error = str(e)
+            finally:
+                component.duration = time.perf_counter() - start
+            
+            logger.info(f"✅ 预热完成: {component.name} ({component.state}, {component.duration:.2f}s)")
+        
+        except Exception as e:
+            component.state = WARM_FAILED
+            component.error = str(e)
+            logger.error(f"❌ 预热失败: {component.name} - {e}")
+        
+        finally:
+            component.done.set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待全部组件预热结束
+        
+        Returns:
+            是否全部就绪
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for component in self._components.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not component.done.wait(remaining):
+                return False
+        return self.is_ready()
+    
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        """
+        查询是否就绪
+        
+        Args:
+            name: 组件名称，None表示所有必要组件
+        """
+        if name is not None:
+            component = self._components.get(name)
+            return component is not None and component.state in WARM_DONE_STATES
+        return all(
+            component.state in WARM_DONE_STATES
+            for component in self._components.values() if component.required
+        )
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取各组件的预热状态"""
+        components: Dict[str, Dict[str, Any]] = {}
+        for name, component in self._components.items():
+            components[name] = {
+                'state': component.state,
+                'required': component.required,
+                'depends_on': component.depends_on,
+                'started_at': round(component.started_at, 3) if component.started_at is not None else None,
+                'duration': round(component.duration, 3) if component.duration is not None else None,
+                'error': component.error,
+                'details': component.details
+            }
+        
+        return {
+            'ready': self.is_ready(),
+            'started': self._started_at is not None,
+            'elapsed': round(time.perf_counter() - self._started_at, 3) if self._started_at is not None else 0.0,
+            'components': components
+        }